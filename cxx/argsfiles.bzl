@@ -12,6 +12,8 @@ ARGSFILES_SUBTARGET = "argsfiles"
 CompileArgsfile = record(
     # The generated argsfile (does not contain dependent inputs).
     file = field(Artifact),
+    # The argsfiles that the generated argsfile refers to (does not contain dependent inputs).
+    nested_files = field(list[Artifact], default = []),
     # This argsfile as a command form that would use the argsfile (includes dependent inputs).
     cmd_form = field(cmd_args),
     # Args as written to the argsfile (with shell quoting applied).
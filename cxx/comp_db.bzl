@@ -46,29 +46,36 @@ def _create_comp_database_impl(
 ) -> list[Provider]:
     mk_comp_db = internal_tools.make_comp_db
 
-    # Generate the per-source compilation DB entries.
+    # Generate the per-source compilation DB entries. Their compile argsfiles,
+    # which are mostly shared between sources, are left for the merge to expand
+    # once each.
     entries_as_input = []
+    argsfiles = {}
     for src_compile_cmd in src_compile_cmds:
         cdb_path = _comp_database_entry_path(identifier, src_compile_cmd.src.short_path)
         entry = entries.pop(cdb_path, None)
         if entry:
+            argsfile = src_compile_cmd.cxx_compile_cmd.argsfile
             cmd = cmd_args(
                 mk_comp_db,
                 "gen",
+                cmd_args(argsfile.file, format = "--defer-argsfile={}"),
                 cmd_args(entry, format = "--output={}"),
                 src_compile_cmd.src.basename,
                 cmd_args(src_compile_cmd.src, parent = 1),
                 "--",
                 src_compile_cmd.cxx_compile_cmd.base_compile_cmd,
-                src_compile_cmd.cxx_compile_cmd.argsfile.cmd_form,
+                argsfile.cmd_form,
                 src_compile_cmd.args,
             )
             entry_identifier = paths.join(identifier, src_compile_cmd.src.short_path)
             actions.run(cmd, category = "cxx_compilation_database", identifier = entry_identifier)
             entries_as_input.append(entry.as_input())
+            argsfiles[argsfile.file] = argsfile.nested_files
 
-    # Merge all entries into the actual compilation DB.
-    cmd = cmd_args(mk_comp_db)
+    # Merge all entries into the actual compilation DB. It only reads the
+    # argsfiles, not the headers and other inputs they refer to.
+    cmd = cmd_args(mk_comp_db, hidden = [[file] + nested_files for file, nested_files in argsfiles.items()])
     cmd.add("merge")
     cmd.add(cmd_args(db, format = "--output={}"))
 
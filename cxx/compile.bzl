@@ -1819,6 +1819,7 @@ def _mk_argsfiles(
     )
 
     argsfiles = []
+    nested_files = []
     args_list = []
 
     def mk_argsfile(filename: str, args, absolute: bool = False, use_dep_files_placeholder_for_content_based_paths: bool = False) -> Artifact:
@@ -1897,6 +1898,7 @@ def _mk_argsfiles(
             compiler_info_argsfile = actions.assert_has_content_based_path(filtered_info_argsfile)
 
         argsfiles.append(compiler_info_argsfile)
+        nested_files.append(compiler_info_argsfile)
         args_list.append(compiler_info_flags)
 
     make_toolchain_argsfile()
@@ -1920,6 +1922,7 @@ def _mk_argsfiles(
                 compiler_type_flags,
             )
         argsfiles.append(compiler_type_argsfile_artifact)
+        nested_files.append(compiler_type_argsfile_artifact)
         args_list.append(compiler_type_flags)
 
     make_compiler_type_argsfile()
@@ -1945,6 +1948,7 @@ def _mk_argsfiles(
                 hidden = deps_argsfile_for_buck_action_rerun,
             )
         )
+        nested_files.append(deps_argsfile_for_compiler)
         args_list.extend(deps_args)
 
     make_deps_argsfile()
@@ -1975,7 +1979,9 @@ def _mk_argsfiles(
 
         # filename example: .cpp.target_cxx_args
         target_argsfile_filename = filename_prefix + "target_cxx_args"
-        argsfiles.append(mk_argsfile(target_argsfile_filename, target_args))
+        target_argsfile = mk_argsfile(target_argsfile_filename, target_args)
+        argsfiles.append(target_argsfile)
+        nested_files.append(target_argsfile)
         args_list.append(target_args)
 
     make_target_argsfile()
@@ -2048,6 +2054,7 @@ def _mk_argsfiles(
                 hidden = file_prefix_argsfile_for_buck_action_rerun,
             )
         )
+        nested_files.append(file_prefix_argsfile_for_compiler)
         args_list.append(prefix_ref)
 
     make_file_prefix_argsfile()
@@ -2080,6 +2087,7 @@ def _mk_argsfiles(
 
     return CompileArgsfile(
         file = argsfile,
+        nested_files = nested_files,
         cmd_form = cmd_form,
         args = args,
         args_without_file_prefix_args = args_without_file_prefix_args,
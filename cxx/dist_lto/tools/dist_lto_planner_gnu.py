@@ -39,8 +39,19 @@ import resource
 import subprocess
 import sys
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import List, TextIO
 
+BITCODE_SUFFIX = ".thinlto.bc"
+IMPORTS_SUFFIX = ".imports"
+# Please note the files don't exist yet, this is to generate the index file
+# used in the final link.
+OPT_OBJECTS_SUFFIX = ".opt.o"
+
+# The number of objects planned by each task of the pool.
+SHARD_SIZE = 512
+
 
 def _flatten_deep(items):
     """Flatten recursive list of lists to a single list.
@@ -105,22 +116,139 @@ def _enable_core_dumps() -> None:
         print(f"warning: failed to enable core dumps: {e}", file=sys.stderr)
 
 
+def _shards(items):
+    for start in range(0, len(items), SHARD_SIZE):
+        yield items[start : start + SHARD_SIZE]
+
+
+def _import_indices(mapping):
+    # Every object's imports are looked up, so rather than going through
+    # `mapping` for each of them, precompute a single path -> index lookup.
+    # Archive members map to the one's complement of their archive's index,
+    # which tells them apart from (non-negative) object indices.
+    import_indices = {}
+    for path, entry in mapping.items():
+        if entry["archive_index"] is not None:
+            import_indices[path] = ~int(entry["archive_index"])
+        else:
+            import_indices[path] = entry["index"]
+    return import_indices
+
+
+def _read_imports(imports_path, import_indices):
+    """
+    Return the indices of the objects and archives listed in `imports_path`,
+    ignoring files unknown to the meta file.
+    """
+    imports_list = []
+    archives_list = []
+    with open(imports_path) as infile:
+        for line in infile:
+            index = import_indices.get(line.strip())
+            if index is None:
+                continue
+            if index < 0:
+                archives_list.append(~index)
+            else:
+                imports_list.append(index)
+    return imports_list, archives_list
+
+
+def _plan_objects(objects, index_dir, import_indices):
+    """
+    Move the ThinLTO index of each of `objects` (pairs of path and mapping
+    entry) to its output and write its plan. Returns the indices of the objects
+    that aren't bitcode.
+    """
+    non_lto_objects = []
+    made_dirs = set()
+    for path, data in objects:
+        output_loc = data["output"]
+        if os.path.exists(output_loc):
+            continue
+
+        bc_file = os.path.join(index_dir, path) + BITCODE_SUFFIX
+        imports_path = os.path.join(index_dir, path) + IMPORTS_SUFFIX
+        output_dir = os.path.dirname(output_loc)
+        if output_dir not in made_dirs:
+            os.makedirs(output_dir, exist_ok=True)
+            made_dirs.add(output_dir)
+
+        if os.path.exists(imports_path):
+            assert os.path.exists(bc_file), "missing bc file for %s" % path
+            os.rename(bc_file, output_loc)
+            imports_list, archives_list = _read_imports(imports_path, import_indices)
+            plan = {
+                "imports": imports_list,
+                "archive_imports": archives_list,
+                "index": data["index"],
+                "bitcode_file": bc_file,
+                "path": path,
+                "is_bc": True,
+            }
+        else:
+            non_lto_objects.append(data["index"])
+            with open(output_loc, "w"):
+                pass
+            plan = {
+                "is_bc": False,
+            }
+
+        # Unlike `json.dump`, `json.dumps` uses the C encoder.
+        with open(data["plan_output"], "w") as planout:
+            planout.write(json.dumps(plan, sort_keys=True))
+
+    return non_lto_objects
+
+
+def _plan_archive_objects(objects, output_path, index_dir, import_indices):
+    """
+    Move the ThinLTO indices of `objects`, members of the same archive, to the
+    archive's index dir `output_path`, and return their plans.
+    """
+    if objects:
+        os.makedirs(output_path, exist_ok=True)
+    object_plans = []
+    for obj in objects:
+        imports_path = os.path.join(index_dir, obj) + IMPORTS_SUFFIX
+        if os.path.exists(imports_path):
+            bc_file = os.path.join(index_dir, obj) + BITCODE_SUFFIX
+            os.rename(bc_file, os.path.join(output_path, os.path.basename(bc_file)))
+            imports_list, archives_list = _read_imports(imports_path, import_indices)
+            object_plans.append(
+                {
+                    "is_bc": True,
+                    "path": obj,
+                    "imports": imports_list,
+                    "archive_imports": archives_list,
+                    "bitcode_file": os.path.join(
+                        output_path, os.path.basename(bc_file)
+                    ),
+                }
+            )
+        else:
+            object_plans.append(
+                {
+                    "is_bc": False,
+                    "path": obj,
+                }
+            )
+    return object_plans
+
+
 def main(argv):
     parser = argparse.ArgumentParser()
     parser.add_argument("--meta")
     parser.add_argument("--index")
     parser.add_argument("--link-plan")
     parser.add_argument("--final-link-index")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
     parser.add_argument("index_args", nargs=argparse.REMAINDER)
     args = parser.parse_args(argv[1:])
 
     _enable_core_dumps()
     subprocess.check_call(args.index_args[1:])
 
-    bitcode_suffix = ".thinlto.bc"
-    imports_suffix = ".imports"
-    opt_objects_suffix = ".opt.o"  # please note the files are not exist yet, this is to generate the index file use in final link
-
     # `linkables_index` contains the linkables that are NOT LLVM IR bitcode files (e.g., machine code archives, shared libraries).
     # `linkables_index`'s key is the path to the linkable and the value is a dictionary containing the cmd_args and the meta_index.
     # `linkables_index` is used to re-attach associated flags (pre/post flags and flags in the cmd_args form like `-Wl,--whole-archive`/`-Wl,--no-whole-archive`)
@@ -152,10 +280,6 @@ def main(argv):
                 else:
                     raise Exception(f"unknown linkable type: {obj}")
 
-    def read_imports(path, imports_path):
-        with open(imports_path) as infile:
-            return [line.strip() for line in infile.readlines()]
-
     def index_path(path):
         return os.path.join(args.index, path)
 
@@ -279,104 +403,53 @@ def main(argv):
                     "index_dir": archive_index_dir,
                 }
 
-    non_lto_objects = {}
+    objects = []
     for path, data in sorted(mapping.items(), key=lambda v: v[0]):
-        output_loc = data["output"]
-        if os.path.exists(output_loc):
-            continue
-
         if data["archive_index"] is not None:
             archives[data["archive_index"]]["objects"].append(path)
-            continue
-
-        bc_file = index_path(path) + bitcode_suffix
-        imports_path = index_path(path) + imports_suffix
-        os.makedirs(os.path.dirname(output_loc), exist_ok=True)
-
-        if os.path.exists(imports_path):
-            assert os.path.exists(bc_file), "missing bc file for %s" % path
-            os.rename(bc_file, output_loc)
-            imports = read_imports(path, imports_path)
-            imports_list = []
-            archives_list = []
-            for import_path in imports:
-                if import_path not in mapping:
-                    continue
-                entry = mapping[import_path]
-                if entry["archive_index"] is not None:
-                    archives_list.append(int(entry["archive_index"]))
-                else:
-                    imports_list.append(entry["index"])
-            plan = {
-                "imports": imports_list,
-                "archive_imports": archives_list,
-                "index": data["index"],
-                "bitcode_file": bc_file,
-                "path": path,
-                "is_bc": True,
-            }
         else:
-            non_lto_objects[data["index"]] = 1
-            with open(output_loc, "w"):
-                pass
-            plan = {
-                "is_bc": False,
-            }
-
-        with open(data["plan_output"], "w") as planout:
-            json.dump(plan, planout, sort_keys=True)
-
-    for archive in archives.values():
-        # For archives, we must produce a plan that provides Starlark enough
-        # information about how to launch a dynamic opt for each object file
-        # in the archive.
-        archive_plan = {}
-
-        # This is convenient to store, since it's difficult for Starlark to
-        # calculate it.
-        archive_plan["base_dir"] = os.path.dirname(archive["plan"])
-        object_plans = []
-        for obj in archive["objects"]:
-            imports_path = index_path(obj) + imports_suffix
-            output_path = archive["index_dir"]
-            os.makedirs(output_path, exist_ok=True)
-            if os.path.exists(imports_path):
-                bc_file = index_path(obj) + bitcode_suffix
-                os.rename(bc_file, os.path.join(output_path, os.path.basename(bc_file)))
-                imports = read_imports(path, imports_path)
-
-                imports_list = []
-                archives_list = []
-                for path in imports:
-                    if path not in mapping:
-                        continue
-                    entry = mapping[path]
-                    if entry["archive_index"] is not None:
-                        archives_list.append(int(entry["archive_index"]))
-                    else:
-                        imports_list.append(entry["index"])
-                object_plans.append(
-                    {
-                        "is_bc": True,
-                        "path": obj,
-                        "imports": imports_list,
-                        "archive_imports": archives_list,
-                        "bitcode_file": os.path.join(
-                            output_path, os.path.basename(bc_file)
-                        ),
-                    }
+            objects.append((path, data))
+
+    # Objects, and the members of each archive, are planned in shards across a
+    # pool. Planning is mostly file system operations, which release the GIL,
+    # so threads are enough to overlap them.
+    import_indices = _import_indices(mapping)
+    with ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as pool:
+        archive_shards = [
+            [
+                pool.submit(
+                    _plan_archive_objects,
+                    shard,
+                    archive["index_dir"],
+                    args.index,
+                    import_indices,
                 )
-            else:
-                object_plans.append(
-                    {
-                        "is_bc": False,
-                        "path": obj,
-                    }
-                )
-
-        archive_plan["objects"] = object_plans
-        with open(archive["plan"], "w") as planout:
-            json.dump(archive_plan, planout, sort_keys=True)
+                for shard in _shards(archive["objects"])
+            ]
+            for archive in archives.values()
+        ]
+        non_lto_objects = {}
+        for shard_non_lto_objects in pool.map(
+            partial(_plan_objects, index_dir=args.index, import_indices=import_indices),
+            _shards(objects),
+        ):
+            for index in shard_non_lto_objects:
+                non_lto_objects[index] = 1
+
+        for archive, shards in zip(archives.values(), archive_shards):
+            # For archives, we must produce a plan that provides Starlark enough
+            # information about how to launch a dynamic opt for each object file
+            # in the archive.
+            archive_plan = {}
+
+            # This is convenient to store, since it's difficult for Starlark to
+            # calculate it.
+            archive_plan["base_dir"] = os.path.dirname(archive["plan"])
+            archive_plan["objects"] = [
+                object_plan for shard in shards for object_plan in shard.result()
+            ]
+            with open(archive["plan"], "w") as planout:
+                planout.write(json.dumps(archive_plan, sort_keys=True))
 
     # We read the `index` and `index.full` files produced by linker in index stage
     # and translate them to 2 outputs:
@@ -541,7 +614,7 @@ def main(argv):
                 # These files are suffixed with ".opt.o" and are siblings to the ".thinlto.bc" files,
                 # so the path is obtained by replacing the suffix.
                 output = mapping[path]["output"].replace(
-                    bitcode_suffix, opt_objects_suffix
+                    BITCODE_SUFFIX, OPT_OBJECTS_SUFFIX
                 )
                 final_link_index_output.write(output + "\n")
             elif (
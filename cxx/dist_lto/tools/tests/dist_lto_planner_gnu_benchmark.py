@@ -0,0 +1,185 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+"""
+Benchmark for the planning step of distributed ThinLTO links.
+
+Writes a synthetic meta file for a link of loose bitcode objects and of
+archives of them, a few of which are machine code, along with the outputs of
+the index step it describes: a `.thinlto.bc` and a `.imports` for each bitcode
+object, each importing from a few dozen others, and the `index` files. Then
+times the planner over it, with the index step itself being `true`. Pass
+`--planner` to time another revision, and `--output` to keep the plans of the
+last run, e.g. to compare them between revisions.
+
+$ python3 cxx/dist_lto/tools/tests/dist_lto_planner_gnu_benchmark.py --objects 50000
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_meta(objects, archives):
+    """
+    Write the meta file for the link, returning the paths of the bitcode
+    objects, and of the machine code ones.
+    """
+    meta = [{"linkables": [], "pre_flags": ["-Wl,--start-group"], "post_flags": []}]
+    bitcode = []
+    machine_code = []
+
+    def object_path(i):
+        path = "buck-out/v2/gen/root/lib{}/__objects__/src{}.cpp.o".format(i % 997, i)
+        if i % 50 == 0:
+            machine_code.append(path)
+        else:
+            bitcode.append(path)
+        return path
+
+    archive_size = objects // (archives + 1) if archives else 0
+    loose = objects - archive_size * archives
+    linkables = []
+    for i in range(loose):
+        path = object_path(i)
+        linkables.append(
+            {
+                "type": "bitcode",
+                "path": path,
+                "output": os.path.join("out", path + ".thinlto.bc"),
+                "plan_output": os.path.join("out", path + ".opt.plan"),
+                "idx": i,
+            }
+        )
+    meta.append({"linkables": linkables, "pre_flags": [], "post_flags": []})
+
+    for a in range(archives):
+        base_dir = os.path.join("out", "archive{}".format(a))
+        members = [
+            {"path": object_path(loose + a * archive_size + i)}
+            for i in range(archive_size)
+        ]
+        meta.append(
+            {
+                "linkables": [
+                    {
+                        "type": "archive",
+                        "archive_idx": loose + a,
+                        "archive_name": "libarchive{}.a".format(a),
+                        "archive_plan": os.path.join(base_dir, "archive.plan"),
+                        "archive_index_dir": os.path.join(base_dir, "indexes"),
+                        "archive_opt_objects_dir": os.path.join(base_dir, "opt"),
+                        "objects": members,
+                    }
+                ],
+                "pre_flags": ["-Wl,--whole-archive"] if a % 2 else [],
+                "post_flags": ["-Wl,--no-whole-archive"] if a % 2 else [],
+            }
+        )
+
+    with open("meta.json", "w") as f:
+        json.dump(meta, f)
+    return bitcode, machine_code
+
+
+def write_index(index_dir, bitcode, machine_code, imports, seed=0):
+    """
+    Write what the index step leaves in `index_dir`.
+    """
+    rng = random.Random(seed)
+    made_dirs = set()
+    for path in bitcode:
+        prefix = os.path.join(index_dir, path)
+        directory = os.path.dirname(prefix)
+        if directory not in made_dirs:
+            os.makedirs(directory, exist_ok=True)
+            made_dirs.add(directory)
+        with open(prefix + ".thinlto.bc", "wb") as f:
+            f.write(b"BC\xc0\xde")
+        with open(prefix + ".imports", "w") as f:
+            f.writelines(p + "\n" for p in rng.sample(bitcode, imports))
+
+    with open(os.path.join(index_dir, "index"), "w") as f:
+        f.writelines(os.path.join(index_dir, p) + "\n" for p in bitcode)
+    with open(os.path.join(index_dir, "index.full"), "w") as f:
+        f.writelines(os.path.join(index_dir, p) + "\n" for p in bitcode)
+        f.writelines(p + "\n" for p in machine_code)
+    with open(os.path.join(index_dir, "thinlto_index_argsfile"), "w") as f:
+        f.write("-Lbuck-out/v2/gen/root/lib\n")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--objects", type=int, default=50000)
+    parser.add_argument("--archives", type=int, default=20)
+    parser.add_argument("--imports", type=int, default=30)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--jobs", type=int)
+    parser.add_argument(
+        "--planner", default=os.path.join(TOOLS_DIR, "dist_lto_planner_gnu.py")
+    )
+    parser.add_argument("--output", help="Keep the plans of the last run here")
+    args = parser.parse_args()
+
+    spec = importlib.util.spec_from_file_location(
+        "_planner", os.path.abspath(args.planner)
+    )
+    planner = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(planner)
+
+    # Paths are relative to the build root, as in a build, which also keeps
+    # the plans the same from one run to the next.
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        bitcode, machine_code = write_meta(args.objects, args.archives)
+        write_index("index", bitcode, machine_code, args.imports)
+        shutil.copytree("index", "pristine")
+
+        planner_args = ["planner", "--meta", "meta.json", "--index", "index"]
+        planner_args += ["--link-plan", "out/link.plan"]
+        planner_args += ["--final-link-index", "out/final.index"]
+        if args.jobs is not None:
+            planner_args += ["--jobs", str(args.jobs)]
+        planner_args += ["--", "true", "@index/thinlto_index_argsfile"]
+
+        times = []
+        cpu_times = []
+        for _ in range(args.runs):
+            # The planner moves the indices out of the index dir, so each run
+            # starts from a fresh copy of it.
+            shutil.rmtree("index", ignore_errors=True)
+            shutil.rmtree("out", ignore_errors=True)
+            shutil.copytree("pristine", "index")
+            os.makedirs("out")
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+            planner.main(planner_args)
+            times.append(time.perf_counter() - start)
+            cpu_times.append(time.process_time() - cpu_start)
+
+        os.chdir(cwd)
+        if args.output is not None:
+            shutil.copytree(os.path.join(tmp, "out"), args.output, dirs_exist_ok=True)
+
+    print("objects:  {} in {} archives".format(args.objects, args.archives))
+    print("best:     {:.2f}s".format(min(times)))
+    print("mean:     {:.2f}s".format(sum(times) / len(times)))
+    # The time spent in the interpreter, which threads don't overlap.
+    print("best cpu: {:.2f}s".format(min(cpu_times)))
+
+
+if __name__ == "__main__":
+    main()
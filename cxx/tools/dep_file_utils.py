@@ -37,6 +37,4 @@ def normalize_and_write_deps(deps, dst_path):
         normalized_deps.append(dep)
 
     with open(dst_path, "w") as f:
-        for dep in normalized_deps:
-            f.write(dep)
-            f.write("\n")
+        f.writelines(dep + "\n" for dep in normalized_deps)
@@ -13,29 +13,46 @@ Utility to create compilation DBs
 $ make_comp_db.py gen --output=entry.json foo.cpp -- g++ -c -fPIC
 $ make_comp_db.py gen --output=entry2.json foo2.cpp -- g++ -c -fPIC
 $ make_comp_db.py merge --output=comp_db.json entry.json entry2.json
+
+Entries generated with `--defer-argsfile=<path>` keep `@<path>` unexpanded,
+and `merge` expands it, reading each distinct argsfile only once. The merged DB
+is the same either way. With `--output-dir`, `merge` writes one DB per source
+directory instead, at `<output-dir>/<source dir>/compile_commands.json`; nothing
+in the prelude uses it yet.
 """
 
 import argparse
 import json
+import os
 import shlex
 import sys
-from typing import List
+from typing import Dict, Iterator, List, Optional, Set, TextIO
 
 
-def process_arguments(arguments: List[str]) -> List[str]:
+def process_arguments(
+    arguments: List[str], cache: Optional[Dict[str, List[str]]] = None
+) -> List[str]:
     """
-    Process arguments to expand argsfiles.
+    Process arguments to expand argsfiles, memoizing the expansion of each
+    argsfile in `cache` if given.
     """
 
     combined_arguments = []
     for arg in arguments:
         if arg.startswith("@"):
-            with open(arg[1:]) as argsfile:
-                # The argsfile's arguments are separated by newlines; we
-                # don't want those included in the argument list.
-                lines = [" ".join(shlex.split(line)) for line in argsfile.readlines()]
+            expanded = cache.get(arg) if cache is not None else None
+            if expanded is None:
+                with open(arg[1:]) as argsfile:
+                    # The argsfile's arguments are separated by newlines; we
+                    # don't want those included in the argument list.
+                    lines = [
+                        " ".join(shlex.split(line)) for line in argsfile.readlines()
+                    ]
                 # Support nested argsfiles.
-                combined_arguments.extend(process_arguments(lines))
+                expanded = process_arguments(lines, cache)
+                if cache is not None:
+                    cache[arg] = expanded
+            combined_arguments.extend(expanded)
         else:
             combined_arguments.append(arg)
     return combined_arguments
@@ -49,32 +66,116 @@ def gen(args: argparse.Namespace) -> None:
     entry = {}
     entry["file"] = args.directory + "/" + args.filename
     entry["directory"] = "."
-    entry["arguments"] = process_arguments(args.arguments)
+    deferred = set(args.defer_argsfile)
+    arguments = []
+    for arg in args.arguments:
+        if arg.startswith("@") and arg[1:] in deferred:
+            arguments.append(arg)
+        else:
+            arguments.extend(process_arguments([arg]))
+    entry["arguments"] = arguments
 
     json.dump(entry, args.output, indent=2)
     args.output.close()
 
 
-def merge(args: argparse.Namespace) -> None:
+def _entry_paths(entries: List[str]) -> Iterator[str]:
+    for entry in entries:
+        if entry.startswith("@"):
+            with open(entry[1:]) as argsfile:
+                for sub_entry in argsfile:
+                    yield sub_entry.strip()
+        else:
+            yield entry
+
+
+def _read_entries(entries: List[str]) -> Iterator[Dict[str, object]]:
     """
-    Merge multiple compilation DB commands into a single DB.
+    Read the entries one at a time, expanding any argsfiles left to `merge`.
     """
 
-    entries = []
-    for entry in args.entries:
-        if entry.startswith("@"):
-            with open(entry[1:]) as argsfile:
-                sub_entries = map(str.strip, argsfile.readlines())
+    cache: Dict[str, List[str]] = {}
+    for path in _entry_paths(entries):
+        with open(path) as f:
+            entry = json.load(f)
+        entry["arguments"] = process_arguments(entry["arguments"], cache)
+        yield entry
+
+
+def _format_entry(entry: Dict[str, object]) -> str:
+    # Formatted as it would be within the list of `json.dump(entries, indent=2)`.
+    return "  " + json.dumps(entry, indent=2).replace("\n", "\n  ")
+
 
-                for sub_entry in sub_entries:
-                    with open(sub_entry) as g:
-                        entries.append(json.load(g))
+class _DirectoryDBs:
+    """
+    Streams entries into one DB per source directory. Entries usually arrive
+    grouped by directory, so only the current directory's DB is kept open, and
+    a DB is reopened for appending if its directory comes up again.
+    """
+
+    def __init__(self, output_dir: str) -> None:
+        self.output_dir = output_dir
+        self.started: Set[str] = set()
+        self.path: Optional[str] = None
+        self.file: Optional[TextIO] = None
+
+    def _path(self, directory: str) -> str:
+        directory = os.path.normpath(directory).lstrip(os.sep)
+        if directory.split(os.sep)[0] == "..":
+            raise ValueError(
+                "Source directory {} is outside of the output dir".format(directory)
+            )
+        return os.path.join(self.output_dir, directory, "compile_commands.json")
+
+    def write(self, entry: Dict[str, object]) -> None:
+        path = self._path(os.path.dirname(str(entry["file"])))
+        if path != self.path:
+            if self.file is not None:
+                self.file.close()
+            if path in self.started:
+                self.file = open(path, "a")
+                self.file.write(",\n")
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self.file = open(path, "w")
+                self.file.write("[\n")
+                self.started.add(path)
+            self.path = path
         else:
-            with open(entry) as f:
-                entries.append(json.load(f))
+            assert self.file is not None
+            self.file.write(",\n")
+        self.file.write(_format_entry(entry))
 
-    json.dump(entries, args.output, indent=2)
-    args.output.close()
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+        for path in self.started:
+            with open(path, "a") as f:
+                f.write("\n]")
+
+
+def merge(args: argparse.Namespace) -> None:
+    """
+    Merge multiple compilation DB commands into a single DB, streaming entries
+    to the output as they're read.
+    """
+
+    if args.output_dir is not None:
+        dbs = _DirectoryDBs(args.output_dir)
+        for entry in _read_entries(args.entries):
+            dbs.write(entry)
+        dbs.close()
+        return
+
+    output = args.output
+    first = True
+    for entry in _read_entries(args.entries):
+        output.write("[\n" if first else ",\n")
+        output.write(_format_entry(entry))
+        first = False
+    output.write("[]" if first else "\n]")
+    output.close()
 
 
 def main(argv: List[str]) -> int:
@@ -83,14 +184,23 @@ def main(argv: List[str]) -> int:
 
     parser_gen = subparsers.add_parser("gen")
     parser_gen.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
+    parser_gen.add_argument(
+        "--defer-argsfile",
+        action="append",
+        default=[],
+        help="Leave this argsfile to be expanded by `merge`",
+    )
     parser_gen.add_argument("filename")
     parser_gen.add_argument("directory")
     parser_gen.add_argument("arguments", nargs="*")
     parser_gen.set_defaults(func=gen)
 
     parser_merge = subparsers.add_parser("merge")
-    parser_merge.add_argument(
-        "--output", type=argparse.FileType("w"), default=sys.stdout
+    output = parser_merge.add_mutually_exclusive_group()
+    output.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
+    output.add_argument(
+        "--output-dir",
+        help="Write a DB per source directory, under this directory",
     )
     parser_merge.add_argument("entries", nargs="*")
     parser_merge.set_defaults(func=merge)
@@ -100,4 +210,5 @@ def main(argv: List[str]) -> int:
     return 0
 
 
-sys.exit(main(sys.argv))
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
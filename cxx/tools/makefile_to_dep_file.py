@@ -23,6 +23,15 @@ def rewrite_dep_file(src_path, dst_path):
     with open(src_path) as f:
         body = f.read()
 
+    # Once we've parsed deps, we need to normalize them.
+    dep_file_utils.normalize_and_write_deps(parse_deps(body), dst_path)
+
+
+def parse_deps(body):
+    """
+    Parse the prerequisites of a makefile rule, e.g. `foo.o: a.h b\\ c.h`.
+    """
+
     parts = body.split(": ", 1)
     body = parts[1] if len(parts) == 2 else ""
 
@@ -30,56 +39,16 @@ def rewrite_dep_file(src_path, dst_path):
     body = body.replace("\\\n", "")
 
     # Now, recover targets. They are space separated, but we need to ignore
-    # spaces that are escaped.
-    pos = 0
-
-    deps = []
-    current_parts = []
-
-    def push_slice(s):
-        if s:
-            current_parts.append(s)
-
-    def flush_current_dep():
-        if current_parts:
-            deps.append("".join(current_parts))
-            current_parts.clear()
-
-    while True:
-        next_pos = body.find(" ", pos)
-
-        # If we find the same character we started at, this means we started on
-        # a piece of whitespace. We know this cannot be escaped, because if we
-        # started here that means we stopped at the previous character, which
-        # means it must have been whitespace as well.
-        if next_pos == pos:
-            flush_current_dep()
-            pos += 1
-            continue
-
-        # No more whitespace, so this means that whatever is left from our
-        # current position to the end is the last dependency (assuming there is
-        # anything).
-        if next_pos < 0:
-            push_slice(body[pos:].rstrip("\n"))
-            break
-
-        # Check if this was escaped by looking at the previous character. If it
-        # was, then insert the part before the escape, and then push a space.
-        # If it wasn't, then we've reached the end of a dependency.
-        if next_pos > 0 and body[next_pos - 1] == "\\":
-            push_slice(body[pos : next_pos - 1])
-            push_slice(" ")
-        else:
-            push_slice(body[pos:next_pos])
-            flush_current_dep()
-
-        pos = next_pos + 1
-
-    flush_current_dep()
-
-    # Now that we've parsed deps, we need to normalize them.
-    dep_file_utils.normalize_and_write_deps(deps, dst_path)
+    # spaces that are escaped. Those are rare, and paths can't contain NUL, so
+    # they're swapped for NUL to split in one go.
+    escaped = "\\ " in body
+    if escaped:
+        body = body.replace("\\ ", "\0")
+    deps = body.split(" ")
+    deps[-1] = deps[-1].rstrip("\n")
+    if escaped:
+        return [dep.replace("\0", " ") for dep in deps if dep]
+    return [dep for dep in deps if dep]
 
 
 def process_dep_file(args):
@@ -10,25 +10,33 @@
 
 import re
 import sys
-from subprocess import PIPE, run
+from subprocess import PIPE, Popen
 
 import dep_file_utils
 
+_SHOW_HEADERS_LINE = re.compile(r"\.+ ")
+
 
 # output_path -> path to write the dep file to
 # cmd_args -> command to be run to get dependencies from compiler
 # input_file -> Path to the file we're generating the dep file for. We need this since
 # when generating dependencies for a file using show_headers, the output does not include
 # the file itself, so we need the path to add it manually
+#
+# The command's stderr is processed as it's written, so diagnostics show up while
+# it's still running.
 def process_show_headers_dep_file(output_path, cmd_args, input_file):
-    ret = run(cmd_args, stderr=PIPE, encoding="utf-8")
-    parse_into_dep_file(ret.stderr, output_path, input_file, ret.returncode)
-    sys.exit(ret.returncode)
+    with Popen(cmd_args, stderr=PIPE, encoding="utf-8") as proc:
+        deps, held_lines = read_show_headers_output(proc.stderr)
+    write_dep_file(deps, held_lines, output_path, input_file, proc.returncode)
+    sys.exit(proc.returncode)
 
 
-def parse_into_dep_file(output, dst_path, input_file, returncode):
+def read_show_headers_output(lines):
     """
-    Convert stderr generated by clang to dep file. This will be a mix of output like:
+    Collect the deps from lines of clang's stderr, in order and without
+    duplicates, printing everything else (warnings/errors) as it's read.
+    The output is a mix of lines like:
 
     warning: this is a warning!
     .path/to/dep1.h
@@ -41,31 +49,45 @@ def parse_into_dep_file(output, dst_path, input_file, returncode):
     path/to/dep2.h
     path/to/dep3.h
 
+    Lines that start with dots without looking like `-H` output (dots, then a
+    space) are only deps if the compile succeeds, and are printed otherwise.
+    So once one shows up, the rest of the output is held back rather than
+    printed, and returned as `(line, is_dep)` pairs, to be printed in order
+    when the outcome is known.
     """
 
-    lines = output.splitlines()
-
-    if returncode == 0:
-        deps = []
-        for line in lines:
-            if line.startswith("."):
-                path = remove_leading_dots(line.replace(" ", ""))
-                if len(path) > 0:
-                    deps.append(path.strip())
-                    continue
+    deps = {}
+    held_lines = None
+    for line in lines:
+        line = line.rstrip("\n")
+        is_dep = False
+        if line.startswith("."):
+            path = remove_leading_dots(line.replace(" ", "")).strip()
+            if _SHOW_HEADERS_LINE.match(line):
+                if path:
+                    deps[path] = None
+                continue
+            if path:
+                deps[path] = None
+                is_dep = True
+                if held_lines is None:
+                    held_lines = []
+        if held_lines is not None:
+            held_lines.append((line, is_dep))
+        else:
             print(line, file=sys.stderr)  # This was a warning/error
+    return list(deps), held_lines or []
 
-        deps.append(input_file)
-        dep_file_utils.normalize_and_write_deps(deps, dst_path)
-    else:
-        for line in lines:
-            if re.match(r"^\.+ ", line):
-                continue
 
+def write_dep_file(deps, held_lines, dst_path, input_file, returncode):
+    if returncode == 0:
+        if input_file not in deps:
+            deps.append(input_file)
+        dep_file_utils.normalize_and_write_deps(deps, dst_path)
+    for line, is_dep in held_lines:
+        if returncode != 0 or not is_dep:
             print(line, file=sys.stderr)
 
 
 def remove_leading_dots(s):
-    while s.startswith("."):
-        s = s[1:]
-    return s
+    return s.lstrip(".")
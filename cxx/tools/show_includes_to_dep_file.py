@@ -19,18 +19,22 @@ DEP_PREFIX = "Note: including file:"
 # source_file -> Path to the file we're generating the dep file for. We need this since
 # when generating dependencies for a file using show_headers, the output does not include
 # the file itself, so we need the path to add it manually
+#
+# The command's stdout is processed as it's written, so diagnostics show up while
+# it's still running.
 def process_show_includes_dep_file(output_path, cmd_args, input_file):
-    out = subprocess.run(cmd_args, stdout=subprocess.PIPE, encoding="utf-8")
-    if out.returncode == 0:
-        rewrite_dep_file_for_msvc(out.stdout, output_path, input_file)
-    else:
-        parse_stdout_error_output(out.stdout)
-    sys.exit(out.returncode)
+    with subprocess.Popen(cmd_args, stdout=subprocess.PIPE, encoding="utf-8") as proc:
+        deps = read_msvc_output(proc.stdout)
+    if proc.returncode == 0:
+        write_dep_file(deps, output_path, input_file)
+    sys.exit(proc.returncode)
 
 
-def rewrite_dep_file_for_msvc(output, dst_path, input_file):
+def read_msvc_output(lines):
     """
-    Convert stdout generated by MSVC to dep file. This will be a mix of output like:
+    Collect the deps from lines of MSVC's stdout, in order and without
+    duplicates, printing everything else as it's read. The output is a mix
+    of lines like:
 
     file.cpp
     Note: including file: path/to/dep1.h
@@ -45,22 +49,21 @@ def rewrite_dep_file_for_msvc(output, dst_path, input_file):
     path/to/dep3.h
 
     """
-    deps = []
+    deps = {}
+    lines = iter(lines)
     # First line is the name of the file we're generating deps for.
     # We manually include it later so let's ignore it.
-    lines = output.splitlines()[1:]
+    next(lines, None)
     for line in lines:
+        line = line.rstrip("\n")
         if DEP_PREFIX in line:
-            line = line.replace(DEP_PREFIX, "").strip()
-            deps.append(line)
+            deps[line.replace(DEP_PREFIX, "").strip()] = None
         else:
             print(line, file=sys.stderr)
-    deps.append(input_file)
-    dep_file_utils.normalize_and_write_deps(deps, dst_path)
+    return list(deps)
 
 
-def parse_stdout_error_output(output):
-    lines = output.splitlines()[1:]
-    for line in lines:
-        if DEP_PREFIX not in line:
-            print(line, file=sys.stderr)
+def write_dep_file(deps, dst_path, input_file):
+    if input_file not in deps:
+        deps.append(input_file)
+    dep_file_utils.normalize_and_write_deps(deps, dst_path)
@@ -0,0 +1,95 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+"""
+Benchmark for rewriting makefile dep files into buck2 dep files.
+
+Writes a corpus of `.d` files shaped like clang's `-MD` output for heavy
+translation units: thousands of headers, one per continued line, spread over
+a few hundred directories, some reached through `..`, some absolute (both in
+and outside of the build root) and a few with escaped spaces. Then times
+`rewrite_dep_file` over the corpus. Pass `--tools-dir` to time another
+revision of the tools.
+
+$ python3 cxx/tools/tests/makefile_to_dep_file_benchmark.py --headers 8000
+"""
+
+import argparse
+import importlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_corpus(corpus_dir, files, headers, seed=0):
+    rng = random.Random(seed)
+    cwd = os.getcwd()
+    dirs = []
+    for i in range(300):
+        depth = rng.randint(1, 6)
+        parts = ["lib{}".format(rng.randint(0, 40))]
+        parts.extend("d{}".format(rng.randint(0, 20)) for _ in range(depth))
+        if i % 10 == 0:
+            parts.insert(rng.randint(1, len(parts)), "..")
+        if i % 25 == 0:
+            parts[-1] += "\\ with\\ spaces"
+        d = "/".join(parts)
+        if i % 30 == 0:
+            d = cwd + "/" + d
+        elif i % 30 == 1:
+            d = "/usr/include/c++/11/" + d
+        dirs.append(d)
+
+    paths = []
+    for i in range(files):
+        lines = ["buck-out/v2/gen/root/abc123/__objects__/src{}.cpp.o: \\".format(i)]
+        lines.append("  src/src{}.cpp \\".format(i))
+        for j in range(headers):
+            d = dirs[min(int(rng.expovariate(1 / 40)), len(dirs) - 1)]
+            lines.append("  {}/header{}.h \\".format(d, j % 500))
+        lines[-1] = lines[-1][: -len(" \\")]
+        path = os.path.join(corpus_dir, "src{}.d".format(i))
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--headers", type=int, default=8000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tools-dir", default=TOOLS_DIR)
+    args = parser.parse_args()
+
+    sys.path.insert(0, args.tools_dir)
+    makefile_to_dep_file = importlib.import_module("makefile_to_dep_file")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = write_corpus(tmp, args.files, args.headers)
+        dst = os.path.join(tmp, "out.dep")
+        size = sum(os.path.getsize(path) for path in corpus)
+
+        times = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            for path in corpus:
+                makefile_to_dep_file.rewrite_dep_file(path, dst)
+            times.append((time.perf_counter() - start) / args.files)
+
+    print("corpus:   {} files, {:.1f}MB".format(args.files, size / 1e6))
+    print("best:     {:.2f}ms per file".format(min(times) * 1e3))
+
+
+if __name__ == "__main__":
+    main()
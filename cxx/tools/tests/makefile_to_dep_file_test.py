@@ -0,0 +1,56 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+import os
+import tempfile
+import unittest
+
+import makefile_to_dep_file
+
+
+class ParseDepsTest(unittest.TestCase):
+    def test_deps(self):
+        self.assertEqual(
+            makefile_to_dep_file.parse_deps("foo.o: foo.cpp a.h  b.h\n"),
+            ["foo.cpp", "a.h", "b.h"],
+        )
+
+    def test_line_continuations(self):
+        body = "foo.o: \\\n  foo.cpp \\\n  a.h \\\n  b.h\n"
+        self.assertEqual(
+            makefile_to_dep_file.parse_deps(body), ["foo.cpp", "a.h", "b.h"]
+        )
+
+    def test_escaped_spaces(self):
+        body = "foo.o: foo.cpp \\\n  dir\\ with\\ spaces/a.h b\\ .h\n"
+        self.assertEqual(
+            makefile_to_dep_file.parse_deps(body),
+            ["foo.cpp", "dir with spaces/a.h", "b .h"],
+        )
+
+    def test_empty_bodies(self):
+        for body in ("", "\n", "foo.o:\n", "foo.o: \n", "foo.o: \\\n\n"):
+            with self.subTest(body=body):
+                self.assertEqual(makefile_to_dep_file.parse_deps(body), [])
+
+
+class RewriteDepFileTest(unittest.TestCase):
+    def test_rewrite(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "foo.d")
+            dst = os.path.join(tmp, "foo.dep")
+            with open(src, "w") as f:
+                f.write(
+                    "foo.o: \\\n"
+                    "  src/../foo.cpp \\\n"
+                    "  {}/inc/a\\ b.h \\\n"
+                    "  /outside/the/build/root.h\n".format(os.getcwd())
+                )
+            makefile_to_dep_file.rewrite_dep_file(src, dst)
+            with open(dst) as f:
+                self.assertEqual(f.read(), "foo.cpp\ninc/a b.h\n")
@@ -0,0 +1,57 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import show_headers_to_dep_file
+
+OUTPUT = [
+    "warning: first\n",
+    ". a.h\n",
+    ".b.h\n",
+    "warning: second\n",
+    ".. c.h\n",
+]
+
+
+class ShowHeadersTest(unittest.TestCase):
+    def _process(self, returncode):
+        stderr = io.StringIO()
+        with tempfile.TemporaryDirectory() as tmp:
+            dst = os.path.join(tmp, "foo.dep")
+            with contextlib.redirect_stderr(stderr):
+                deps, held_lines = show_headers_to_dep_file.read_show_headers_output(
+                    OUTPUT
+                )
+                # Output before the first dep-like line is printed right away.
+                self.assertEqual(stderr.getvalue(), "warning: first\n")
+                show_headers_to_dep_file.write_dep_file(
+                    deps, held_lines, dst, "foo.cpp", returncode
+                )
+            if os.path.exists(dst):
+                with open(dst) as f:
+                    deps = f.read()
+            else:
+                deps = None
+        return deps, stderr.getvalue()
+
+    def test_success(self):
+        self.assertEqual(
+            self._process(0),
+            ("a.h\nb.h\nc.h\nfoo.cpp\n", "warning: first\nwarning: second\n"),
+        )
+
+    def test_failure_keeps_output_order(self):
+        self.assertEqual(
+            self._process(1),
+            (None, "warning: first\n.b.h\nwarning: second\n"),
+        )
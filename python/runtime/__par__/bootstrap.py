@@ -11,6 +11,7 @@
 from __future__ import annotations
 
 import os
+import sys
 import types
 from typing import Callable, Sequence
 
@@ -41,8 +42,21 @@ def run_as_main(
     When `main_function_hooks` is set, the hooks are called in sequence after the
     main module has been imported, just before the main function is invoked. This
     parameter has no effect if `main_function` is `None`.
+
+    When the `PAR_PROFILE_IMPORTS` env variable is set, imports are profiled
+    until the main function is invoked (see `__par__.import_profiler`). Without
+    a main function, the main module is profiled until the program exits.
     """
 
+    # The in-place launcher may have started profiling already.
+    profile_imports = (
+        "PAR_PROFILE_IMPORTS" in os.environ or "__par__.import_profiler" in sys.modules
+    )
+    if profile_imports:
+        from __par__ import import_profiler
+
+        import_profiler.start_from_env()
+
     # Allow users to decorate the main module. In normal Python invocations this
     # can be done by prefixing the arguments with `-m decoratingmodule`. It's not
     # that easy for par files. The startup script sets up `sys.path` from
@@ -77,8 +91,6 @@ def run_as_main(
 
     # This is normally done by `runpy._run_module_as_main`, and is
     # important to make multiprocessing work
-    import sys
-
     sys.modules["__main__"] = mod
 
     # Pretend we're executing `main()` directly
@@ -87,6 +99,9 @@ def run_as_main(
     for hook in main_function_hooks:
         hook()
 
+    if profile_imports:
+        import_profiler.stop()
+
     if iscoroutinefunction(main):
         import asyncio
 
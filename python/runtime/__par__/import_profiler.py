@@ -0,0 +1,368 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+"""
+Opt-in profiler for the imports a PAR does before reaching its main function.
+
+Set `PAR_PROFILE_IMPORTS=/path/to/trace.json` to record, for every module
+imported on the main thread between startup and the main function being
+invoked:
+
+- the wall time of its import, inclusive and exclusive of nested imports,
+- the time spent in `sys.meta_path` finders looking it up, and the rest of
+  its exclusive time, spent loading and executing it,
+- the number of filesystem probes (`stat`, `lstat` and `listdir` calls) the
+  import system made for it.
+
+Imports are timed at `__import__` and `importlib.import_module`, so parent
+packages that are implicitly imported (`pkg` for `import pkg.sub`) are
+accounted to the import that triggered them.
+
+The profile is written as a Chrome trace (open it in `chrome://tracing` or
+Perfetto) at the given path, along with a summary sorted by inclusive time at
+`<path>.summary.txt`.
+
+The env var is consumed on startup, so subprocesses don't overwrite the
+profile. Nothing from this module is imported unless it is set.
+"""
+
+from __future__ import annotations
+
+import _thread
+import atexit
+import builtins
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from importlib import _bootstrap_external  # pyre-ignore[21]
+from typing import Any, Callable
+
+ENV_VAR = "PAR_PROFILE_IMPORTS"
+
+_PROBES = ("stat", "lstat", "listdir")
+
+_profiler: ImportProfiler | None = None
+
+
+class _Frame:
+    __slots__ = ("name", "start", "children", "find", "probes")
+
+    def __init__(self, name: str, start: float) -> None:
+        self.name = name
+        self.start = start
+        self.children = 0.0
+        self.find = 0.0
+        self.probes = 0
+
+
+class _Stats:
+    __slots__ = ("count", "total", "self_time", "find", "probes")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.self_time = 0.0
+        self.find = 0.0
+        self.probes = 0
+
+
+def _resolve_name(name: str, globals: dict[str, Any] | None, level: int) -> str:
+    if level == 0 or not globals:
+        return name
+    package = globals.get("__package__") or globals.get("__name__") or ""
+    base = package.rsplit(".", level - 1)[0]
+    return "{}.{}".format(base, name) if name else base
+
+
+def _import_name(
+    name: str,
+    globals: dict[str, Any] | None = None,
+    locals: object = None,
+    fromlist: tuple[str, ...] = (),
+    level: int = 0,
+) -> str:
+    name = _resolve_name(name, globals, level)
+    if fromlist and name in sys.modules:
+        # Only submodules of an already imported package can be loaded by
+        # `from package import ...`.
+        names = [n for n in fromlist if n != "*"]
+        if len(names) == 1:
+            return "{}.{}".format(name, names[0])
+        return "{}.{{{}}}".format(name, ",".join(names))
+    return name
+
+
+class _TimedFinder:
+    """Wraps a `sys.meta_path` finder, attributing its time to the profiler."""
+
+    def __init__(self, finder: object, profiler: ImportProfiler) -> None:
+        self._finder = finder
+        self._profiler = profiler
+
+    def find_spec(
+        self, fullname: str, path: object = None, target: object = None
+    ) -> object:
+        profiler = self._profiler
+        if _thread.get_ident() != profiler.thread:
+            # pyre-ignore[16]
+            return self._finder.find_spec(fullname, path, target)
+        start = time.perf_counter()
+        try:
+            # pyre-ignore[16]
+            return self._finder.find_spec(fullname, path, target)
+        finally:
+            profiler.record_find(self._finder, fullname, start, time.perf_counter())
+
+    def __getattr__(self, name: str) -> object:
+        return getattr(self._finder, name)
+
+
+class ImportProfiler:
+    def __init__(self, output: str) -> None:
+        self.output = output
+        self.thread: int = _thread.get_ident()
+        self._start: float = time.perf_counter()
+        self._events: list[dict[str, object]] = []
+        self._stack: list[_Frame] = []
+        self._stats: dict[str, _Stats] = {}
+        self._finders: dict[str, float] = {}
+        self._probes = 0
+        self._patched: list[tuple[object, str, object]] = []
+
+        launch = os.environ.get("PAR_LAUNCH_TIMESTAMP")
+        if launch:
+            try:
+                launched = self._start + float(launch) - time.time()
+            except ValueError:
+                pass
+            else:
+                self._events.append(
+                    self._event("launcher", "startup", launched, self._start)
+                )
+
+    def _ts(self, t: float) -> float:
+        return (t - self._start) * 1e6
+
+    def _event(
+        self,
+        name: str,
+        cat: str,
+        start: float,
+        end: float,
+        args: dict[str, object] | None = None,
+    ) -> dict[str, object]:
+        event: dict[str, object] = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round(self._ts(start), 3),
+            "dur": round((end - start) * 1e6, 3),
+            "pid": os.getpid(),
+            "tid": self.thread,
+        }
+        if args:
+            event["args"] = args
+        return event
+
+    def _patch(self, obj: object, attr: str, value: object) -> None:
+        self._patched.append((obj, attr, getattr(obj, attr)))
+        setattr(obj, attr, value)
+
+    def _probe(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        def probe(*args: Any, **kwargs: Any) -> Any:
+            if _thread.get_ident() == self.thread:
+                self._probes += 1
+                if self._stack:
+                    self._stack[-1].probes += 1
+            return func(*args, **kwargs)
+
+        return probe
+
+    def _timed(
+        self, func: Callable[..., Any], resolve: Callable[..., str]
+    ) -> Callable[..., Any]:
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            if _thread.get_ident() != self.thread:
+                return func(*args, **kwargs)
+            loaded = len(sys.modules)
+            frame = _Frame(resolve(*args, **kwargs), time.perf_counter())
+            self._stack.append(frame)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._stack.pop()
+                # Imports of modules that were already loaded aren't
+                # interesting, and are far too many to record.
+                if len(sys.modules) != loaded:
+                    self._record_import(frame, time.perf_counter())
+                elif self._stack:
+                    self._stack[-1].children += time.perf_counter() - frame.start
+
+        return timed
+
+    def install(self) -> None:
+        self._patch(
+            builtins,
+            "__import__",
+            self._timed(builtins.__import__, _import_name),
+        )
+        self._patch(
+            importlib,
+            "import_module",
+            self._timed(
+                importlib.import_module,
+                lambda name, package=None: (
+                    importlib.util.resolve_name(name, package)
+                    if name.startswith(".")
+                    else name
+                ),
+            ),
+        )
+        # The import system probes the filesystem through its own reference to
+        # the `posix`/`nt` module. `os` is left alone, as code checks its
+        # functions by identity (e.g. `os.stat in os.supports_dir_fd`).
+        posix = _bootstrap_external._os
+        for attr in _PROBES:
+            if hasattr(posix, attr):
+                self._patch(posix, attr, self._probe(getattr(posix, attr)))
+        sys.meta_path[:] = [
+            finder if not hasattr(finder, "find_spec") else _TimedFinder(finder, self)
+            for finder in sys.meta_path
+        ]
+
+    def uninstall(self) -> None:
+        for obj, attr, value in reversed(self._patched):
+            setattr(obj, attr, value)
+        self._patched = []
+        # Keep any finders that were added while profiling.
+        sys.meta_path[:] = [
+            finder._finder if isinstance(finder, _TimedFinder) else finder
+            for finder in sys.meta_path
+        ]
+
+    def record_find(
+        self, finder: object, fullname: str, start: float, end: float
+    ) -> None:
+        name = getattr(finder, "__name__", None) or type(finder).__name__
+        self._finders[name] = self._finders.get(name, 0.0) + end - start
+        if self._stack:
+            self._stack[-1].find += end - start
+        self._events.append(self._event(name, "find", start, end, {"module": fullname}))
+
+    def _record_import(self, frame: _Frame, end: float) -> None:
+        total = end - frame.start
+        self_time = total - frame.children
+        if self._stack:
+            self._stack[-1].children += total
+        stats = self._stats.get(frame.name)
+        if stats is None:
+            stats = self._stats[frame.name] = _Stats()
+        stats.count += 1
+        stats.total += total
+        stats.self_time += self_time
+        stats.find += frame.find
+        stats.probes += frame.probes
+        self._events.append(
+            self._event(
+                frame.name,
+                "import",
+                frame.start,
+                end,
+                {
+                    "self_us": round(self_time * 1e6, 3),
+                    "find_us": round(frame.find * 1e6, 3),
+                    "probes": frame.probes,
+                },
+            )
+        )
+
+    def summary(self, elapsed: float) -> str:
+        lines = [
+            "imports: {}  elapsed: {:.1f}ms  fs probes: {}".format(
+                len(self._stats), elapsed * 1e3, self._probes
+            ),
+            "",
+            "finders:",
+        ]
+        for name, t in sorted(self._finders.items(), key=lambda i: -i[1]):
+            lines.append("  {:>10.3f}ms  {}".format(t * 1e3, name))
+        lines += [
+            "",
+            "{:>12} {:>12} {:>12} {:>12} {:>7}  {}".format(
+                "total(ms)", "self(ms)", "find(ms)", "load(ms)", "probes", "module"
+            ),
+        ]
+        for name, stats in sorted(
+            self._stats.items(), key=lambda i: (-i[1].total, i[0])
+        ):
+            lines.append(
+                "{:>12.3f} {:>12.3f} {:>12.3f} {:>12.3f} {:>7}  {}".format(
+                    stats.total * 1e3,
+                    stats.self_time * 1e3,
+                    stats.find * 1e3,
+                    # Finders for nested imports are already accounted for in
+                    # the children.
+                    max(stats.self_time - stats.find, 0.0) * 1e3,
+                    stats.probes,
+                    name,
+                )
+            )
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> None:
+        end = time.perf_counter()
+        self._events.append(self._event("startup", "startup", self._start, end))
+        with open(self.output, "w") as f:
+            json.dump(
+                {"traceEvents": self._events, "displayTimeUnit": "ms"},
+                f,
+                separators=(",", ":"),
+            )
+        with open(self.output + ".summary.txt", "w") as f:
+            f.write(self.summary(end - self._start))
+
+
+def start(output: str) -> ImportProfiler:
+    """Start profiling imports into `output`, if not already profiling."""
+    global _profiler
+    if _profiler is None:
+        _profiler = ImportProfiler(output)
+        _profiler.install()
+        # In case the main function is never reached.
+        atexit.register(stop)
+    return _profiler
+
+
+def start_from_env() -> ImportProfiler | None:
+    output = os.environ.pop(ENV_VAR, None)
+    if not output:
+        return _profiler
+    return start(output)
+
+
+def stop() -> None:
+    """Stop profiling, and write out the profile."""
+    global _profiler
+    profiler = _profiler
+    if profiler is None:
+        return
+    _profiler = None
+    atexit.unregister(stop)
+    profiler.uninstall()
+    try:
+        profiler.write()
+    except OSError as e:
+        print(
+            "Failed to write import profile to {}: {}".format(profiler.output, e),
+            file=sys.stderr,
+        )
@@ -18,16 +18,21 @@ main module, you can import this module as tools.test.stubs.fbpyunit, to access
 any of its code to help implement your main module.
 """
 
+import ast
 import contextlib
 import ctypes
 import fnmatch
+import hashlib
 import json
 import logging
 import optparse
 import os
 import platform
 import re
+import signal
 import sys
+import sysconfig
+import tempfile
 import time
 import traceback
 import unittest
@@ -132,6 +137,200 @@ def optimize_for_coverage(cov, include_patterns, omit_patterns):
         sys.meta_path.insert(0, DebugWipeFinder(matcher))
 
 
+class MonitoringCoverage:
+    """
+    A line coverage collector built on `sys.monitoring` (PEP 669, Python
+    3.12+), implementing the parts of the `coverage.Coverage` API the test
+    main uses.
+
+    Each code object in a file matched by `matcher` has line events enabled
+    the first time it starts, and each line event is disabled again after its
+    first hit, so code runs at full speed once it's been covered. Code in
+    other files only ever sees a single start event.
+    """
+
+    # `coverage`'s default exclusions.
+    EXCLUDE_RE = re.compile(
+        "|".join(
+            [
+                r"#\s*(pragma|PRAGMA)[:\s]?\s*(no|NO)\s*(cover|COVER)",
+                r"^\s*(((async )?def .*?)?[\])]+(\s*->.*?)?:\s*)?\.\.\.\s*(#|$)",
+                r"if (typing\.)?TYPE_CHECKING:",
+            ]
+        )
+    )
+
+    # Used by `MainProgram.run_tests`.
+    html_report = None
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self._tool = sys.monitoring.COVERAGE_ID
+        self._started = False
+        self._included = {}
+        self._lines = {}
+        self._codes = []
+        self._reported = {}
+
+    def start(self):
+        if self._started:
+            return
+        monitoring = sys.monitoring
+        monitoring.use_tool_id(self._tool, "buck test coverage")
+        # Events may have been disabled by a previous collector.
+        monitoring.restart_events()
+        monitoring.register_callback(
+            self._tool, monitoring.events.PY_START, self._on_start
+        )
+        monitoring.register_callback(self._tool, monitoring.events.LINE, self._on_line)
+        monitoring.set_events(self._tool, monitoring.events.PY_START)
+        self._started = True
+
+    def stop(self):
+        if not self._started:
+            return
+        monitoring = sys.monitoring
+        monitoring.set_events(self._tool, 0)
+        for code in self._codes:
+            monitoring.set_local_events(self._tool, code, 0)
+        monitoring.register_callback(self._tool, monitoring.events.PY_START, None)
+        monitoring.register_callback(self._tool, monitoring.events.LINE, None)
+        monitoring.free_tool_id(self._tool)
+        self._codes = []
+        self._started = False
+
+    def _on_start(self, code, instruction_offset):
+        filename = code.co_filename
+        included = self._included.get(filename)
+        if included is None:
+            included = self._included[filename] = os.path.exists(
+                filename
+            ) and self.matcher.include(filename)
+        if included:
+            self._codes.append(code)
+            sys.monitoring.set_local_events(
+                self._tool, code, sys.monitoring.events.LINE
+            )
+        return sys.monitoring.DISABLE
+
+    def _on_line(self, code, line_number):
+        lines = self._lines.get(code.co_filename)
+        if lines is None:
+            lines = self._lines[code.co_filename] = set()
+        lines.add(line_number)
+        return sys.monitoring.DISABLE
+
+    def _report_name(self, filename):
+        # Like `coverage`, report files under the working dir relative to it.
+        cwd = os.getcwd() + os.sep
+        if filename.startswith(cwd):
+            return filename[len(cwd) :]
+        return filename
+
+    def analysis2(self, name):
+        """
+        Return `(filename, statements, excluded, missing, "")` for a reported
+        file, like `coverage.Coverage.analysis2`.
+        """
+        filename = self._reported.get(name, name)
+        with open(filename, "rb") as f:
+            source = f.read()
+        tree = ast.parse(source, filename)
+
+        # Like `coverage`, count statements by their first line, and attribute
+        # the other lines of a statement (or of the header of a compound
+        # statement) to it. Docstrings and declarations, which don't compile to
+        # any code, aren't statements.
+        statements = set()
+        first_lines = {}
+        nodes = {}
+        docstrings = set()
+        for node in ast.walk(tree):
+            body = getattr(node, "body", None)
+            if (
+                isinstance(body, list)
+                and body
+                and isinstance(
+                    node,
+                    (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef),
+                )
+                and isinstance(body[0], ast.Expr)
+                and isinstance(body[0].value, ast.Constant)
+                and isinstance(body[0].value.value, str)
+            ):
+                docstrings.add(body[0])
+            if not isinstance(node, (ast.stmt, ast.ExceptHandler)) or isinstance(
+                node, (ast.Global, ast.Nonlocal)
+            ):
+                continue
+            nodes[node.lineno] = node
+            if node not in docstrings:
+                statements.add(node.lineno)
+            end_lineno = node.end_lineno
+            if isinstance(body, list) and body:
+                end_lineno = body[0].lineno - 1
+            for line in range(node.lineno, end_lineno + 1):
+                first_lines.setdefault(line, node.lineno)
+
+        executed = {
+            first_lines.get(line, line) for line in self._lines.get(filename, ())
+        }
+        executed &= statements
+
+        # A match on any line excludes the statement (or docstring) it's part
+        # of, and all of the body of a compound statement.
+        excluded = set()
+        lines = source.decode("utf-8", errors="replace").splitlines()
+        for i, line in enumerate(lines):
+            first_line = first_lines.get(i + 1)
+            if first_line is None or not self.EXCLUDE_RE.search(line):
+                continue
+            node = nodes[first_line]
+            excluded.add(first_line)
+            excluded.update(
+                body_line
+                for body_line in range(node.lineno, node.end_lineno + 1)
+                if body_line in statements
+            )
+        statements -= excluded
+        missing = statements - executed
+        return filename, sorted(statements), sorted(excluded), sorted(missing), ""
+
+    def report(self, file=None):
+        """
+        Write a summary of the coverage of each file, in the format of
+        `coverage.Coverage.report`.
+        """
+        file = file or sys.stdout
+        rows = []
+        for filename in sorted(self._lines):
+            name = self._report_name(filename)
+            self._reported[name] = filename
+            try:
+                _, statements, _, missing, _ = self.analysis2(name)
+            except (OSError, SyntaxError, ValueError):
+                # The file changed or went away while running.
+                continue
+            rows.append((name, len(statements), len(missing)))
+
+        def cover(stmts, miss):
+            return "%d%%" % (100 * (stmts - miss) // stmts if stmts else 100)
+
+        width = max([len(name) for name, _, _ in rows] + [len("TOTAL")])
+        header = "%-*s   Stmts   Miss  Cover" % (width, "Name")
+        file.write(header + "\n" + "-" * len(header) + "\n")
+        for name, stmts, miss in rows:
+            file.write(
+                "%-*s  %6d %6d %6s\n" % (width, name, stmts, miss, cover(stmts, miss))
+            )
+        stmts = sum(row[1] for row in rows)
+        miss = sum(row[2] for row in rows)
+        file.write("-" * len(header) + "\n")
+        file.write(
+            "%-*s  %6d %6d %6s\n" % (width, "TOTAL", stmts, miss, cover(stmts, miss))
+        )
+
+
 class TeeStream:
     def __init__(self, *streams):
         self._streams = streams
@@ -257,6 +456,7 @@ class BuckTestResult(unittest.TextTestResult):
                 # to using the id, which will likely be the method name as the test method.
                 test._testMethodName = test.id()
 
+        wall_time = time.time() - self._test_start_time
         self._results.append(
             {
                 "testCaseName": "{0}.{1}".format(
@@ -264,7 +464,9 @@ class BuckTestResult(unittest.TextTestResult):
                 ),
                 "testCase": test._testMethodName,
                 "type": self._current_status,
-                "time": int((time.time() - self._test_start_time) * 1000),
+                "time": int(wall_time * 1000),
+                "wallTime": wall_time,
+                "rssKb": _get_rss_kb(),
                 "message": os.linesep.join(self._messages),
                 "stacktrace": self._stacktrace,
                 "stdOut": self._stdout,
@@ -360,6 +562,56 @@ class BuckTestResult(unittest.TextTestResult):
         self.addStderr(string)
 
 
+def _get_rss_kb():
+    """
+    Return the resident set size of this process in KiB, or None where it
+    isn't available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _result_name(test):
+    return (
+        "{0}.{1}".format(test.__class__.__module__, test.__class__.__name__),
+        getattr(test, "_testMethodName", ""),
+    )
+
+
+class ShardedTestResult:
+    """
+    The merged results of running `tests` across several worker processes,
+    reported in the order of `tests`, as they would be by a serial run. It
+    implements the parts of `BuckTestResult` used by `MainProgram.run`.
+    """
+
+    def __init__(self, tests):
+        self._order = {_result_name(test): index for index, test in enumerate(tests)}
+        self._results = []
+        self._successful = True
+        self.testsRun = 0
+
+    def getResults(self):
+        return [result for _, _, result in sorted(self._results, key=lambda r: r[:2])]
+
+    def wasSuccessful(self):
+        return self._successful
+
+    def addShard(self, results, tests_run, successful):
+        # Results that aren't for one of the tests, e.g. for class fixture
+        # errors, stay after the result preceding them in the shard.
+        index = -1
+        for result in results:
+            index = self._order.get((result["testCaseName"], result["testCase"]), index)
+            self._results.append((index, len(self._results), result))
+        self.testsRun += tests_run
+        self._successful = self._successful and successful
+
+
 class BuckTestRunner(unittest.TextTestRunner):
     def __init__(self, main_program, suite, show_output=True, **kwargs):
         super(BuckTestRunner, self).__init__(**kwargs)
@@ -385,6 +637,80 @@ def _format_test_name(test_class, attrname):
     return "{0}.{1}#{2}".format(test_class.__module__, test_class.__name__, attrname)
 
 
+def _get_test_id(test):
+    return _format_test_name(test.__class__, getattr(test, "_testMethodName", ""))
+
+
+def load_duration_history(path):
+    """
+    Load the test durations (in seconds, keyed by test name) recorded by
+    previous runs, if any.
+    """
+    if not path:
+        return {}
+    try:
+        with open(path) as f:
+            history = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return history if isinstance(history, dict) else {}
+
+
+def update_duration_history(path, results):
+    """
+    Fold the wall times of `results` into the duration history at `path`.
+    """
+    history = load_duration_history(path)
+    for result in results:
+        wall_time = result.get("wallTime")
+        if wall_time is None:
+            continue
+        name = "{0}#{1}".format(result["testCaseName"], result["testCase"])
+        prev = history.get(name)
+        # Smooth out noisy runs a bit.
+        history[name] = wall_time if prev is None else (prev + wall_time) / 2
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(history, f, sort_keys=True, separators=(",", ":"))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def partition_tests(tests, jobs, history):
+    """
+    Split `tests` into at most `jobs` shards of about the same expected
+    duration, according to `history`.
+
+    Consecutive tests of the same class are kept together, so class fixtures
+    run once. Within a shard, tests keep their original order.
+    """
+    units = []
+    for index, test in enumerate(tests):
+        if units and units[-1][-1][1].__class__ is test.__class__:
+            units[-1].append((index, test))
+        else:
+            units.append([(index, test)])
+
+    # Tests we haven't seen before are assumed to be average.
+    default = sum(history.values()) / len(history) if history else 1.0
+
+    def cost(unit):
+        return sum(history.get(_get_test_id(test), default) for _, test in unit)
+
+    # Longest processing time first: give the next most expensive unit to the
+    # least loaded shard.
+    shards = [[0.0, []] for _ in range(min(jobs, len(units)))]
+    for unit in sorted(units, key=cost, reverse=True):
+        shard = min(shards, key=lambda s: s[0])
+        shard[0] += cost(unit)
+        shard[1].extend(unit)
+    return [[test for _, test in sorted(shard)] for _, shard in shards]
+
+
 class StderrLogHandler(logging.StreamHandler):
     """
     This class is very similar to logging.StreamHandler, except that it
@@ -489,6 +815,190 @@ class Loader:
         return loader.suiteClass(suites)
 
 
+def _describe_test(test):
+    """
+    Describe a test as `[module, qualname, name, method, description]`, which
+    is all `--list` needs to know about it. `description` is only set for
+    tests that aren't test case methods.
+    """
+    method_name = getattr(test, "_testMethodName", "")
+    cls = test.__class__
+    return [
+        cls.__module__,
+        cls.__qualname__,
+        cls.__name__,
+        method_name,
+        None if method_name else str(test),
+    ]
+
+
+def _format_listed_test(description, list_format):
+    module, qualname, name, method_name, test_str = description
+    if list_format == "python":
+        # Python 3.12 changed the implementation of `TestCase.__str__`.
+        # We construct the name manually here to ensure consistency between
+        # Python versions.
+        # Example: "test_basic (tests.test_object.TestAbsent)".
+        if method_name:
+            return f"{method_name} ({module}.{qualname})"
+        return test_str
+    elif list_format == "buck":
+        return "{0}.{1}#{2}".format(module, name, method_name)
+    raise Exception("Bad test list format: %s" % (list_format,))
+
+
+def _matches_regex(description, robj):
+    module, _, name, method_name, _ = description
+    # Like `RegexTestLoader`, which only filters test case methods.
+    return not method_name or robj.search(
+        "{0}.{1}#{2}".format(module, name, method_name)
+    )
+
+
+def _file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class TestListCache:
+    """
+    A cache of the tests found in each test module, so that tests can be
+    listed, and selected by regex, without importing the test modules.
+
+    Listings are keyed by a hash of the test modules and their sources, which
+    are located on `sys.path` without importing anything. A listing also
+    records the sources of every module imported while discovering the tests
+    (outside of the standard library), and of every module defining a test
+    case class or one of its bases, and is only used while those are
+    unchanged. Modules that customize loading with `load_tests` are never
+    cached, and are imported whenever tests are listed.
+    """
+
+    VERSION = 1
+
+    def __init__(self, cache_dir, modules):
+        self.cache_dir = cache_dir
+        self.modules = list(modules)
+        self._path = None
+
+    @staticmethod
+    def _find_source(module_name):
+        parts = module_name.split(".")
+        for entry in sys.path:
+            base = os.path.join(entry or ".", *parts)
+            for path in (base + ".py", os.path.join(base, "__init__.py")):
+                if os.path.isfile(path):
+                    return path
+        return None
+
+    def path(self):
+        """
+        The path of the listing for the current test modules, or None if
+        their sources can't be found.
+        """
+        if self._path is None:
+            h = hashlib.sha256()
+            h.update(("%d\0%s\0" % (self.VERSION, sys.version)).encode("utf-8"))
+            for module_name in self.modules:
+                source = self._find_source(module_name)
+                digest = source and _file_digest(source)
+                if digest is None:
+                    return None
+                h.update(("%s\0%s\0" % (module_name, digest)).encode("utf-8"))
+            self._path = os.path.join(self.cache_dir, h.hexdigest() + ".json")
+        return self._path
+
+    def load(self):
+        """
+        Return the cached `(module, descriptions)` listing for the test
+        modules, where `descriptions` is None for modules which must be
+        loaded, or None if there's no valid listing.
+        """
+        path = self.path()
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("version") != self.VERSION:
+            return None
+        listing = cached["modules"]
+        if [name for name, _ in listing] != self.modules:
+            return None
+        for dep, digest in cached["deps"].items():
+            if _file_digest(dep) != digest:
+                return None
+        return listing
+
+    def store(self, test_suite, imported=()):
+        """
+        Cache the listing of `test_suite`, as loaded by `Loader.load_all`, with
+        one suite per test module, and the names of the modules `imported`
+        while loading it, which e.g. generate tests dynamically.
+        """
+        path = self.path()
+        module_suites = list(test_suite)
+        if path is None or len(module_suites) != len(self.modules):
+            return
+
+        listing = []
+        deps = {}
+        # The standard library only changes along with `sys.version`, unlike
+        # site-packages, which is usually inside it.
+        paths = sysconfig.get_paths()
+        stdlib = tuple(
+            os.path.join(paths[name], "") for name in ("stdlib", "platstdlib")
+        )
+        site_packages = tuple(
+            os.path.join(paths[name], "") for name in ("purelib", "platlib")
+        )
+        for module_name in sorted(imported):
+            dep = getattr(sys.modules.get(module_name), "__file__", None)
+            if not dep or dep in deps:
+                continue
+            if dep.startswith(stdlib) and not dep.startswith(site_packages):
+                continue
+            deps[dep] = _file_digest(dep)
+        for module_name, suite in zip(self.modules, module_suites):
+            if hasattr(sys.modules.get(module_name), "load_tests"):
+                listing.append([module_name, None])
+                continue
+            descriptions = []
+            stack = [suite]
+            while stack:
+                test = stack.pop()
+                if isinstance(test, unittest.TestSuite):
+                    stack.extend(reversed(list(test)))
+                    continue
+                descriptions.append(_describe_test(test))
+                for cls in type(test).__mro__:
+                    if cls.__module__.split(".")[0] in ("builtins", "unittest"):
+                        continue
+                    dep = getattr(sys.modules.get(cls.__module__), "__file__", None)
+                    if dep and dep not in deps:
+                        deps[dep] = _file_digest(dep)
+            listing.append([module_name, descriptions])
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(
+                    {"version": self.VERSION, "modules": listing, "deps": deps},
+                    f,
+                    separators=(",", ":"),
+                )
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
 class MainProgram:
     """
     This class implements the main program.  It can be subclassed by
@@ -544,18 +1054,47 @@ class MainProgram:
             default="python",
             help="List tests format",
         )
+        op.add_option(
+            "--list-cache",
+            default=os.environ.get("PYTHON_TEST_LIST_CACHE"),
+            help="A directory to cache test listings in, to list and select "
+            "tests by regex without importing test modules",
+        )
         op.add_option(
             "-r",
             "--regex",
             default=None,
             help="Regex to apply to tests, to only run those tests",
         )
+        op.add_option(
+            "-j",
+            "--jobs",
+            type="int",
+            default=1,
+            help="Run tests in this many forked worker processes (0 to use "
+            "one per CPU). Ignored when collecting coverage.",
+        )
+        op.add_option(
+            "--duration-history",
+            default=None,
+            help="A file of test durations, used to balance tests across "
+            "workers and updated with the durations of this run",
+        )
         op.add_option(
             "--collect-coverage",
             action="store_true",
             default=False,
             help="Collect test coverage information",
         )
+        op.add_option(
+            "--coverage-collector",
+            choices=["auto", "coverage", "monitoring"],
+            default="coverage",
+            help="How to collect coverage: with the `coverage` module (the "
+            "default), or with the builtin `sys.monitoring` collector (Python "
+            "3.12+), which is faster but approximate. `auto` uses the latter "
+            "when it's available.",
+        )
         op.add_option(
             "--coverage-include",
             default="*",
@@ -595,8 +1134,16 @@ class MainProgram:
         self.options, self.test_args = self.option_parser.parse_args(argv[1:])
         self.options.verbosity -= self.options.quiet
 
-        if self.options.collect_coverage and coverage is None:
-            self.option_parser.error("coverage module is not available")
+        if self.options.coverage_collector == "auto":
+            self.options.coverage_collector = (
+                "monitoring" if hasattr(sys, "monitoring") else "coverage"
+            )
+        if self.options.collect_coverage:
+            if self.options.coverage_collector == "monitoring":
+                if not hasattr(sys, "monitoring"):
+                    self.option_parser.error("sys.monitoring is not available")
+            elif coverage is None:
+                self.option_parser.error("coverage module is not available")
         self.options.coverage_include = self.options.coverage_include.split(",")
         if self.options.coverage_omit == "":
             self.options.coverage_omit = []
@@ -644,13 +1191,26 @@ class MainProgram:
 
         return Loader(__test_modules__.TEST_MODULES, self.options.regex)
 
-    def load_tests(self):
+    def load_tests(self, listing=None):
         loader = self.create_loader()
+        if listing is not None and self.options.regex is not None:
+            # Only import the test modules that have tests to run.
+            robj = re.compile(self.options.regex)
+            loader.modules = [
+                module_name
+                for module_name, descriptions in listing
+                if descriptions is None
+                or any(_matches_regex(d, robj) for d in descriptions)
+            ]
         if self.options.collect_coverage:
             self.start_coverage()
             include = self.options.coverage_include
             omit = self.options.coverage_omit
-            if include and "*" not in include:
+            if (
+                include
+                and "*" not in include
+                and self.options.coverage_collector == "coverage"
+            ):
                 optimize_for_coverage(self.cov, include, omit)
 
         if self.test_args:
@@ -672,34 +1232,57 @@ class MainProgram:
 
         return tests
 
+    def get_list_cache(self):
+        # The cache only helps with listing, and with selecting tests by regex.
+        if (
+            not self.options.list_cache
+            or self.test_args
+            or not (self.options.list or self.options.regex)
+        ):
+            return None
+        loader = self.create_loader()
+        if not isinstance(loader, Loader):
+            return None
+        return TestListCache(self.options.list_cache, loader.modules)
+
+    def list_cached_tests(self, listing):
+        robj = re.compile(self.options.regex) if self.options.regex else None
+        for module_name, descriptions in listing:
+            if descriptions is None:
+                loader = self.create_loader()
+                loader.modules = [module_name]
+                descriptions = [
+                    _describe_test(test) for test in self.get_tests(loader.load_all())
+                ]
+            elif robj is not None:
+                descriptions = [d for d in descriptions if _matches_regex(d, robj)]
+            for description in descriptions:
+                print(_format_listed_test(description, self.options.list_format))
+        return EXIT_CODE_SUCCESS
+
     def run(self):
-        test_suite = self.load_tests()
+        list_cache = self.get_list_cache()
+        listing = list_cache.load() if list_cache is not None else None
+        if self.options.list and listing is not None:
+            return self.list_cached_tests(listing)
+
+        imported_before = set(sys.modules)
+        test_suite = self.load_tests(listing)
 
         if self.options.list:
+            if list_cache is not None and self.options.regex is None:
+                list_cache.store(test_suite, set(sys.modules) - imported_before)
             for test in self.get_tests(test_suite):
-                # Python 3.12 changed the implementation of `TestCase.__str__`.
-                # We construct the name manually here to ensure consistency between
-                # Python versions.
-                # Example: "test_basic (tests.test_object.TestAbsent)".
-                method_name = getattr(test, "_testMethodName", "")
-                cls = test.__class__
-                if self.options.list_format == "python":
-                    if method_name:
-                        name = f"{method_name} ({cls.__module__}.{cls.__qualname__})"
-                    else:
-                        name = str(test)
-
-                elif self.options.list_format == "buck":
-                    name = _format_test_name(cls, method_name)
-                else:
-                    raise Exception(
-                        "Bad test list format: %s" % (self.options.list_format,)
-                    )
-
-                print(name)
+                print(
+                    _format_listed_test(_describe_test(test), self.options.list_format)
+                )
             return EXIT_CODE_SUCCESS
         else:
             result = self.run_tests(test_suite)
+            if self.options.duration_history:
+                update_duration_history(
+                    self.options.duration_history, result.getResults()
+                )
             if self.options.output is not None:
                 with open(self.options.output, "w") as f:
                     json.dump(result.getResults(), f, indent=4, sort_keys=True)
@@ -707,10 +1290,21 @@ class MainProgram:
                 return EXIT_CODE_TEST_FAILURE
             return EXIT_CODE_SUCCESS
 
+    def get_jobs(self):
+        jobs = self.options.jobs
+        if jobs == 0:
+            jobs = os.cpu_count() or 1
+        if self.options.collect_coverage or not hasattr(os, "fork"):
+            return 1
+        return jobs
+
     def run_tests(self, test_suite):
         # Install a signal handler to catch Ctrl-C and display the results
         unittest.installHandler()
 
+        if self.get_jobs() > 1:
+            return self.run_tests_in_workers(test_suite)
+
         # Run the tests
         runner = BuckTestRunner(
             self,
@@ -729,6 +1323,111 @@ class MainProgram:
 
         return result
 
+    def run_tests_in_workers(self, test_suite):
+        tests = self.get_tests(test_suite)
+        history = load_duration_history(self.options.duration_history)
+        shards = partition_tests(tests, self.get_jobs(), history)
+
+        start_time = time.time()
+        result = ShardedTestResult(tests)
+        with tempfile.TemporaryDirectory() as tmp:
+            workers = []
+            for i, shard in enumerate(shards):
+                path = os.path.join(tmp, "shard-%d.json" % i)
+                sys.stdout.flush()
+                sys.stderr.flush()
+                pid = os.fork()
+                if pid == 0:
+                    try:
+                        self.run_shard(shard, path)
+                    except BaseException:
+                        traceback.print_exc()
+                        os._exit(1)
+                    os._exit(0)
+                workers.append((pid, shard, path))
+
+            for pid, shard, path in workers:
+                _, status = os.waitpid(pid, 0)
+                try:
+                    with open(path) as f:
+                        shard_result = json.load(f)
+                except (OSError, ValueError):
+                    shard_result = None
+                if shard_result is not None:
+                    sys.stderr.write(shard_result["output"])
+                    result.addShard(
+                        shard_result["results"],
+                        shard_result["testsRun"],
+                        shard_result["successful"],
+                    )
+                else:
+                    # The worker died (e.g. crashed in native code), so fail
+                    # all of its tests.
+                    code = os.waitstatus_to_exitcode(status)
+                    if code < 0:
+                        message = "Test worker was killed by signal %s" % (
+                            signal.Signals(-code).name
+                        )
+                    else:
+                        message = "Test worker exited with status %d" % code
+                    sys.stderr.write(message + os.linesep)
+                    aborted = []
+                    for test in shard:
+                        test_case_name, test_case = _result_name(test)
+                        aborted.append(
+                            {
+                                "testCaseName": test_case_name,
+                                "testCase": test_case,
+                                "type": TestStatus.ABORTED,
+                                "time": 0,
+                                # Unknown, and kept out of the duration history.
+                                "wallTime": None,
+                                "rssKb": None,
+                                "message": message,
+                                "stacktrace": None,
+                                "stdOut": "",
+                                "stdErr": "",
+                            }
+                        )
+                    result.addShard(aborted, len(shard), False)
+
+        sys.stderr.write(
+            "%s\nRan %d tests in %.3fs using %d workers\n\n%s\n"
+            % (
+                unittest.TextTestResult.separator2,
+                result.testsRun,
+                time.time() - start_time,
+                len(shards),
+                "OK" if result.wasSuccessful() else "FAILED",
+            )
+        )
+        return result
+
+    def run_shard(self, tests, path):
+        """
+        Run `tests` in a worker process, writing the results to `path`.
+        """
+        suite = unittest.TestSuite(tests)
+        output = StringIO()
+        runner = BuckTestRunner(
+            self,
+            suite,
+            verbosity=self.options.verbosity,
+            show_output=self.options.show_output,
+            stream=output,
+        )
+        result = runner.run(suite)
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "results": result.getResults(),
+                    "testsRun": result.testsRun,
+                    "successful": result.wasSuccessful(),
+                    "output": output.getvalue(),
+                },
+                f,
+            )
+
     def start_coverage(self):
         if not self.options.collect_coverage:
             return
@@ -736,6 +1435,13 @@ class MainProgram:
         # Keep the original working dir in case tests use os.chdir
         self._original_working_dir = os.getcwd()
 
+        if self.options.coverage_collector == "monitoring":
+            self.cov = MonitoringCoverage(
+                PathMatcher(self.options.coverage_include, self.options.coverage_omit)
+            )
+            self.cov.start()
+            return
+
         self.cov = coverage.Coverage(
             include=self.options.coverage_include, omit=self.options.coverage_omit
         )
@@ -752,11 +1458,13 @@ class MainProgram:
 
         self.cov.stop()
 
+        # The `coverage` module may be missing with the monitoring collector.
+        no_data = (coverage.misc.CoverageException,) if coverage is not None else ()
         try:
             f = StringIO()
             self.cov.report(file=f)
             lines = f.getvalue().split("\n")
-        except coverage.misc.CoverageException:
+        except no_data:
             # Nothing was covered. That's fine by us
             return result
 
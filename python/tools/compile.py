@@ -23,16 +23,30 @@ compile.py --output=out-dir --bytecode-manifest=output.manifest --ignore-errors
 
 import argparse
 import errno
+import hashlib
 import importlib
 import importlib.util
 import json
 import os
 import re
+import shutil
 import sys
+import tempfile
 import traceback
 from functools import partial
 from py_compile import compile, PycInvalidationMode, PyCompileError
 from types import TracebackType
+from typing import Optional
+
+try:
+    from manifests import load_manifest
+except ImportError:
+    # This script is usually exported on its own and run with the target
+    # interpreter, in which case only JSON manifests are supported.
+    def load_manifest(path: str) -> list[tuple[str, str, str]]:
+        with open(path) as f:
+            return json.load(f)
+
 
 DEFAULT_FORMAT: str = importlib.util.cache_from_source("{pkg}/{name}.py")
 
@@ -133,6 +147,132 @@ def pretty_exception(
         traceback.print_exception(typ, exc, tb)
 
 
+class PycCache:
+    """
+    Content-addressed store of previously compiled `.pyc` files.
+
+    Entries are keyed on everything that affects the bytecode: the source
+    contents, the interpreter's magic number and optimization level, the
+    invalidation mode and the `dfile` path embedded in code objects. Hits are
+    hardlinked (or copied) into place and have their mtime bumped, which is
+    what `evict` uses to approximate LRU order.
+    """
+
+    def __init__(self, root: str, max_size: Optional[int]) -> None:
+        self.root = root
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _mkdirs(root)
+
+    def key(self, src: str, dfile: str, invalidation_mode: PycInvalidationMode) -> str:
+        h = hashlib.sha256()
+        h.update(importlib.util.MAGIC_NUMBER)
+        h.update(f"\0{sys.flags.optimize}\0{invalidation_mode.name}\0".encode())
+        h.update(dfile.encode())
+        h.update(b"\0")
+        with open(src, "rb") as f:
+            h.update(f.read())
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".pyc")
+
+    def fetch(self, key: str, pyc: str) -> bool:
+        path = self._path(key)
+        try:
+            try:
+                os.link(path, pyc)
+            except FileExistsError:
+                os.unlink(pyc)
+                os.link(path, pyc)
+            except OSError:
+                shutil.copyfile(path, pyc)
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def store(self, key: str, pyc: str) -> None:
+        path = self._path(key)
+        _mkdirs(os.path.dirname(path))
+        # Write to a temp file and rename so concurrent actions sharing the
+        # cache never observe a partially written entry.
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out, open(pyc, "rb") as f:
+                shutil.copyfileobj(f, out)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def evict(self) -> None:
+        if self.max_size is None:
+            return
+        entries = []
+        total = 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                # Leave other actions' in-flight writes alone.
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    # Evicted by a concurrent action.
+                    continue
+                entries.append((st.st_mtime, entry.path, st.st_size))
+                total += st.st_size
+        entries.sort()
+        for _, path, size in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _compile_one(
+    src: str, pyc: str, dfile: str, invalidation_mode: PycInvalidationMode
+) -> None:
+    compile(
+        src,
+        cfile=pyc,
+        dfile=dfile,
+        doraise=True,
+        invalidation_mode=invalidation_mode,
+    )
+
+
+def _try_compile_one(
+    entry: tuple[str, str, str, str], invalidation_mode: PycInvalidationMode
+) -> bool:
+    # `PyCompileError` can't be pickled back across the process boundary, so
+    # workers only report success and the parent recompiles the failure.
+    _, pyc, src, dfile = entry
+    try:
+        _compile_one(src, pyc, dfile, invalidation_mode)
+    except PyCompileError:
+        return False
+    return True
+
+
 def main(argv: list[str]) -> None:
     parser = argparse.ArgumentParser(fromfile_prefix_chars="@")
     parser.add_argument("-o", "--output", required=True)
@@ -151,17 +291,38 @@ def main(argv: list[str]) -> None:
         action="store_true",
         default=False,
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes to compile with (0 means one per CPU)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory of previously compiled bytecode to reuse across actions",
+    )
+    parser.add_argument(
+        "--cache-max-size",
+        type=int,
+        help="Evict least recently used cache entries beyond this many bytes",
+    )
+    parser.add_argument(
+        "--cache-stats",
+        type=argparse.FileType("w"),
+        help="Write the cache's hit, miss and eviction counts here, as JSON",
+    )
     parser.add_argument("manifests", nargs="*")
     args = parser.parse_args(argv[1:])
     invalidation_mode = PycInvalidationMode.__members__[args.invalidation_mode]
-    bytecode_manifest = []
+    jobs = args.jobs or os.cpu_count() or 1
 
     _mkdirs(args.output)
 
+    # (dest_pyc, pyc, src, dfile), in manifest order.
+    entries = []
     for manifest_path in args.manifests:
-        with open(manifest_path) as mf:
-            manifest = json.load(mf)
-        for dst, src, _ in manifest:
+        for dst, src, _ in load_manifest(manifest_path):
             # This is going to try to turn a path into a Python module, so
             # reduce the scope for bugs in get_pyc_path by normalizing first.
             dst = os.path.normpath(dst)
@@ -172,21 +333,69 @@ def main(argv: list[str]) -> None:
             module = base.replace(os.sep, ".")
             dest_pyc = get_pyc_path(module, args.format)
             pyc = os.path.join(args.output, dest_pyc)
-            _mkdirs(os.path.dirname(pyc))
-            try:
-                compile(
-                    src,
-                    cfile=pyc,
-                    dfile=get_py_path(module),
-                    doraise=True,
-                    invalidation_mode=invalidation_mode,
+            entries.append((dest_pyc, pyc, src, get_py_path(module)))
+
+    for pyc_dir in sorted({os.path.dirname(pyc) for _, pyc, _, _ in entries}):
+        _mkdirs(pyc_dir)
+
+    # Timestamp based pycs embed the source mtime, so they can't be shared
+    # between identical sources.
+    cache = None
+    if (
+        args.cache_dir is not None
+        and invalidation_mode != PycInvalidationMode.TIMESTAMP
+    ):
+        cache = PycCache(args.cache_dir, args.cache_max_size)
+    cache_keys = {}
+    to_compile = entries
+    if cache is not None:
+        to_compile = []
+        for entry in entries:
+            _, pyc, src, dfile = entry
+            key = cache.key(src, dfile, invalidation_mode)
+            if not cache.fetch(key, pyc):
+                cache_keys[pyc] = key
+                to_compile.append(entry)
+
+    if jobs > 1 and len(to_compile) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(
+                pool.map(
+                    partial(_try_compile_one, invalidation_mode=invalidation_mode),
+                    to_compile,
+                    chunksize=max(1, len(to_compile) // (jobs * 8)),
                 )
-            except PyCompileError:
-                if not args.debug:
-                    sys.excepthook = partial(pretty_exception, src=src)
-                raise
-            bytecode_manifest.append((dest_pyc, pyc, src))
+            )
+        # Only the first failure (in manifest order) is reported, as it would
+        # be when compiling serially.
+        failed = [entry for entry, ok in zip(to_compile, results) if not ok][:1]
+    else:
+        failed = to_compile
+
+    for _, pyc, src, dfile in failed:
+        try:
+            _compile_one(src, pyc, dfile, invalidation_mode)
+        except PyCompileError:
+            if not args.debug:
+                sys.excepthook = partial(pretty_exception, src=src)
+            raise
+
+    if cache is not None:
+        for _, pyc, _, _ in to_compile:
+            cache.store(cache_keys[pyc], pyc)
+        cache.evict()
+    if args.cache_stats is not None:
+        # Empty when there's no cache, e.g. for timestamp based pycs.
+        stats = cache.stats() if cache is not None else {}
+        json.dump(stats, args.cache_stats, indent=2)
+        args.cache_stats.close()
+
+    bytecode_manifest = [(dest_pyc, pyc, src) for dest_pyc, pyc, src, _ in entries]
     json.dump(bytecode_manifest, args.bytecode_manifest, indent=2)
+    args.bytecode_manifest.close()
 
 
-sys.exit(main(sys.argv))
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -9,9 +9,78 @@
 # pyre-strict
 
 import argparse
-import json
 import os
 import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, NamedTuple
+
+from manifests import load_manifest
+
+# `FICLONE` from linux/fs.h, to reflink files on filesystems that support it.
+_FICLONE = 0x40049409
+
+
+class _Entry(NamedTuple):
+    dst: str
+    src: str
+    symlink: bool
+
+
+def _clone(fsrc: BinaryIO, fdst: BinaryIO) -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+
+    try:
+        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+    except OSError:
+        return False
+    return True
+
+
+def _copy_file_range(fsrc: BinaryIO, fdst: BinaryIO) -> bool:
+    if not hasattr(os, "copy_file_range"):
+        return False
+    size = os.fstat(fsrc.fileno()).st_size
+    offset = 0
+    try:
+        while offset < size:
+            copied = os.copy_file_range(
+                fsrc.fileno(), fdst.fileno(), size - offset, offset, offset
+            )
+            if copied == 0:
+                break
+            offset += copied
+    except OSError:
+        if offset:
+            raise
+        # Unsupported between these filesystems, fall back to a plain copy.
+        return False
+    return True
+
+
+def _copy(src: str, dst: str) -> None:
+    """
+    Like `shutil.copy2(src, dst, follow_symlinks=False)`, but refusing to
+    overwrite `dst`, and reflinking or copying in-kernel where possible.
+    """
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dst)
+        shutil.copystat(src, dst, follow_symlinks=False)
+        return
+    with open(src, "rb") as fsrc, open(dst, "xb") as fdst:
+        if not _clone(fsrc, fdst) and not _copy_file_range(fsrc, fdst):
+            shutil.copyfileobj(fsrc, fdst, 1 << 20)
+    shutil.copystat(src, dst)
+
+
+def _materialize(entries: list[_Entry]) -> None:
+    for entry in entries:
+        if entry.symlink:
+            os.symlink(entry.src, entry.dst)
+        else:
+            _copy(entry.src, entry.dst)
 
 
 def main() -> None:
@@ -23,6 +92,13 @@ def main() -> None:
     parser.add_argument(
         "--copy-manifest", dest="copy_manifests", action="append", default=[]
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=min(32, (os.cpu_count() or 1) + 4),
+        help="Number of threads to create links and copies with",
+    )
     args = parser.parse_args()
 
     os.makedirs(args.output)
@@ -36,37 +112,47 @@ def main() -> None:
         if parent:
             _add_pkg(parent)
 
+    # Plan every entry up front, so conflicts are found before touching the
+    # filesystem and the tree can then be materialized in any order.
+    planned: dict[str, _Entry] = {}
     for symlink, manifest in [(True, m) for m in args.link_manifests] + [
         (False, m) for m in args.copy_manifests
     ]:
-        with open(manifest, "r") as f:
-            for dst, src, _ in json.load(f):
-                # Record pkgs and the ones w/ `__init__.py` files already.
-                if dst.endswith((".py", ".so")):
-                    pkg = os.path.dirname(dst)
-                    _add_pkg(pkg)
-                    if os.path.basename(dst) == "__init__.py":
-                        pkgs_with_init.add(pkg)
-
-                dst = os.path.join(args.output, dst)
-                os.makedirs(os.path.dirname(dst), exist_ok=True)
-
-                # Create symlink.
-                if symlink:
-                    src = os.path.relpath(src, start=os.path.dirname(dst))
-                    try:
-                        os.symlink(src, dst)
-                    except FileExistsError:
-                        # Only fail is the symlink we're going to create would be
-                        # different.
-                        current_src = os.readlink(dst)
-                        if current_src != src:
-                            raise RuntimeError(
-                                f"conflict for source {dst}: {src} and {current_src}"
-                            )
-                else:
-                    assert not os.path.exists(dst)
-                    shutil.copy2(src, dst, follow_symlinks=False)
+        for dst, src, _ in load_manifest(manifest):
+            # Record pkgs and the ones w/ `__init__.py` files already.
+            if dst.endswith((".py", ".so")):
+                pkg = os.path.dirname(dst)
+                _add_pkg(pkg)
+                if os.path.basename(dst) == "__init__.py":
+                    pkgs_with_init.add(pkg)
+
+            dst = os.path.normpath(os.path.join(args.output, dst))
+            if symlink:
+                src = os.path.relpath(src, start=os.path.dirname(dst))
+
+            prev = planned.get(dst)
+            if prev is None:
+                planned[dst] = _Entry(dst, src, symlink)
+            # Only fail if the symlink we're going to create would be
+            # different. Copies may never replace an existing entry.
+            elif not (symlink and prev.symlink and prev.src == src):
+                raise RuntimeError(f"conflict for source {dst}: {src} and {prev.src}")
+
+    # Create each directory once, parents first.
+    for d in sorted({os.path.dirname(dst) for dst in planned}):
+        os.makedirs(d, exist_ok=True)
+
+    entries = list(planned.values())
+    jobs = max(1, min(args.jobs, len(entries)))
+    if jobs == 1:
+        _materialize(entries)
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            # Materialize in a handful of batches per thread, as individual
+            # symlinks are too cheap to be worth a future each.
+            batches = [entries[i :: jobs * 4] for i in range(jobs * 4)]
+            for _ in pool.map(_materialize, batches):
+                pass
 
     # Create any missing ones.
     for pkg in pkgs - pkgs_with_init:
@@ -14,6 +14,122 @@ import json
 import os
 import re
 import sys
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import IO, Optional
+
+
+def _scan(path: str) -> tuple[list[str], list[str]]:
+    """
+    Return the sorted files and subdirectories of `path`, classified the same
+    way as `os.walk` does (symlinks to directories are neither walked nor
+    listed as files), or nothing if it can't be read.
+    """
+    files = []
+    dirs = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    files.append(entry.name)
+                elif not entry.is_symlink():
+                    dirs.append(entry.name)
+    except OSError:
+        pass
+    files.sort()
+    dirs.sort()
+    return files, dirs
+
+
+def walk(
+    top: str,
+    exclude: Optional[re.Pattern[str]] = None,
+    exclude_dir: Optional[re.Pattern[str]] = None,
+) -> Iterator[str]:
+    """
+    Yield the paths of the files under `top`, in the same order as a sorted
+    `os.walk`, skipping files whose path matches `exclude` and not descending
+    into directories whose path matches `exclude_dir`.
+    """
+    stack = [top]
+    while stack:
+        root = stack.pop()
+        files, dirs = _scan(root)
+        for name in files:
+            path = os.path.join(root, name)
+            if exclude is None or not exclude.search(path):
+                yield path
+        for name in reversed(dirs):
+            path = os.path.join(root, name)
+            if exclude_dir is None or not exclude_dir.search(path):
+                stack.append(path)
+
+
+def walk_parallel(
+    top: str,
+    exclude: Optional[re.Pattern[str]] = None,
+    exclude_dir: Optional[re.Pattern[str]] = None,
+    jobs: int = 1,
+) -> Iterator[str]:
+    """
+    Like `walk`, but walks the top-level subtrees in parallel. Each subtree is
+    yielded once it and those before it are walked, and only a few subtrees
+    beyond the one being yielded are walked ahead, to bound memory.
+    """
+    if jobs <= 1:
+        yield from walk(top, exclude, exclude_dir)
+        return
+    files, dirs = _scan(top)
+    for name in files:
+        path = os.path.join(top, name)
+        if exclude is None or not exclude.search(path):
+            yield path
+    subtrees = (
+        path
+        for path in (os.path.join(top, name) for name in dirs)
+        if exclude_dir is None or not exclude_dir.search(path)
+    )
+
+    def walk_subtree(subtree: str) -> list[str]:
+        return list(walk(subtree, exclude, exclude_dir))
+
+    window: deque[Future[list[str]]] = deque()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for subtree in subtrees:
+            if len(window) >= jobs * 2:
+                yield from window.popleft().result()
+            window.append(pool.submit(walk_subtree, subtree))
+        while window:
+            yield from window.popleft().result()
+
+
+def write_entries(
+    out: IO[str],
+    paths: Iterator[str],
+    extracted: str,
+    prefix: Optional[str],
+    origin: Optional[str],
+) -> None:
+    """Stream the manifest as a compact JSON list, one entry per line."""
+    encode = json.JSONEncoder(separators=(",", ":")).encode
+    out.write("[")
+    sep = "\n"
+    for path in paths:
+        dest = os.path.relpath(path, extracted)
+        if prefix is not None:
+            dest = os.path.join(prefix, dest)
+        entry = [dest, path]
+        if origin is not None:
+            entry.append(origin)
+        out.write(sep)
+        out.write(encode(entry))
+        sep = ",\n"
+    out.write("\n]\n")
 
 
 def main(argv: list[str]) -> None:
@@ -22,34 +138,30 @@ def main(argv: list[str]) -> None:
     parser.add_argument("--origin", help="description of source origin")
     parser.add_argument("--prefix", help="prefix to prepend to destinations")
     parser.add_argument("--exclude", help="RE pattern to exclude files")
+    parser.add_argument(
+        "--exclude-dir",
+        help="RE pattern to exclude directories, which aren't walked at all",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of top-level subtrees to walk in parallel",
+    )
     parser.add_argument("extracted", help="path to directory of sources")
     args = parser.parse_args(argv[1:])
 
     exclude = None
     if args.exclude:
         exclude = re.compile(args.exclude)
+    exclude_dir = None
+    if args.exclude_dir:
+        exclude_dir = re.compile(args.exclude_dir)
 
-    entries = []
-    for root, dirs, files in os.walk(args.extracted):
-        # Ensure a consistent iteration order.
-        # Sorting dirs in place affects the future iteration
-        # order of os.walk.
-        dirs.sort()
-        files.sort()
-        for name in files:
-            path = os.path.join(root, name)
-            if exclude is not None and exclude.search(path):
-                continue
-            dest = os.path.relpath(path, args.extracted)
-            if args.prefix is not None:
-                dest = os.path.join(args.prefix, dest)
-            entry = [dest, path]
-            if args.origin is not None:
-                entry.append(args.origin)
-            entries.append(entry)
-
-    json.dump(entries, args.output, indent=2)
+    paths = walk_parallel(args.extracted, exclude, exclude_dir, args.jobs)
+    write_entries(args.output, paths, args.extracted, args.prefix, args.origin)
     args.output.close()
 
 
-sys.exit(main(sys.argv))
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
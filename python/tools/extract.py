@@ -17,15 +17,17 @@ place, without copying, when ``--output`` is omitted.
 
 import argparse
 import configparser
-import glob
 import json
 import os
 import shutil
 import stat
 import tarfile
-import tempfile
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import NamedTuple
+
+_BUFFER_SIZE: int = 1 << 20
 
 
 def strip_soabi_tag(path: Path) -> Path | None:
@@ -55,44 +57,199 @@ def strip_soabi_tag(path: Path) -> Path | None:
     return path.with_suffix("").with_suffix(ext)
 
 
-# shutil.unpack_archive calls zipfile.extract which does *not* preserve file attributes
-# (see https://bugs.python.org/issue15795, https://stackoverflow.com/questions/39296101/python-zipfile-removes-execute-permissions-from-binaries).
-#
-# We need to preserve at least the executable bit.
-def extract(src: Path, dst_dir: Path, strip_soabi_tags: bool = False) -> None:
-    if src.suffixes[-2:] == [".tar", ".gz"]:
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            with tarfile.open(src) as tf:
-                tf.extractall(tmp_dir)
-
-            # We expect the tgz to contain a single top-level dir with all the
-            # items to unpack.
-            (path,) = glob.glob(os.path.join(tmp_dir, "*"))
-            for ent in os.listdir(path):
-                fsrc = os.path.join(path, ent)
-                fdst = Path(os.path.join(dst_dir, ent))
-                soabi_less_dst = strip_soabi_tag(fdst)
-                if soabi_less_dst is not None:
-                    fdst = soabi_less_dst
-                shutil.move(fsrc, fdst)
+class ExtractedTree(NamedTuple):
+    """The relative paths of the dirs and files in an extracted archive."""
 
-    else:
-        with zipfile.ZipFile(src) as z:
-            for info in z.infolist():
-                outfile = Path(z.extract(info.filename, dst_dir))
-                if strip_soabi_tags:
-                    soabi_less_outfile = strip_soabi_tag(outfile)
-                    if soabi_less_outfile is not None:
-                        os.rename(outfile, soabi_less_outfile)
-                        outfile = soabi_less_outfile
-                execute_perms = (info.external_attr >> 16) & (
-                    stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+    dirs: set[str]
+    files: list[str]
+
+
+def _arcname_parts(name: str) -> list[str]:
+    """
+    Split an archive member name into path components, dropping anything that
+    could escape the output dir (like `ZipFile.extract` does).
+    """
+    return [
+        part
+        for part in name.replace("\\", "/").split("/")
+        if part not in ("", ".", "..")
+    ]
+
+
+def _add_parents(dirs: set[str], rel: str) -> None:
+    parent = os.path.dirname(rel)
+    while parent and parent not in dirs:
+        dirs.add(parent)
+        parent = os.path.dirname(parent)
+
+
+def _extract_tar(src: Path, dst_dir: Path) -> ExtractedTree:
+    # We expect the tgz to contain a single top-level dir with all the items to
+    # unpack, whose entries are written straight to `dst_dir`, with any SOABI
+    # tag stripped from top-level extensions.
+    top = None
+    renamed: dict[str, str] = {}
+    dirs: set[str] = set()
+    files: list[str] = []
+    deferred_dirs: list[tuple[str, tarfile.TarInfo]] = []
+
+    def dest(parts: list[str]) -> str:
+        nonlocal top
+        if top is None:
+            top = parts[0]
+        elif parts[0] != top:
+            raise ValueError(
+                "{}: expected a single top-level dir, found {} and {}".format(
+                    src, top, parts[0]
                 )
-                if execute_perms:
-                    st = os.stat(outfile)
-                    new_mode = stat.S_IMODE(st.st_mode | execute_perms)
-                    if new_mode != st.st_mode:
-                        os.chmod(outfile, new_mode)
+            )
+        first = renamed.get(parts[1])
+        if first is None:
+            stripped = strip_soabi_tag(Path(parts[1]))
+            first = renamed[parts[1]] = parts[1] if stripped is None else str(stripped)
+        return os.path.join(first, *parts[2:])
+
+    # Stream the archive, so nothing is held in memory or spilled to disk.
+    with tarfile.open(src, mode="r|*") as tf:
+        for member in tf:
+            parts = _arcname_parts(member.name)
+            if len(parts) < 2:
+                if parts and member.isdir() and top in (None, parts[0]):
+                    top = parts[0]
+                    continue
+                raise ValueError(
+                    "{}: unexpected top-level entry {}".format(src, member.name)
+                )
+            rel = dest(parts)
+            path = os.path.join(dst_dir, rel)
+            # `dirs` holds every dir created so far.
+            parent = os.path.dirname(rel)
+            if parent and parent not in dirs:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _add_parents(dirs, rel)
+            if member.isdir():
+                os.makedirs(path, exist_ok=True)
+                dirs.add(rel)
+                # Set once the dir's contents are written, like `extractall`.
+                deferred_dirs.append((path, member))
+                continue
+            if member.isfile():
+                fsrc = tf.extractfile(member)
+                assert fsrc is not None
+                with open(path, "wb") as fdst:
+                    shutil.copyfileobj(fsrc, fdst, _BUFFER_SIZE)
+                os.chmod(path, member.mode)
+            elif member.issym():
+                os.symlink(member.linkname, path)
+            elif member.islnk():
+                os.link(
+                    os.path.join(dst_dir, dest(_arcname_parts(member.linkname))),
+                    path,
+                )
+            else:
+                raise ValueError(
+                    "{}: unsupported member type for {}".format(src, member.name)
+                )
+            if not member.issym():
+                os.utime(path, (member.mtime, member.mtime))
+            files.append(rel)
+
+    for path, member in reversed(deferred_dirs):
+        os.chmod(path, member.mode)
+        os.utime(path, (member.mtime, member.mtime))
+    # Members overwritten by later ones with the same name are listed once.
+    return ExtractedTree(dirs, list(dict.fromkeys(files)))
+
+
+def _extract_zip(
+    src: Path, dst_dir: Path, strip_soabi_tags: bool, jobs: int
+) -> ExtractedTree:
+    dirs: set[str] = set()
+    # Keyed by destination, as members can collide (duplicate names, or names
+    # which only differ by their SOABI tag): the last one wins, as it would
+    # when extracting in order, and no two threads ever write the same file.
+    by_rel: dict[str, zipfile.ZipInfo] = {}
+    with zipfile.ZipFile(src) as z:
+        for info in z.infolist():
+            parts = _arcname_parts(info.filename)
+            if not parts:
+                continue
+            rel = os.path.join(*parts)
+            _add_parents(dirs, rel)
+            if info.is_dir():
+                dirs.add(rel)
+                continue
+            if strip_soabi_tags:
+                stripped = strip_soabi_tag(Path(rel))
+                if stripped is not None:
+                    rel = str(stripped)
+            by_rel.pop(rel, None)
+            by_rel[rel] = info
+
+        # Create all dirs up front, so members can be written in any order.
+        for rel in sorted(dirs):
+            os.makedirs(os.path.join(dst_dir, rel), exist_ok=True)
+
+        umask = os.umask(0)
+        os.umask(umask)
+
+        # We need to preserve at least the executable bit, which
+        # `ZipFile.extract` drops (see https://bugs.python.org/issue15795), so
+        # create files with it set, rather than stat-ing and chmod-ing them.
+        def write(member: tuple[zipfile.ZipInfo, str]) -> None:
+            info, rel = member
+            execute_perms = (info.external_attr >> 16) & (
+                stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+            )
+            fd = os.open(
+                os.path.join(dst_dir, rel),
+                os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0),
+                0o666 | execute_perms,
+            )
+            with os.fdopen(fd, "wb") as fdst:
+                if execute_perms & umask:
+                    os.fchmod(fd, (0o666 & ~umask) | execute_perms)
+                with z.open(info) as fsrc:
+                    shutil.copyfileobj(fsrc, fdst, _BUFFER_SIZE)
+
+        # Decompression releases the GIL, so members are extracted in
+        # parallel, biggest first to balance the threads.
+        members = [(info, rel) for rel, info in by_rel.items()]
+        members.sort(key=lambda m: m[0].file_size, reverse=True)
+        if jobs <= 1:
+            for member in members:
+                write(member)
+        else:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                for _ in pool.map(write, members):
+                    pass
+
+    return ExtractedTree(dirs, list(by_rel))
+
+
+def extract(
+    src: Path, dst_dir: Path, strip_soabi_tags: bool = False, jobs: int = 1
+) -> ExtractedTree:
+    """
+    Extract the `.tar.gz` or zip archive `src` into `dst_dir`, returning what
+    was extracted.
+    """
+    os.makedirs(dst_dir, exist_ok=True)
+    if src.suffixes[-2:] == [".tar", ".gz"]:
+        return _extract_tar(src, dst_dir)
+    return _extract_zip(src, dst_dir, strip_soabi_tags, jobs)
+
+
+def walk(source_root: Path) -> ExtractedTree:
+    dirs: set[str] = set()
+    files: list[str] = []
+    for root, dirnames, filenames in os.walk(source_root):
+        root = os.path.relpath(root, source_root)
+        for name in dirnames:
+            dirs.add(os.path.normpath(os.path.join(root, name)))
+        for name in filenames:
+            files.append(os.path.normpath(os.path.join(root, name)))
+    return ExtractedTree(dirs, files)
 
 
 def main() -> None:
@@ -114,6 +271,13 @@ def main() -> None:
     parser.add_argument(
         "--entry-points-manifest", type=Path, help="The directory to write to"
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Threads to extract zip members with",
+    )
     parser.add_argument(
         "src", type=Path, help="An archive or existing source directory"
     )
@@ -127,31 +291,36 @@ def main() -> None:
                 "--strip-soabi-tags cannot mutate an existing source directory"
             )
         source_root = args.src
+        tree = walk(source_root)
     else:
         if args.output is None:
             parser.error("--output is required when src is an archive")
         args.output.mkdir(parents=True, exist_ok=True)
-        extract(
+        tree = extract(
             src=args.src,
             dst_dir=args.output,
             strip_soabi_tags=args.strip_soabi_tags,
+            jobs=args.jobs,
         )
         source_root = args.output
 
     # Infer C++ header dirs.
     if args.cxx_header_dirs is not None:
         with open(args.cxx_header_dirs, mode="w") as f:
-            for root, dirs, _files in os.walk(source_root):
-                root = os.path.relpath(root, source_root)
-                if "include" in dirs:
-                    print(os.path.normpath(os.path.join(root, "include")), file=f)
+            for rel in sorted(tree.dirs):
+                if os.path.basename(rel) == "include":
+                    print(rel, file=f)
 
     # Extract any "entry points" from the wheel, and generate scripts from them
     # (just like `pip install` would do).
     if args.entry_points is not None:
-        entry_points = glob.glob(
-            os.path.join(source_root, "*.dist-info", "entry_points.txt")
-        )
+        entry_points = [
+            os.path.join(source_root, rel)
+            for rel in tree.files
+            if os.path.dirname(rel).endswith(".dist-info")
+            and os.path.basename(rel) == "entry_points.txt"
+            and os.path.dirname(os.path.dirname(rel)) == ""
+        ]
         os.makedirs(args.entry_points, exist_ok=True)
         manifest = []
         if entry_points:
@@ -9,28 +9,155 @@
 # pyre-strict
 
 import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
 import subprocess
 import sys
 import sysconfig
+import tempfile
 from pathlib import Path
 from shutil import which
 
+# Bump whenever the symbols gathered with nm for a library change.
+_CACHE_VERSION = 1
+
+_SHT_SYMTAB = 2
+_SHT_DYNSYM = 11
+_SHF_EXECINSTR = 0x4
+_STB_GLOBAL = 1
+_STT_GNU_IFUNC = 10
+_SHN_LORESERVE = 0xFF00
+
+
+def elf_text_symbols(path: Path) -> list[str] | None:
+    """
+    Return the sorted global text symbols (those `nm` lists as `T`) of an ELF
+    file, from its `.symtab`, or its `.dynsym` if it's stripped, or None if
+    it's not an ELF file or one this can't read, for `nm` to be used instead.
+    """
+    if path.stat().st_size == 0:
+        # mmap can't map an empty file.
+        return None
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:4] != b"\x7fELF":
+            return None
+        is64 = mm[4] == 2
+        endian = "<" if mm[5] == 1 else ">"
+        word = "Q" if is64 else "I"
+        shoff, _flags, _ehsize, _phentsize, _phnum, shentsize, shnum = (
+            struct.unpack_from(
+                "{}{}IHHHHH".format(endian, word), mm, 16 + 8 + 2 * (8 if is64 else 4)
+            )
+        )
+        shdr = struct.Struct("{0}II{1}{1}{1}{1}II{1}{1}".format(endian, word))
+        # (type, flags, offset, size, link, entsize) of each section.
+        sections = []
+        for i in range(shnum):
+            _, sh_type, flags, _, offset, size, link, _, _, entsize = shdr.unpack_from(
+                mm, shoff + i * shentsize
+            )
+            sections.append((sh_type, flags, offset, size, link, entsize))
+
+        for wanted in (_SHT_SYMTAB, _SHT_DYNSYM):
+            symtabs = [s for s in sections if s[0] == wanted]
+            if symtabs:
+                break
+        else:
+            return []
+        _, _, offset, size, link, entsize = symtabs[0]
+        strtab = sections[link][2]
+
+        # Only the name, info and section index are needed.
+        if is64:
+            sym = struct.Struct(endian + "IBxH16x")
+        else:
+            sym = struct.Struct(endian + "I8xBxH")
+        symbols = set()
+        for i in range(offset, offset + size - entsize + 1, entsize):
+            name, info, shndx = sym.unpack_from(mm, i)
+            if (
+                info >> 4 != _STB_GLOBAL
+                or info & 0xF == _STT_GNU_IFUNC
+                or shndx == 0
+                or shndx >= _SHN_LORESERVE
+                or not sections[shndx][1] & _SHF_EXECINSTR
+            ):
+                continue
+            start = strtab + name
+            end = mm.find(b"\0", start)
+            if end == -1:
+                return None
+            symbols.add(mm[start:end].decode("utf-8"))
+        return sorted(symbols)
+
+
+def nm_text_symbols(nm: Path, path: Path) -> list[str]:
+    # Run nm on the library file
+    nm_output = subprocess.check_output([nm, path], text=True)
+    symbols = []
+    for line in nm_output.splitlines():
+        # Look for lines containing ' T ' which indicates text (code) symbols
+        if " T " not in line:
+            continue
+        # Get the symbol name (third column)
+        symbols.append(line.split()[2])
+    return symbols
+
+
+def _file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load_cached(cache: Path) -> list[str] | None:
+    try:
+        with open(cache) as f:
+            symbols = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return symbols if isinstance(symbols, list) else None
+
+
+def _store_cached(cache: Path, symbols: list[str]) -> None:
+    # Caching is best effort, e.g. the cache dir may not be writable.
+    try:
+        cache.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(symbols, f, separators=(",", ":"))
+            os.replace(tmp, cache)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        pass
+
 
 def main() -> None:
     parser = argparse.ArgumentParser()
-    parser.add_argument("--nm", type=Path, help="Path to nm tool")
+    parser.add_argument(
+        "--nm",
+        type=Path,
+        help="Path to nm tool, used for libraries which aren't ELF files",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        help=(
+            "Directory to cache symbols gathered with nm in, keyed by the "
+            "library's hash. Off by default, as it's shared between actions"
+        ),
+    )
     parser.add_argument("output", help="Output file path")
     args = parser.parse_args()
 
-    nm: Path | None = args.nm
-    if nm is None:
-        maybe_nm = which("nm")
-        if not maybe_nm:
-            raise ValueError("nm tool was not specified and also not available on PATH")
-        nm = Path(maybe_nm)
-    if not nm.exists():
-        raise ValueError(f"nm tool not found at specified location: {nm!r}")
-
     lib_dir = Path(sysconfig.get_config_var("installed_platbase")) / str(
         sysconfig.get_config_var("platlibdir")
     )
@@ -39,17 +166,34 @@ def main() -> None:
     if not libpython.exists():
         raise RuntimeError(f"No libpython found in {libpython} ({lib_dir=})")
 
-    # Run nm on the library file
-    nm_output = subprocess.check_output([nm, libpython], text=True)
+    # Reading the symbol table directly is much cheaper than hashing the
+    # library, so only symbols gathered with nm are cached.
+    symbols = elf_text_symbols(libpython)
+    if symbols is None:
+        cache = None
+        if args.cache_dir is not None:
+            cache = args.cache_dir / "{}-{}.json".format(
+                _file_digest(libpython), _CACHE_VERSION
+            )
+            symbols = _load_cached(cache)
+        if symbols is None:
+            nm: Path | None = args.nm
+            if nm is None:
+                maybe_nm = which("nm")
+                if not maybe_nm:
+                    raise ValueError(
+                        "nm tool was not specified and also not available on PATH"
+                    )
+                nm = Path(maybe_nm)
+            if not nm.exists():
+                raise ValueError(f"nm tool not found at specified location: {nm!r}")
+            symbols = nm_text_symbols(nm, libpython)
+            if cache is not None:
+                _store_cached(cache, symbols)
 
     # Process the output and write linker args
     with open(args.output, "w") as f:
-        for line in nm_output.splitlines():
-            # Look for lines containing ' T ' which indicates text (code) symbols
-            if " T " not in line:
-                continue
-            # Get the symbol name (third column)
-            symbol = line.split()[2]
+        for symbol in symbols:
             # Write linker arguments
             if sys.platform == "linux":
                 f.write(f"-Wl,--undefined={symbol}\n")
@@ -9,9 +9,58 @@
 
 # pyre-strict
 
+"""
+Generate the table of statically linked extensions that
+`static_extension_utils.cpp` looks modules up in.
+
+The table is a pair of arrays sorted by module name, binary searched and
+fronted by a bloom filter of the names. The static extension finder sits first
+on `sys.meta_path` and so sees every import, nearly all of which are misses
+that the bloom filter rejects without touching the names. The arrays are
+`constexpr`, so they need no static initializer: with plain `const`, compilers
+still initialize the `std::string_view`s dynamically.
+"""
+
 import argparse
 import sys
 
+FNV_OFFSET = 0xCBF29CE484222325
+FNV_PRIME = 0x100000001B3
+_MASK64 = (1 << 64) - 1
+
+# Bits of bloom filter per name, and probes per lookup. 16 bits and 2 probes
+# give a false positive rate of about 1.4%.
+BLOOM_BITS_PER_NAME = 16
+BLOOM_PROBES = 2
+_MIN_BLOOM_BITS = 64
+
+
+def fnv1a(name: bytes) -> int:
+    """64 bit FNV-1a, as implemented in `static_extension_utils.cpp`."""
+    h = FNV_OFFSET
+    for byte in name:
+        h = ((h ^ byte) * FNV_PRIME) & _MASK64
+    return h
+
+
+def bloom_probes(name: bytes, num_bits: int) -> list[int]:
+    """The bits of a `num_bits` (a power of two) bloom filter set by `name`."""
+    h = fnv1a(name)
+    step = (h >> 32) | 1
+    return [((h + i * step) & _MASK64) & (num_bits - 1) for i in range(BLOOM_PROBES)]
+
+
+def bloom_filter(names: list[bytes]) -> tuple[int, list[int]]:
+    """Return the size in bits and the 64 bit words of a filter of `names`."""
+    num_bits = _MIN_BLOOM_BITS
+    while num_bits < len(names) * BLOOM_BITS_PER_NAME:
+        num_bits *= 2
+    words = [0] * (num_bits // 64)
+    for name in names:
+        for bit in bloom_probes(name, num_bits):
+            words[bit >> 6] |= 1 << (bit & 63)
+    return num_bits, words
+
 
 def main(argv: list[str]) -> int:
     parser = argparse.ArgumentParser(fromfile_prefix_chars="@")
@@ -21,24 +70,46 @@ def main(argv: list[str]) -> int:
     out_file = args.output
 
     externs = []
-    table = [
-        "std::unordered_map<std::string_view, pyinitfunc> _static_extension_info = {",
-    ]
+    # Sorted by UTF-8 bytes, which is how std::string_view compares them. The
+    # first registration of a name wins, as it did with the old map.
+    entries: dict[bytes, int] = {}
     i = 0
     for python_name in args.extension:
         module_name, pyinit_func = python_name.split(":")
         # Use of the 'asm' directive allows us to use symbol names that would otherwise be invalid in C
         # For example foo.bar/baz would be foo.bar$baz which is invalid as a c function name
         externs.append(f'PyMODINIT_FUNC dummy_name_{i}(void) asm ("{pyinit_func}");')
-        table.append(f'  {{ "{module_name}", dummy_name_{i} }},')
+        entries.setdefault(module_name.encode("utf-8"), i)
         i += 1
+    names = sorted(entries)
+    num_bits, words = bloom_filter(names)
+    # Zero length arrays aren't valid C++.
+    size = max(len(names), 1)
+
+    table = [
+        f"extern constexpr size_t _static_extension_count = {len(names)};",
+        f"extern constexpr std::string_view _static_extension_names[{size}] = {{",
+    ]
+    table.extend(f'  "{name.decode("utf-8")}",' for name in names)
+    table.append("};")
+    table.append(
+        f"extern constexpr pyinitfunc _static_extension_initfuncs[{size}] = {{"
+    )
+    table.extend(f"  dummy_name_{entries[name]}," for name in names)
+    table.append("};")
+    table.append(f"extern constexpr size_t _static_extension_bloom_bits = {num_bits};")
+    table.append(
+        f"extern constexpr uint64_t _static_extension_bloom[{len(words)}] = {{",
+    )
+    table.extend(f"  0x{word:016x}ULL," for word in words)
     table.append("};")
 
     out_lines = (
         [
             '#include "Python.h"',
             '#include "import.h"',
-            "#include <unordered_map>",
+            "#include <cstddef>",
+            "#include <cstdint>",
             "#include <string_view>",
             "typedef PyObject* (*pyinitfunc)();",
         ]
@@ -0,0 +1,97 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+"""
+State of incrementally updated link trees.
+
+A tool that updates a link tree in place persists what it built in a state
+file next to it, and diffs against that on the next run, only touching the
+entries that changed. This holds the parts shared by those tools: reading and
+writing the state file, and removing stale entries from the tree.
+"""
+
+import json
+import os
+from typing import Any, Iterable, Optional
+
+
+def take(tree: str, state_path: str, version: int) -> Optional[dict[str, Any]]:
+    """
+    Return the fields of the state of the previous build of `tree`, or None if
+    there's nothing usable to diff against, e.g. it was written with another
+    `version` or the tree is gone.
+
+    The state file is removed, so that if updating the tree fails, the next
+    run rebuilds it from scratch rather than diffing against stale state.
+    """
+    state = None
+    if os.path.isdir(tree):
+        state = load(state_path, version)
+    drop(state_path)
+    return state
+
+
+def load(state_path: str, version: int) -> Optional[dict[str, Any]]:
+    """Return the fields of the state file, if it was written with `version`."""
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("version") != version:
+        return None
+    return state
+
+
+def drop(state_path: str) -> None:
+    try:
+        os.unlink(state_path)
+    except FileNotFoundError:
+        pass
+
+
+def write(state_path: str, version: int, fields: dict[str, Any]) -> None:
+    """Atomically write the state file, with the JSON-serializable `fields`."""
+    tmp = state_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"version": version, **fields}, f, separators=(",", ":"))
+    os.replace(tmp, state_path)
+
+
+def parent_dirs(dests: Iterable[str]) -> set[str]:
+    """The directories, relative to the tree, that `dests` are in."""
+    dirs = set()
+    for dest in dests:
+        d = os.path.dirname(dest)
+        while d and d not in dirs:
+            dirs.add(d)
+            d = os.path.dirname(d)
+    return dirs
+
+
+def remove_stale(tree: str, stale: Iterable[str], needed_dirs: set[str]) -> None:
+    """
+    Remove the `stale` entries, relative to `tree`, and the directories that
+    leaves empty, unless they're in `needed_dirs`.
+    """
+    for dest in stale:
+        try:
+            os.unlink(os.path.join(tree, dest))
+        except FileNotFoundError:
+            pass
+        # Prune directories left empty, as a fresh tree wouldn't have them and
+        # python would treat them as namespace packages.
+        d = os.path.dirname(dest)
+        while d and d not in needed_dirs:
+            try:
+                os.rmdir(os.path.join(tree, d))
+            except OSError:
+                break
+            d = os.path.dirname(d)
@@ -11,7 +11,7 @@
 import os
 import sys
 
-from live_builder import LiveBuilder
+from live_builder import add_live_builder_args, LiveBuilder
 from util import get_args_parser, get_target_info
 
 
@@ -24,6 +24,7 @@ def main():
         required=True,
     )
     parser.add_argument("--linktree-suffix", default="#link-tree")
+    add_live_builder_args(parser)
     args, _ = parser.parse_known_args(sys.argv[1:])
     args.target = get_target_info(args.target)
 
@@ -10,7 +10,9 @@
 
 import os
 import shutil
+import sys
 
+import live_link_tree
 from par_builder import ParBuilder
 from util import (
     get_user_main,
@@ -22,6 +24,18 @@ from util import (
 )
 
 
+def add_live_builder_args(parser):
+    """Add the options that only live PARs take to a make_par parser."""
+    parser.add_argument(
+        "--verify-link-tree",
+        action="store_true",
+        help=(
+            "Check the link tree for changes made since the previous build "
+            "before updating it, and rebuild it from scratch if there are any"
+        ),
+    )
+
+
 class LiveBuilder(ParBuilder):
     def __init__(self, options, manifest, mode=0o755, linktree_suffix="#linktree"):
         # Default to "default" warnings, as per buck1/buck2.
@@ -38,6 +52,9 @@ class LiveBuilder(ParBuilder):
         else:
             self.linktree = options.output.rsplit(".", 1)[0] + linktree_suffix
         self.copy_files = options.copy_files is True
+        # Check the link tree for out-of-band changes before updating it. Not
+        # every make_par parser calls `add_live_builder_args`.
+        self.verify_linktree = getattr(options, "verify_link_tree", False) is True
 
     def _postbuild(self):
         pass
@@ -51,11 +68,30 @@ class LiveBuilder(ParBuilder):
         ) as f:
             manifest.add_autogen_module(RUN_LIVEPAR_MAIN_MODULE, f.read())
 
+        linktree = self.linktree
+        if self.copy_files:
+            # An unchanged source path says nothing about unchanged contents,
+            # so copied trees are always rebuilt.
+            live_link_tree.drop_state(linktree)
+            self._copy_linktree()
+        else:
+            self._update_linktree()
+
+        header = self._gen_header()
+        output_file.write(bytes(header, "UTF-8"))
+
+    def _gen_bootstrap(self):
+        bootstrap_template = os.path.join(
+            os.path.dirname(__file__), "_lpar_bootstrap.sh.template"
+        )
+        return self._gen_interp_file(bootstrap_template)
+
+    def _copy_linktree(self):
         linktree = self.linktree
         make_clean_dir(linktree)
 
         dirs = {linktree}
-        for entry in manifest.entries:
+        for entry in self.manifest.entries:
             dest_path = os.path.join(linktree, entry.dest_path)
             dest_dir = os.path.dirname(dest_path)
             if dest_dir not in dirs:
@@ -66,19 +102,8 @@ class LiveBuilder(ParBuilder):
 
             if entry.src_data is None:
                 assert entry.src_path is not None
-                if self.copy_files:
-                    shutil.copyfile(entry.src_path, dest_path)
-                    os.chmod(dest_path, os.stat(entry.src_path).st_mode)
-                else:
-                    # Add a symlink to the source file
-                    if entry.src_path.startswith("/"):
-                        # if src_path is absolute, use it as link_path (no need to calculate relative path).
-                        link_path = entry.src_path
-                    else:
-                        link_path = os.path.relpath(
-                            entry.src_path, os.path.dirname(dest_path)
-                        )
-                    os.symlink(link_path, dest_path)
+                shutil.copyfile(entry.src_path, dest_path)
+                os.chmod(dest_path, os.stat(entry.src_path).st_mode)
             else:
                 # For auto-generated files, write them out as
                 # regular files in the linktree.
@@ -86,16 +111,67 @@ class LiveBuilder(ParBuilder):
                 with open(dest_path, "w") as handle:
                     handle.write(entry.src_data)
 
-        header = self._gen_header()
-        output_file.write(bytes(header, "UTF-8"))
-
-        bootstrap_template = os.path.join(
-            os.path.dirname(__file__), "_lpar_bootstrap.sh.template"
-        )
         with open(linktree + "/_bootstrap.sh", "w") as f:
-            f.write(self._gen_interp_file(bootstrap_template))
+            f.write(self._gen_bootstrap())
             os.chmod(f.name, self.mode)
 
+    def _update_linktree(self):
+        """
+        Bring the link tree in line with the manifest, only touching the
+        symlinks and generated files that changed since the previous build.
+        """
+        linktree = self.linktree
+        links = {}
+        generated = {}
+        for entry in self.manifest.entries:
+            dest = os.path.normpath(entry.dest_path)
+            if entry.src_data is None:
+                assert entry.src_path is not None
+                if dest in links or dest in generated:
+                    raise FileExistsError(
+                        "{} is in the manifest more than once".format(dest)
+                    )
+                if entry.src_path.startswith("/"):
+                    # if src_path is absolute, use it as link_path (no need to calculate relative path).
+                    links[dest] = entry.src_path
+                else:
+                    links[dest] = os.path.relpath(
+                        entry.src_path,
+                        os.path.dirname(os.path.join(linktree, entry.dest_path)),
+                    )
+            else:
+                # For auto-generated files, write them out as
+                # regular files in the linktree.
+                assert entry.src_path is None
+                if dest in links:
+                    raise FileExistsError(
+                        "{} is in the manifest more than once".format(dest)
+                    )
+                generated[dest] = (entry.src_data, None)
+        generated["_bootstrap.sh"] = (self._gen_bootstrap(), self.mode)
+
+        prev_state = live_link_tree.take_state(linktree)
+        if prev_state is not None and self.verify_linktree:
+            problems = live_link_tree.verify(linktree, *prev_state)
+            if problems:
+                print(
+                    "{} was modified since it was built, rebuilding it:\n  {}".format(
+                        linktree, "\n  ".join(problems)
+                    ),
+                    file=sys.stderr,
+                )
+                prev_state = None
+
+        if prev_state is None:
+            live_link_tree.build(linktree, links, generated)
+        else:
+            try:
+                live_link_tree.update(linktree, links, generated, *prev_state)
+            except OSError:
+                # Most likely files changed behind our back, so start over.
+                live_link_tree.build(linktree, links, generated)
+        live_link_tree.write_state(linktree, links, generated)
+
     def _gen_header(self):
         linktreedir = self.linktree.rsplit("/", 1)[-1]
 
@@ -0,0 +1,206 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-ignore-all-errors
+
+"""
+Incremental updates of live PAR link trees.
+
+A link tree is described by its symlinks (`dest -> target`) and generated
+files (`dest -> (contents, mode)`), all relative to the link tree. The state
+of the last build is persisted next to the link tree, so the next build only
+adds, removes or retargets the symlinks and rewrites the generated files that
+changed, instead of recreating the whole tree.
+
+Run as a script, checks a link tree for changes made to it since it was built.
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+
+import link_tree_state
+
+# The version of the fields below in the state file.
+STATE_VERSION = 1
+
+
+def state_path(linktree):
+    return linktree + ".state.json"
+
+
+def _digest(contents):
+    return hashlib.sha256(contents.encode("utf-8")).hexdigest()
+
+
+def _file_states(generated):
+    return {
+        dest: [_digest(contents), mode] for dest, (contents, mode) in generated.items()
+    }
+
+
+def _parse_state(state):
+    if state is None:
+        return None
+    return dict(state["links"]), dict(state["generated"])
+
+
+def load_state(linktree):
+    """
+    Load the `(links, generated)` recorded by the previous build of
+    `linktree`, with generated files mapped to `[digest, mode]`, or None if
+    there's nothing usable to diff against.
+    """
+    if not os.path.isdir(linktree):
+        return None
+    return _parse_state(link_tree_state.load(state_path(linktree), STATE_VERSION))
+
+
+def take_state(linktree):
+    """Like `load_state`, but also removes the state, see `link_tree_state.take`."""
+    return _parse_state(
+        link_tree_state.take(linktree, state_path(linktree), STATE_VERSION)
+    )
+
+
+def drop_state(linktree):
+    link_tree_state.drop(state_path(linktree))
+
+
+def write_state(linktree, links, generated):
+    link_tree_state.write(
+        state_path(linktree),
+        STATE_VERSION,
+        {
+            "links": sorted(links.items()),
+            "generated": sorted(_file_states(generated).items()),
+        },
+    )
+
+
+def verify(linktree, links, file_states):
+    """
+    Check that `linktree` still matches the recorded state, returning a
+    description of every out-of-band change (e.g. links retargeted, generated
+    files edited, or files added by hand).
+    """
+    problems = []
+    for dest, target in links.items():
+        path = os.path.join(linktree, dest)
+        try:
+            actual = os.readlink(path)
+        except FileNotFoundError:
+            problems.append("{}: missing".format(dest))
+        except OSError:
+            problems.append("{}: not a symlink".format(dest))
+        else:
+            if actual != target:
+                problems.append(
+                    "{}: links to {}, expected {}".format(dest, actual, target)
+                )
+    for dest, (digest, mode) in file_states.items():
+        path = os.path.join(linktree, dest)
+        if os.path.islink(path) or not os.path.isfile(path):
+            problems.append("{}: not a regular file".format(dest))
+            continue
+        with open(path) as f:
+            contents = f.read()
+        if _digest(contents) != digest:
+            problems.append("{}: modified".format(dest))
+        elif mode and os.stat(path).st_mode & 0o7777 != mode:
+            problems.append("{}: mode changed".format(dest))
+
+    expected = links.keys() | file_states.keys()
+    expected_dirs = link_tree_state.parent_dirs(expected)
+    for root, dirnames, filenames in os.walk(linktree):
+        rel_root = os.path.relpath(root, linktree)
+        unexpected_dirs = []
+        for name in dirnames:
+            rel = os.path.normpath(os.path.join(rel_root, name))
+            if os.path.islink(os.path.join(root, name)):
+                filenames.append(name)
+            elif rel not in expected_dirs:
+                problems.append("{}: unexpected".format(rel))
+                unexpected_dirs.append(name)
+        dirnames[:] = [d for d in dirnames if d not in unexpected_dirs]
+        for name in filenames:
+            rel = os.path.normpath(os.path.join(rel_root, name))
+            if rel not in expected:
+                problems.append("{}: unexpected".format(rel))
+    return sorted(problems)
+
+
+def _write(path, contents, mode):
+    with open(path, "w") as f:
+        f.write(contents)
+    if mode:
+        os.chmod(path, mode)
+
+
+def build(linktree, links, generated):
+    """Build `linktree` from scratch."""
+    if os.path.lexists(linktree):
+        shutil.rmtree(linktree)
+    os.makedirs(linktree)
+    for d in sorted(link_tree_state.parent_dirs(links.keys() | generated.keys())):
+        os.mkdir(os.path.join(linktree, d))
+    for dest, target in links.items():
+        os.symlink(target, os.path.join(linktree, dest))
+    for dest, (contents, mode) in generated.items():
+        _write(os.path.join(linktree, dest), contents, mode)
+
+
+def update(linktree, links, generated, prev_links, prev_file_states):
+    """
+    Bring `linktree`, built from `prev_links` and `prev_file_states`, in line
+    with `links` and `generated`.
+    """
+    file_states = _file_states(generated)
+    needed_dirs = link_tree_state.parent_dirs(links.keys() | generated.keys())
+
+    stale = [dest for dest, target in prev_links.items() if links.get(dest) != target]
+    stale.extend(
+        dest
+        for dest, state in prev_file_states.items()
+        if file_states.get(dest) != state
+    )
+    link_tree_state.remove_stale(linktree, stale, needed_dirs)
+
+    prev_dirs = link_tree_state.parent_dirs(prev_links.keys() | prev_file_states.keys())
+    for d in sorted(needed_dirs - prev_dirs):
+        os.makedirs(os.path.join(linktree, d), exist_ok=True)
+
+    for dest, target in links.items():
+        if prev_links.get(dest) != target:
+            os.symlink(target, os.path.join(linktree, dest))
+    for dest, (contents, mode) in generated.items():
+        if prev_file_states.get(dest) != file_states[dest]:
+            _write(os.path.join(linktree, dest), contents, mode)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Check a live PAR link tree for changes made since it was built"
+    )
+    parser.add_argument("linktree")
+    args = parser.parse_args(argv[1:])
+
+    state = load_state(args.linktree)
+    if state is None:
+        print("{}: no state to check against".format(args.linktree), file=sys.stderr)
+        return 2
+    problems = verify(args.linktree, *state)
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
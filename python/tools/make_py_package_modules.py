@@ -52,12 +52,15 @@ baz/tp_bar.py
 
 import argparse
 import errno
-import json
 import os
 import platform
 import re
 import shutil
 from pathlib import Path
+from typing import Iterable, Optional
+
+import link_tree_state
+from manifests import load_manifest
 
 # Suffixes which should trigger `__init__.py` additions.
 # TODO(agallaher): This was copied from v1, but some things below probably
@@ -71,6 +74,9 @@ _MODULE_SUFFIXES = {
 
 _CONTENT_HASH_PLACEHOLDER: str = "/output_artifacts/"
 
+# Bump whenever the layout of the `--incremental` state file changes.
+_STATE_VERSION = 1
+
 
 def create_pyc_hash_dict(args: argparse.Namespace) -> dict[str, str]:
     """Construct a map of bytecode artifact path prefixes to content hashes."""
@@ -112,14 +118,14 @@ def parse_args() -> argparse.Namespace:
         action="append",
         dest="module_manifests",
         default=[],
-        help="A path to a JSON file with modules to be linked.",
+        help="A path to a manifest with modules to be linked.",
     )
     parser.add_argument(
         "--resource-manifest",
         action="append",
         dest="resource_manifests",
         default=[],
-        help="A path to a JSON file with resources to be linked.",
+        help="A path to a manifest with resources to be linked.",
     )
     parser.add_argument(
         "--native-library-src",
@@ -164,7 +170,7 @@ def parse_args() -> argparse.Namespace:
         action="append",
         dest="native_library_manifests",
         default=[],
-        help="A path to a JSON file with native libraries to be linked.",
+        help="A path to a manifest with native libraries to be linked.",
     )
     parser.add_argument(
         "--modules-dir",
@@ -185,6 +191,23 @@ def parse_args() -> argparse.Namespace:
         default=[],
         help="A file listing resolved bytecode artifact paths for content-based path resolution.",
     )
+    parser.add_argument(
+        "--incremental",
+        default=False,
+        action="store_true",
+        help=(
+            "Update an existing link tree in place, only touching entries that "
+            "changed since the previous run (ignored with --copy-files)"
+        ),
+    )
+    parser.add_argument(
+        "--state",
+        type=Path,
+        help=(
+            "Where to persist the link tree state used by --incremental "
+            "(defaults to a file next to --modules-dir)"
+        ),
+    )
 
     return parser.parse_args()
 
@@ -216,37 +239,86 @@ def _same_pyc(src1: tuple[Path, str], src2: tuple[Path, str]) -> bool:
     return True
 
 
-def add_path_mapping(
-    path_mapping: dict[Path, tuple[str, str]],
-    dirs_to_create: set[Path],
-    src: Path,
-    new_dest: Path,
-    origin: str = "unknown",
-    copy_files: bool = False,
-) -> None:
+class RealpathResolver:
     """
-    Add the mapping of a destination path into `path_mapping`, by getting the
-    relative path to the source, and making sure that there are no
-    collisions (and erroring in that case)
+    Memoizing `os.path.realpath`, which resolves each directory only once.
+
+    Manifest entries mostly share a handful of parent directories, so this
+    turns the per-component `lstat`s `realpath` does for every entry into a
+    single `lstat` of the leaf (to check whether it is itself a symlink), and
+    lets relative link targets be computed once per pair of directories.
     """
 
-    def format_src(src: str, origin: str) -> str:
-        out = "`{}`".format(src)
-        if origin is not None:
-            out += " (from {})".format(origin)
-        return out
+    def __init__(self) -> None:
+        self._dirs: dict[str, str] = {}
+        self._relpaths: dict[tuple[str, str], str] = {}
+
+    def dir(self, path: str) -> str:
+        real = self._dirs.get(path)
+        if real is None:
+            real = os.path.realpath(path)
+            self._dirs[path] = real
+        return real
+
+    def split(self, path: Path) -> tuple[str, str]:
+        """Return the resolved parent directory and name of `path`."""
+        parent, name = os.path.split(os.fspath(path))
+        if name in ("", ".", ".."):
+            return os.path.split(self.dir(os.fspath(path)))
+        real_parent = self.dir(parent)
+        if os.path.islink(os.path.join(real_parent, name)):
+            return os.path.split(os.path.realpath(os.path.join(real_parent, name)))
+        return real_parent, name
+
+    def __call__(self, path: Path) -> str:
+        return os.path.join(*self.split(path))
+
+    def relpath(self, path: Path, start: Path) -> str:
+        """
+        `os.path.relpath` of the realpaths of `path` and `start`, with the
+        windows longpath prefix stripped from both.
+        """
+        real_parent, name = self.split(path)
+        key = (real_parent, os.fspath(start))
+        rel_dir = self._relpaths.get(key)
+        if rel_dir is None:
+            rel_dir = os.path.relpath(
+                _strip_longpath(real_parent), _strip_longpath(self.dir(key[1]))
+            )
+            self._relpaths[key] = rel_dir
+        return name if rel_dir == os.curdir else os.path.join(rel_dir, name)
 
-    def _realpath(src: Path) -> str:
-        "get the realpath of a path, but if we are on windows, we strip the longpath prefix"
-        real_src = os.path.realpath(src)
-        if platform.system() == "Windows":
-            real_src = real_src.removeprefix("\\\\?\\")
-        return real_src
 
+def _strip_longpath(path: str) -> str:
+    "if we are on windows, strip the longpath prefix"
+    if platform.system() == "Windows":
+        path = path.removeprefix("\\\\?\\")
+    return path
+
+
+def _format_src(src: str, origin: str) -> str:
+    out = "`{}`".format(src)
+    if origin is not None:
+        out += " (from {})".format(origin)
+    return out
+
+
+def _link_path(
+    realpath: RealpathResolver, src: Path, new_dest: Path, copy_files: bool
+) -> str:
     if copy_files:
-        link_path = os.path.realpath(src)
-    else:
-        link_path = os.path.relpath(_realpath(src), _realpath(new_dest.parent))
+        return realpath(src)
+    return realpath.relpath(src, new_dest.parent)
+
+
+def _add_link_path(
+    path_mapping: dict[Path, tuple[str, str]],
+    dirs_to_create: set[Path],
+    src: Path,
+    new_dest: Path,
+    link_path: str,
+    origin: str,
+) -> None:
     if new_dest in path_mapping:
         prev, prev_origin = path_mapping[new_dest]
         if prev != link_path and not (
@@ -258,8 +330,8 @@ def add_path_mapping(
             raise ValueError(
                 "Destination path `{}` specified at both {} and {} (`{}` before relativisation)".format(
                     new_dest,
-                    format_src(link_path, origin),
-                    format_src(prev, prev_origin),
+                    _format_src(link_path, origin),
+                    _format_src(prev, prev_origin),
                     src,
                 )
             )
@@ -267,6 +339,64 @@ def add_path_mapping(
     dirs_to_create.add(new_dest.parent)
 
 
+def add_path_mapping(
+    path_mapping: dict[Path, tuple[str, str]],
+    dirs_to_create: set[Path],
+    src: Path,
+    new_dest: Path,
+    origin: str = "unknown",
+    copy_files: bool = False,
+    realpath: Optional[RealpathResolver] = None,
+) -> None:
+    """
+    Add the mapping of a destination path into `path_mapping`, by getting the
+    relative path to the source, and making sure that there are no
+    collisions (and erroring in that case)
+    """
+    if realpath is None:
+        realpath = RealpathResolver()
+    link_path = _link_path(realpath, src, new_dest, copy_files)
+    _add_link_path(path_mapping, dirs_to_create, src, new_dest, link_path, origin)
+
+
+def add_path_mappings(
+    path_mapping: dict[Path, tuple[str, str]],
+    dirs_to_create: set[Path],
+    entries: Iterable[tuple[Path, Path, str]],
+    copy_files: bool = False,
+    realpath: Optional[RealpathResolver] = None,
+) -> None:
+    """
+    Like `add_path_mapping`, for a batch of `(src, new_dest, origin)` entries.
+
+    Entries are grouped by destination before touching the filesystem, so
+    repeated listings of the same source for a destination (common when the
+    same library reaches a binary through several manifests) are resolved
+    and checked once, and only genuinely distinct sources are compared.
+    Errors and the winning origin are the same as adding entries one by one.
+    """
+    if realpath is None:
+        realpath = RealpathResolver()
+
+    by_dest: dict[Path, list[tuple[Path, str]]] = {}
+    for src, new_dest, origin in entries:
+        srcs = by_dest.get(new_dest)
+        if srcs is None:
+            by_dest[new_dest] = [(src, origin)]
+        elif srcs[-1][0] == src:
+            # Same source again: only the latest origin is ever recorded.
+            srcs[-1] = (src, origin)
+        else:
+            srcs.append((src, origin))
+
+    for new_dest, srcs in by_dest.items():
+        for src, origin in srcs:
+            link_path = _link_path(realpath, src, new_dest, copy_files)
+            _add_link_path(
+                path_mapping, dirs_to_create, src, new_dest, link_path, origin
+            )
+
+
 def _lexists(path: Path) -> bool:
     """
     Like `Path.exists()` but works on dangling. symlinks
@@ -283,7 +413,111 @@ def _lexists(path: Path) -> bool:
     return True
 
 
+def _state_path(args: argparse.Namespace) -> Path:
+    if args.state is not None:
+        return args.state
+    return args.modules_dir.with_name(args.modules_dir.name + ".state.json")
+
+
+def _take_state(
+    args: argparse.Namespace,
+) -> Optional[tuple[dict[str, str], set[str]]]:
+    """
+    Take the links and synthesized `__init__.py` files recorded by the previous
+    incremental run, or None if there's nothing usable to diff against.
+    """
+    state = link_tree_state.take(
+        os.fspath(args.modules_dir), os.fspath(_state_path(args)), _STATE_VERSION
+    )
+    if state is None:
+        return None
+    return dict(state["links"]), set(state["inits"])
+
+
+def _write_state(
+    args: argparse.Namespace, links: dict[str, str], inits: set[str]
+) -> None:
+    link_tree_state.write(
+        os.fspath(_state_path(args)),
+        _STATE_VERSION,
+        {"links": sorted(links.items()), "inits": sorted(inits)},
+    )
+
+
+def _symlink(target: str, dest: Path) -> None:
+    try:
+        os.symlink(target, dest)
+    except OSError:
+        if _lexists(dest):
+            if os.path.islink(dest):
+                raise ValueError(
+                    "{} already exists, and is linked to {}. Cannot link to {}".format(
+                        dest, os.readlink(dest), target
+                    )
+                )
+            else:
+                raise ValueError(
+                    "{} already exists. Cannot link to {}".format(dest, target)
+                )
+        else:
+            raise
+
+
+def _update_modules_dir(
+    modules_dir: Path,
+    links: dict[str, str],
+    dirs_to_create: set[Path],
+    init_py_paths: set[Path],
+    prev_links: dict[str, str],
+    prev_inits: set[str],
+) -> set[str]:
+    """
+    Bring a link tree built from `prev_links`/`prev_inits` in line with
+    `links`, returning the `__init__.py` files synthesized by this run.
+    """
+    # Directories the new tree needs, so they're never pruned.
+    needed_dirs = link_tree_state.parent_dirs(links)
+    needed_dirs.update(os.fspath(init_py_dir) for init_py_dir in init_py_paths)
+
+    stale = [dest for dest, target in prev_links.items() if links.get(dest) != target]
+    stale.extend(
+        init
+        for init in prev_inits
+        if init in links or Path(init).parent not in init_py_paths
+    )
+    link_tree_state.remove_stale(os.fspath(modules_dir), stale, needed_dirs)
+
+    prev_dirs = {(modules_dir / rel).parent for rel in prev_links}
+    for d in dirs_to_create - prev_dirs:
+        d.mkdir(parents=True, exist_ok=True)
+
+    for rel, target in links.items():
+        if prev_links.get(rel) != target:
+            _symlink(target, modules_dir / rel)
+
+    inits = set()
+    for init_py_dir in init_py_paths:
+        rel = os.path.join(init_py_dir, "__init__.py")
+        if rel in links:
+            continue
+        if rel in prev_inits:
+            inits.add(rel)
+            continue
+        init_py_path = modules_dir / rel
+        if not _lexists(init_py_path):
+            init_py_path.touch(exist_ok=True)
+            inits.add(rel)
+    return inits
+
+
 def create_modules_dir(args: argparse.Namespace) -> None:
+    incremental = args.incremental and not args.copy_files
+    prev_state = None
+    if incremental:
+        prev_state = _take_state(args)
+        if prev_state is None and args.modules_dir.is_dir():
+            shutil.rmtree(args.modules_dir)
+
     args.modules_dir.mkdir(parents=True, exist_ok=True)
 
     # Build a mapping of content-based path prefixes to resolved content hashes.
@@ -301,55 +535,57 @@ def create_modules_dir(args: argparse.Namespace) -> None:
     # as modules.
     init_py_paths = set()
 
+    # (src, dest, origin) for every entry, in the order they were specified.
+    entries: list[tuple[Path, Path, str]] = []
+
     # Link entries from manifests.
     for manifest in args.module_manifests:
-        with open(manifest) as manifest_file:
-            for dest, src, origin in json.load(manifest_file):
-                dest = Path(dest)
-                src = Path(replace_pyc_hash_placeholder(src, pyc_hash_dict))
-
-                # Add `__init__.py` files for all parent dirs (except the root).
-                if dest.suffix in _MODULE_SUFFIXES:
-                    package = dest.parent
-                    while package != Path("") and package not in init_py_paths:
-                        init_py_paths.add(package)
-                        package = package.parent
-
-                add_path_mapping(
-                    path_mapping,
-                    dirs_to_create,
-                    src,
-                    args.modules_dir / dest,
-                    origin=origin,
-                    copy_files=args.copy_files,
-                )
+        for dest, src, origin in load_manifest(manifest):
+            dest = Path(dest)
+            src = Path(replace_pyc_hash_placeholder(src, pyc_hash_dict))
+
+            # Add `__init__.py` files for all parent dirs (except the root).
+            if dest.suffix in _MODULE_SUFFIXES:
+                package = dest.parent
+                while package != Path("") and package not in init_py_paths:
+                    init_py_paths.add(package)
+                    package = package.parent
+
+            entries.append((src, args.modules_dir / dest, origin))
 
     for manifest in args.resource_manifests + args.native_library_manifests:
-        with open(manifest) as manifest_file:
-            for dest, src, origin in json.load(manifest_file):
-                src = Path(src)
-                add_path_mapping(
-                    path_mapping,
-                    dirs_to_create,
-                    src,
-                    args.modules_dir / dest,
-                    origin=origin,
-                    copy_files=args.copy_files,
-                )
+        for dest, src, origin in load_manifest(manifest):
+            entries.append((Path(src), args.modules_dir / dest, origin))
 
     if args.native_library_srcs:
         for src, dest in zip(args.native_library_srcs, args.native_library_dests):
-            new_dest = args.modules_dir / dest
-            add_path_mapping(
-                path_mapping, dirs_to_create, src, new_dest, copy_files=args.copy_files
-            )
+            entries.append((src, args.modules_dir / dest, "unknown"))
 
     if args.dwp_srcs:
         for src, dest in zip(args.dwp_srcs, args.dwp_dests):
-            new_dest = args.modules_dir / dest
-            add_path_mapping(
-                path_mapping, dirs_to_create, src, new_dest, copy_files=args.copy_files
-            )
+            entries.append((src, args.modules_dir / dest, "unknown"))
+
+    add_path_mappings(path_mapping, dirs_to_create, entries, copy_files=args.copy_files)
+
+    if incremental:
+        # Link tree relative destination -> symlink target, as persisted.
+        links = {
+            os.path.relpath(dest, args.modules_dir): target
+            for dest, (target, _origin) in path_mapping.items()
+        }
+
+    if prev_state is not None:
+        prev_links, prev_inits = prev_state
+        inits = _update_modules_dir(
+            args.modules_dir,
+            links,
+            dirs_to_create,
+            init_py_paths,
+            prev_links,
+            prev_inits,
+        )
+        _write_state(args, links, inits)
+        return
 
     for d in dirs_to_create:
         d.mkdir(parents=True, exist_ok=True)
@@ -359,32 +595,22 @@ def create_modules_dir(args: argparse.Namespace) -> None:
             shutil.copyfile(target, dest)
             os.chmod(dest, os.stat(target).st_mode)
         else:
-            try:
-                os.symlink(target, dest)
-            except OSError:
-                if _lexists(dest):
-                    if os.path.islink(dest):
-                        raise ValueError(
-                            "{} already exists, and is linked to {}. Cannot link to {}".format(
-                                dest, os.readlink(dest), target
-                            )
-                        )
-                    else:
-                        raise ValueError(
-                            "{} already exists. Cannot link to {}".format(dest, target)
-                        )
-                else:
-                    raise
+            _symlink(target, dest)
 
     # Fill in __init__.py for sources that were provided by the user
     # These are filtered such that we only create this for sources specified
     # by the user; if a .whl forgets an __init__.py file, that's their problem
+    inits = set()
     for init_py_dir in init_py_paths:
         init_py_path = args.modules_dir / init_py_dir / "__init__.py"
         # We still do this check because python insists on touching some read only
         # files and blows up sometimes.
         if not _lexists(init_py_path):
             init_py_path.touch(exist_ok=True)
+            inits.add(os.path.join(init_py_dir, "__init__.py"))
+
+    if incremental:
+        _write_state(args, links, inits)
 
 
 def main() -> None:
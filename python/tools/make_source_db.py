@@ -34,16 +34,43 @@ The output format of the source DB is:
     ...
   },
 }
+
+With `--shard-dir`, each dependency manifest is instead converted (once) into
+a shard, keyed by the manifest's hash, in the compact index format from
+`source_db_index.py`, and the DB references the shards rather than inlining
+them:
+
+{
+  "sources": { ... },
+  "dependency_shards": [<shard1-path>, <shard2-path>, ...],
+}
+
+Writing the DB only hashes the dependency manifests and converts the ones
+without a shard yet; it doesn't read the existing shards. Consumers merge the
+shards with `source_db_index.ShardMerger`, which reads every shard only once
+across all the source DBs it merges, and which reports duplicate entries
+across the shards. `--index-output` additionally writes the merged
+dependencies as an index that can be mmap-ed instead of parsing JSON, which
+does read every shard, and so reports duplicates when the DB is written.
+
+The shard dir is shared between actions, outside of their declared outputs,
+so it isn't hermetic: it's a cache for local builds, and must not be used for
+remotely executed or cached actions. Shards are named by the hash of their
+manifest and written atomically, so concurrent actions can share it.
+
+Nothing in the prelude passes `--shard-dir` or reads `dependency_shards` yet:
+the rules still produce (and their consumers, such as Pyre, still expect)
+inlined dependencies. The option is for out of tree consumers that merge
+source DBs with `ShardMerger`.
 """
 
 import argparse
 import json
+import os
 import sys
 
-
-def _load(path: str) -> list[tuple[str, str, str]]:
-    with open(path) as f:
-        return json.load(f)
+from manifests import load_manifest
+from source_db_index import file_digest, ShardMerger, write_index
 
 
 def _read_dependency_paths(manifest_file: str) -> list[str]:
@@ -56,6 +83,17 @@ def main(argv: list[str]) -> None:
     parser.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
     parser.add_argument("--sources")
     parser.add_argument("--dependency_manifests")
+    parser.add_argument(
+        "--shard-dir",
+        help=(
+            "Directory of dependency shards to reference instead of inlining, "
+            "shared between actions (see above)"
+        ),
+    )
+    parser.add_argument(
+        "--index-output",
+        help="Also write the merged dependencies as a source DB index",
+    )
     args = parser.parse_args(argv[1:])
 
     db = {}
@@ -63,7 +101,7 @@ def main(argv: list[str]) -> None:
     # Add sources.
     sources = {}
     if args.sources is not None:
-        for name, path, _ in _load(args.sources):
+        for name, path, _ in load_manifest(args.sources):
             sources[name] = path
     db["sources"] = sources
 
@@ -74,21 +112,39 @@ def main(argv: list[str]) -> None:
         if args.dependency_manifests
         else []
     )
-    for dep in deps_paths:
-        for name, path, origin in _load(dep):
-            prev = dependencies.get(name)
-            if prev is not None and prev[0] != path:
-                raise Exception(
-                    "Duplicate entries for {}: {} ({}) and {} ({})".format(
-                        name, path, origin, *prev
-                    ),
-                )
-            dependencies[name] = path, origin
-    db["dependencies"] = {n: p for n, (p, _) in dependencies.items()}
+    if args.shard_dir is not None:
+        os.makedirs(args.shard_dir, exist_ok=True)
+        shards = []
+        for dep in deps_paths:
+            shard = os.path.join(args.shard_dir, file_digest(dep) + ".idx")
+            if not os.path.exists(shard):
+                write_index(shard, load_manifest(dep))
+            shards.append(shard)
+        db["dependency_shards"] = shards
+        if args.index_output is not None:
+            merged = ShardMerger().merge(shards)
+            write_index(args.index_output, ((n, p, "") for n, p in merged.items()))
+    else:
+        for dep in deps_paths:
+            for name, path, origin in load_manifest(dep):
+                prev = dependencies.get(name)
+                if prev is not None and prev[0] != path:
+                    raise Exception(
+                        "Duplicate entries for {}: {} ({}) and {} ({})".format(
+                            name, path, origin, *prev
+                        ),
+                    )
+                dependencies[name] = path, origin
+        db["dependencies"] = {n: p for n, (p, _) in dependencies.items()}
+        if args.index_output is not None:
+            write_index(
+                args.index_output, ((n, p, o) for n, (p, o) in dependencies.items())
+            )
 
     # Write db out.
     json.dump(db, args.output, indent=2)
     args.output.close()
 
 
-sys.exit(main(sys.argv))
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,179 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+"""
+Reading and writing of Python source manifests.
+
+A manifest lists `[dest, src, origin]` entries, where `dest` is the path of a
+file in the package, `src` the path of the file to package and `origin` the
+target that provided it. Manifests come in two interchangeable encodings:
+
+- JSON, as written by the rules: `[["foo.py", "input/foo.py", "//my_rule:foo"]]`
+- A compact binary encoding: `MAGIC`, followed by NUL terminated UTF-8 `dest`,
+  `src` and `origin` fields for every entry, where an `origin` of
+  `SAME_ORIGIN` repeats the previous entry's (entries from one target are
+  almost always adjacent).
+
+`load_manifest` streams entries out of either encoding without holding the
+whole manifest in memory, and interns origins, which are shared by many
+entries.
+
+Convert a JSON manifest to the binary encoding with:
+$ manifests.py --binary input.json output.manifest
+"""
+
+import argparse
+import io
+import json
+import re
+import sys
+from collections.abc import Iterable, Iterator
+from typing import IO
+
+MAGIC: bytes = b"\0PYMANIFEST1\n"
+SAME_ORIGIN: str = "\x01"
+
+_CHUNK_SIZE = 1 << 20
+_WHITESPACE: re.Pattern[str] = re.compile(r"[ \t\n\r]*")
+
+
+class ManifestError(ValueError):
+    pass
+
+
+def _iter_json(f: IO[str], path: str) -> Iterator[tuple[str, str, str]]:
+    """
+    Incrementally parse a JSON manifest, decoding one entry at a time from a
+    bounded window of the file.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill() -> None:
+        nonlocal buf, pos, eof
+        chunk = f.read(_CHUNK_SIZE)
+        buf = buf[pos:] + chunk
+        pos = 0
+        eof = not chunk
+
+    def next_char() -> str:
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf) or eof:
+                return buf[pos : pos + 1]
+            fill()
+
+    if next_char() != "[":
+        raise ManifestError("{}: expected a JSON list of entries".format(path))
+    pos += 1
+    first = True
+    while True:
+        c = next_char()
+        if c == "]":
+            return
+        if not first:
+            if c != ",":
+                raise ManifestError("{}: expected `,` at offset {}".format(path, pos))
+            pos += 1
+            next_char()
+        first = False
+        while True:
+            try:
+                entry, end = decoder.raw_decode(buf, pos)
+                break
+            except json.JSONDecodeError:
+                # The entry may just be cut off by the end of the window.
+                if eof:
+                    raise
+                fill()
+        pos = end
+        dest, src, origin = entry
+        yield dest, src, sys.intern(origin)
+
+
+def _iter_binary(f: IO[bytes]) -> Iterator[tuple[str, str, str]]:
+    fields: list[str] = []
+    origin = ""
+    rest = b""
+    while True:
+        chunk = f.read(_CHUNK_SIZE)
+        if not chunk:
+            break
+        parts = (rest + chunk).split(b"\0")
+        rest = parts.pop()
+        for part in parts:
+            fields.append(part.decode("utf-8"))
+            if len(fields) == 3:
+                dest, src, new_origin = fields
+                if new_origin != SAME_ORIGIN:
+                    origin = sys.intern(new_origin)
+                yield dest, src, origin
+                fields = []
+    if rest or fields:
+        raise ManifestError("truncated binary manifest")
+
+
+def load_manifest(path: str) -> Iterator[tuple[str, str, str]]:
+    """
+    Yield the `(dest, src, origin)` entries of the manifest at `path`, in
+    either encoding.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) == MAGIC:
+            yield from _iter_binary(f)
+            return
+        f.seek(0)
+        with io.TextIOWrapper(f, encoding="utf-8") as text:
+            yield from _iter_json(text, path)
+
+
+def write_manifest(
+    out: IO[bytes], entries: Iterable[tuple[str, str, str]], binary: bool = False
+) -> None:
+    """Write `entries` to `out`, using the binary encoding if `binary`."""
+    if not binary:
+        out.write(json.dumps([list(entry) for entry in entries]).encode("utf-8"))
+        return
+    out.write(MAGIC)
+    prev_origin = None
+    for dest, src, origin in entries:
+        if origin == prev_origin:
+            fields = (dest, src, SAME_ORIGIN)
+        else:
+            fields = (dest, src, origin)
+            prev_origin = origin
+        for field in fields:
+            if "\0" in field:
+                raise ManifestError(
+                    "manifest fields can't contain NUL: {!r}".format(field)
+                )
+            out.write(field.encode("utf-8"))
+            out.write(b"\0")
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        description="Re-encode a Python source manifest.",
+        fromfile_prefix_chars="@",
+    )
+    parser.add_argument("--binary", action="store_true", default=False)
+    parser.add_argument("input")
+    parser.add_argument("output")
+    args = parser.parse_args(argv[1:])
+
+    with open(args.output, "wb") as out:
+        write_manifest(out, load_manifest(args.input), binary=args.binary)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -9,9 +9,365 @@
 
 # pyre-strict
 
+"""
+Add rpaths to native libraries (the equivalent of `patchelf --force-rpath
+--add-rpath`).
+
+The dynamic section is edited in-process when the new `DT_RPATH` string fits
+in unused space of the dynamic string table (e.g. the space of the existing
+rpath, and any bytes left unreferenced after it) and, if the library has no
+rpath yet, there's a spare `DT_NULL` slot for the new entry (GNU ld reserves
+a few). Otherwise, `patchelf` is run.
+"""
+
 import argparse
+import json
+import os
+import shutil
+import struct
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+_ELF_MAGIC = b"\x7fELF"
+
+_PT_LOAD = 1
+_PT_DYNAMIC = 2
+
+_SHT_SYMTAB = 2
+_SHT_DYNAMIC = 6
+_SHT_DYNSYM = 11
+_SHT_GNU_VERDEF = 0x6FFFFFFD
+_SHT_GNU_VERNEED = 0x6FFFFFFE
+
+_DT_NULL = 0
+_DT_STRTAB = 5
+_DT_STRSZ = 10
+_DT_RPATH = 15
+_DT_RUNPATH = 29
+
+# Dynamic tags whose values are offsets into the dynamic string table.
+_STRING_TAGS = {
+    1,  # DT_NEEDED
+    14,  # DT_SONAME
+    _DT_RPATH,
+    _DT_RUNPATH,
+    0x6FFFFEFA,  # DT_CONFIG
+    0x6FFFFEFB,  # DT_DEPAUDIT
+    0x6FFFFEFC,  # DT_AUDIT
+    0x7FFFFFFD,  # DT_AUXILIARY
+    0x7FFFFFFF,  # DT_FILTER
+}
+
+# Other tags that may be found in the OS and processor specific ranges, and
+# don't reference the dynamic string table. Anything else might, so isn't
+# edited in-process.
+_NON_STRING_TAGS = {
+    0x6FFFFDF4,  # DT_GNU_FLAGS_1
+    0x6FFFFDF5,  # DT_GNU_PRELINKED
+    0x6FFFFDF8,  # DT_CHECKSUM
+    0x6FFFFDFC,  # DT_FEATURE_1
+    0x6FFFFDFD,  # DT_POSFLAG_1
+    0x6FFFFEF5,  # DT_GNU_HASH
+    0x6FFFFEF6,  # DT_TLSDESC_PLT
+    0x6FFFFEF7,  # DT_TLSDESC_GOT
+    0x6FFFFFF0,  # DT_VERSYM
+    0x6FFFFFF9,  # DT_RELACOUNT
+    0x6FFFFFFA,  # DT_RELCOUNT
+    0x6FFFFFFB,  # DT_FLAGS_1
+    0x6FFFFFFC,  # DT_VERDEF
+    0x6FFFFFFD,  # DT_VERDEFNUM
+    0x6FFFFFFE,  # DT_VERNEED
+    0x6FFFFFFF,  # DT_VERNEEDNUM
+    0x70000001,  # DT_AARCH64_BTI_PLT
+    0x70000003,  # DT_AARCH64_PAC_PLT
+    0x70000005,  # DT_AARCH64_VARIANT_PCS
+}
+
+# The last tag defined by the generic ABI (DT_RELRENT).
+_MAX_GENERIC_TAG = 37
+
+
+class UnsupportedELFError(Exception):
+    """The library can't be edited in-process, and needs `patchelf`."""
+
+
+class _Segment(NamedTuple):
+    type: int
+    offset: int
+    vaddr: int
+    filesz: int
+
+
+class _Section(NamedTuple):
+    type: int
+    offset: int
+    size: int
+    link: int
+    info: int
+    entsize: int
+
+
+class _ELF:
+    def __init__(self, data: bytearray) -> None:
+        if data[:4] != _ELF_MAGIC:
+            raise UnsupportedELFError("not an ELF file")
+        ei_class, ei_data = data[4], data[5]
+        if ei_class not in (1, 2) or ei_data not in (1, 2):
+            raise UnsupportedELFError("unknown ELF class or data encoding")
+        self.data = data
+        self.is64: bool = ei_class == 2
+        self.endian: str = "<" if ei_data == 1 else ">"
+        word = "Q" if self.is64 else "I"
+        phoff, shoff, _flags, _ehsize, phentsize, phnum, shentsize, shnum = self.unpack(
+            "{0}{0}IHHHHH".format(word), 16 + 8 + (8 if self.is64 else 4)
+        )
+
+        self.segments: list[_Segment] = []
+        for i in range(phnum):
+            off = phoff + i * phentsize
+            if self.is64:
+                p_type, _, offset, vaddr, _, filesz = self.unpack("IIQQQQ", off)
+            else:
+                p_type, offset, vaddr, _, filesz = self.unpack("IIIII", off)
+            self.segments.append(_Segment(p_type, offset, vaddr, filesz))
+
+        self.sections: list[_Section] = []
+        for i in range(shnum):
+            off = shoff + i * shentsize
+            _, sh_type, _, _, offset, size, link, info, _, entsize = self.unpack(
+                "II{0}{0}{0}{0}II{0}{0}".format(word), off
+            )
+            self.sections.append(_Section(sh_type, offset, size, link, info, entsize))
+
+    def unpack(self, fmt: str, offset: int) -> tuple[int, ...]:
+        try:
+            return struct.unpack_from(self.endian + fmt, self.data, offset)
+        except struct.error:
+            raise UnsupportedELFError("truncated ELF file")
+
+    def pack(self, fmt: str, offset: int, *values: int) -> None:
+        struct.pack_into(self.endian + fmt, self.data, offset, *values)
+
+    def vaddr_to_offset(self, vaddr: int) -> int:
+        for seg in self.segments:
+            if seg.type == _PT_LOAD and seg.vaddr <= vaddr < seg.vaddr + seg.filesz:
+                return vaddr - seg.vaddr + seg.offset
+        raise UnsupportedELFError("address {:#x} isn't mapped".format(vaddr))
+
+
+class _StringTable:
+    """Tracks which bytes of the dynamic string table are referenced."""
+
+    def __init__(self, data: bytearray, offset: int, size: int) -> None:
+        if offset + size > len(data):
+            raise UnsupportedELFError("string table out of bounds")
+        self.data = data
+        self.offset = offset
+        self.size = size
+        self.used = bytearray(size)
+
+    def get(self, index: int) -> bytes:
+        end = self.data.find(b"\0", self.offset + index, self.offset + self.size)
+        if index >= self.size or end < 0:
+            raise UnsupportedELFError("string {} out of bounds".format(index))
+        return bytes(self.data[self.offset + index : end])
+
+    def mark(self, index: int) -> None:
+        length = len(self.get(index)) + 1
+        self.used[index : index + length] = b"\1" * length
+
+    def is_free(self, index: int, length: int) -> bool:
+        return index + length <= self.size and not any(
+            self.used[index : index + length]
+        )
+
+    def find_free(self, length: int) -> int | None:
+        index = self.used.find(b"\0" * length)
+        return None if index < 0 else index
+
+    def write(self, index: int, value: bytes) -> None:
+        start = self.offset + index
+        self.data[start : start + len(value)] = value
+
+
+def _mark_section_strings(elf: _ELF, strtab: _StringTable, section: _Section) -> None:
+    if section.type in (_SHT_DYNSYM, _SHT_SYMTAB):
+        if section.entsize == 0:
+            raise UnsupportedELFError("symbol table without an entry size")
+        for i in range(section.size // section.entsize):
+            (name,) = elf.unpack("I", section.offset + i * section.entsize)
+            strtab.mark(name)
+    elif section.type == _SHT_GNU_VERDEF:
+        off = section.offset
+        for _ in range(section.info):
+            cnt, _, aux, nxt = elf.unpack("HIII", off + 6)
+            aux_off = off + aux
+            for _ in range(cnt):
+                name, aux_next = elf.unpack("II", aux_off)
+                strtab.mark(name)
+                aux_off += aux_next
+            off += nxt
+    elif section.type == _SHT_GNU_VERNEED:
+        off = section.offset
+        for _ in range(section.info):
+            cnt, file, aux, nxt = elf.unpack("HIII", off + 2)
+            strtab.mark(file)
+            aux_off = off + aux
+            for _ in range(cnt):
+                name, aux_next = elf.unpack("II", aux_off + 8)
+                strtab.mark(name)
+                aux_off += aux_next
+            off += nxt
+    elif section.type != _SHT_DYNAMIC:
+        raise UnsupportedELFError(
+            "unknown section type {:#x} uses the dynamic string table".format(
+                section.type
+            )
+        )
+
+
+def add_rpath_in_place(data: bytearray, rpath: str) -> None:
+    """
+    Add `rpath` to the `DT_RPATH` of the ELF file in `data` (converting any
+    `DT_RUNPATH` to it), without resizing anything, or raise
+    `UnsupportedELFError` if there's no room.
+    """
+    elf = _ELF(data)
+    dynamic = [seg for seg in elf.segments if seg.type == _PT_DYNAMIC]
+    if len(dynamic) != 1:
+        raise UnsupportedELFError("no dynamic segment")
+    dyn_fmt = "qQ" if elf.is64 else "iI"
+    dyn_size = struct.calcsize(dyn_fmt)
+    entries = []
+    spare = 0
+    for i in range(dynamic[0].filesz // dyn_size):
+        offset = dynamic[0].offset + i * dyn_size
+        tag, val = elf.unpack(dyn_fmt, offset)
+        if tag == _DT_NULL:
+            spare += 1
+        elif spare:
+            raise UnsupportedELFError("entries after DT_NULL")
+        else:
+            entries.append((offset, tag, val))
+    tags = {tag: val for _, tag, val in entries}
+    if _DT_STRTAB not in tags or _DT_STRSZ not in tags:
+        raise UnsupportedELFError("no dynamic string table")
+    rpaths = [
+        (off, tag, val) for off, tag, val in entries if tag in (_DT_RPATH, _DT_RUNPATH)
+    ]
+    if len(rpaths) > 1:
+        raise UnsupportedELFError("multiple rpath entries")
+
+    strtab_offset = elf.vaddr_to_offset(tags[_DT_STRTAB])
+    strtab = _StringTable(data, strtab_offset, tags[_DT_STRSZ])
+    for _, tag, val in entries:
+        if tag in _STRING_TAGS:
+            if tag not in (_DT_RPATH, _DT_RUNPATH):
+                strtab.mark(val)
+        elif tag > _MAX_GENERIC_TAG and tag not in _NON_STRING_TAGS:
+            raise UnsupportedELFError("unknown dynamic tag {:#x}".format(tag))
+    # Only section headers tell us which symbol and version tables reference
+    # the string table, so we can't tell what's unused without them.
+    strtab_sections = [
+        i for i, section in enumerate(elf.sections) if section.offset == strtab_offset
+    ]
+    if len(strtab_sections) != 1:
+        raise UnsupportedELFError("no dynamic string table section")
+    for section in elf.sections:
+        if section.link == strtab_sections[0]:
+            _mark_section_strings(elf, strtab, section)
+
+    if rpaths:
+        dyn_offset, tag, index = rpaths[0]
+        old = strtab.get(index)
+    else:
+        # The first DT_NULL becomes the new entry, so another has to follow.
+        if spare < 2:
+            raise UnsupportedELFError("no spare dynamic entries")
+        dyn_offset, tag, index = dynamic[0].offset + len(entries) * dyn_size, 0, 0
+        old = b""
+
+    old_paths = old.decode("utf-8", "surrogateescape").split(":") if old else []
+    new_paths = rpath.split(":")
+    if all(path in old_paths for path in new_paths):
+        # The loader uses the first occurrence of a path, so appending
+        # duplicates (like `patchelf` would) makes no difference.
+        new = old
+    else:
+        new = (old + b":" if old else b"") + rpath.encode("utf-8", "surrogateescape")
+
+    if new != old:
+        length = len(new) + 1
+        if not (rpaths and strtab.is_free(index, length)):
+            found = strtab.find_free(length)
+            if found is None:
+                raise UnsupportedELFError("no room for the new rpath")
+            index = found
+        # Scrub the old rpath (as `patchelf` does), unless another string
+        # shares its bytes.
+        if old:
+            old_index = rpaths[0][2]
+            for i in range(old_index, old_index + len(old)):
+                if not strtab.used[i]:
+                    data[strtab.offset + i] = ord("X")
+        strtab.write(index, new + b"\0")
+    elif tag == _DT_RPATH:
+        return
+    elf.pack(dyn_fmt, dyn_offset, _DT_RPATH, index)
+
+
+def _copy(src: str, dst: str) -> None:
+    # Like `cp --reflink=auto`, share the data with the source when the
+    # filesystem supports it.
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            import fcntl
+
+            fcntl.ioctl(
+                fdst.fileno(), getattr(fcntl, "FICLONE", 0x40049409), fsrc.fileno()
+            )
+        except (ImportError, OSError):
+            shutil.copyfileobj(fsrc, fdst, 1 << 20)
+    shutil.copymode(src, dst)
+
+
+def patch(patchelf: list[str], src: str, output: str, rpaths: list[str]) -> bool:
+    """
+    Write `src`, with `rpaths` added, to `output`, returning whether it was
+    done in-process.
+    """
+    with open(src, "rb") as f:
+        is_elf = f.read(4) == _ELF_MAGIC
+    # If this path isn't an ELF file, then there's nothing to do.
+    if not is_elf:
+        _copy(src, output)
+        return True
+
+    rpath = ":".join(rpaths)
+    with open(src, "rb") as f:
+        data = bytearray(f.read())
+    try:
+        add_rpath_in_place(data, rpath)
+    except UnsupportedELFError:
+        # Otherwise, patch in the rpaths.
+        subprocess.check_call(
+            patchelf
+            + [
+                "--force-rpath",
+                "--add-rpath",
+                rpath,
+                "--output",
+                output,
+                src,
+            ]
+        )
+        return False
+    with open(output, "wb") as f:
+        f.write(data)
+    shutil.copymode(src, output)
+    return True
 
 
 def main(argv: list[str]) -> None:
@@ -19,35 +375,54 @@ def main(argv: list[str]) -> None:
     parser.add_argument("--patchelf", action="append", required=True)
     parser.add_argument("-f", action="store_true")
     parser.add_argument("--rpath", action="append", dest="rpaths", default=[])
-    parser.add_argument("-o", "--output", required=True)
-    parser.add_argument("path")
+    parser.add_argument("-o", "--output")
+    parser.add_argument(
+        "--batch",
+        help=(
+            "JSON file listing `[path, output, rpaths]` libraries to patch, "
+            "instead of a single path"
+        ),
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of libraries to patch in parallel with --batch",
+    )
+    parser.add_argument("path", nargs="?")
     args = parser.parse_args(argv[1:])
 
     if args.patchelf is None:
         args.patchelf = ["patchelf"]
 
-    if not args.rpaths:
-        parser.error("no rpaths specified")
+    if args.batch is not None:
+        if args.path is not None or args.output is not None:
+            parser.error("--batch can't be used with a path or --output")
+        with open(args.batch) as f:
+            batch = [
+                (src, output, rpaths or args.rpaths)
+                for src, output, rpaths in json.load(f)
+            ]
+    else:
+        if args.path is None or args.output is None:
+            parser.error("a path and --output are required")
+        batch = [(args.path, args.output, args.rpaths)]
 
-    # If this path isn't an ELF file, then there's nothing to do.
-    with open(args.path, "rb") as f:
-        if f.read(4) != b"\x7fELF":
-            # do a reflink copy from path to output
-            subprocess.check_call(["cp", "--reflink=auto", args.path, args.output])
-            return
-
-    # Otherwise, patch in the rpaths.
-    subprocess.check_call(
-        args.patchelf
-        + [
-            "--force-rpath",
-            "--add-rpath",
-            ":".join(args.rpaths),
-            "--output",
-            args.output,
-            args.path,
+    for _, _, rpaths in batch:
+        if not rpaths:
+            parser.error("no rpaths specified")
+
+    if len(batch) == 1 or args.jobs <= 1:
+        for src, output, rpaths in batch:
+            patch(args.patchelf, src, output, rpaths)
+        return
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [
+            pool.submit(patch, args.patchelf, src, output, rpaths)
+            for src, output, rpaths in batch
         ]
-    )
+        for future in futures:
+            future.result()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,188 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+"""
+A compact, mmap-able index of source DB entries.
+
+The layout (all integers little endian) is:
+
+    MAGIC
+    u64 count
+    u64 offsets[count + 1]      (relative to the start of the records)
+    records                     (`name\\0path\\0origin`, sorted by name)
+
+so a reader can binary search for a module without parsing anything else.
+Indexes are used both for the per-manifest shards written by
+`make_source_db.py --shard-dir` and for merged dependency maps.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Iterable, Iterator, Mapping
+from typing import Optional
+
+MAGIC: bytes = b"PYSRCDB1"
+
+_COUNT = struct.Struct("<Q")
+
+
+class DuplicateEntryError(Exception):
+    pass
+
+
+def _check_duplicate(
+    name: str, path: str, origin: str, prev: Optional[tuple[str, str]]
+) -> None:
+    if prev is not None and prev[0] != path:
+        raise DuplicateEntryError(
+            "Duplicate entries for {}: {} ({}) and {} ({})".format(
+                name, path, origin, *prev
+            ),
+        )
+
+
+def write_index(path: str, entries: Iterable[tuple[str, str, str]]) -> None:
+    """
+    Atomically write `(name, path, origin)` entries to an index at `path`,
+    failing on conflicting entries for the same name.
+    """
+    merged: dict[str, tuple[str, str]] = {}
+    for name, src, origin in entries:
+        _check_duplicate(name, src, origin, merged.get(name))
+        merged[name] = src, origin
+
+    records = []
+    offsets = [0]
+    for name in sorted(merged):
+        src, origin = merged[name]
+        record = "{}\0{}\0{}".format(name, src, origin).encode("utf-8")
+        records.append(record)
+        offsets.append(offsets[-1] + len(record))
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(_COUNT.pack(len(records)))
+            f.write(struct.pack("<{}Q".format(len(offsets)), *offsets))
+            for record in records:
+                f.write(record)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class SourceDBIndex(Mapping[str, str]):
+    """Read-only mapping of module name to path, backed by an mmap-ed index."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[: len(MAGIC)] != MAGIC:
+            raise ValueError("{} is not a source DB index".format(path))
+        (self._count,) = _COUNT.unpack_from(self._mm, len(MAGIC))
+        self._offsets_start: int = len(MAGIC) + _COUNT.size
+        self._records_start: int = self._offsets_start + 8 * (self._count + 1)
+
+    def _record(self, i: int) -> list[bytes]:
+        start, end = struct.unpack_from("<2Q", self._mm, self._offsets_start + 8 * i)
+        return self._mm[self._records_start + start : self._records_start + end].split(
+            b"\0"
+        )
+
+    def _find(self, name: str) -> Optional[list[bytes]]:
+        key = name.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = self._record(mid)
+            if record[0] < key:
+                lo = mid + 1
+            elif record[0] > key:
+                hi = mid
+            else:
+                return record
+        return None
+
+    def __getitem__(self, name: str) -> str:
+        record = self._find(name)
+        if record is None:
+            raise KeyError(name)
+        return record[1].decode("utf-8")
+
+    def origin(self, name: str) -> str:
+        record = self._find(name)
+        if record is None:
+            raise KeyError(name)
+        return record[2].decode("utf-8")
+
+    def entries(self) -> Iterator[tuple[str, str, str]]:
+        for i in range(self._count):
+            name, path, origin = self._record(i)
+            yield name.decode("utf-8"), path.decode("utf-8"), origin.decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for name, _, _ in self.entries():
+            yield name
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ShardMerger:
+    """
+    Lazily merges shards referenced by source DBs (`dependency_shards`).
+
+    Each shard is read at most once per merger, so merging the source DBs of
+    many targets, which share most of their dependencies, only reads the
+    shards that haven't been seen yet.
+    """
+
+    def __init__(self) -> None:
+        self._shards: dict[str, dict[str, tuple[str, str]]] = {}
+
+    def _load(self, shard: str) -> dict[str, tuple[str, str]]:
+        key = os.path.basename(shard)
+        loaded = self._shards.get(key)
+        if loaded is None:
+            index = SourceDBIndex(shard)
+            try:
+                loaded = {
+                    name: (path, origin) for name, path, origin in index.entries()
+                }
+            finally:
+                index.close()
+            self._shards[key] = loaded
+        return loaded
+
+    def merge(self, shards: Iterable[str]) -> dict[str, str]:
+        """Merge the given shards, in order, into one dependency map."""
+        dependencies: dict[str, tuple[str, str]] = {}
+        for shard in shards:
+            for name, (path, origin) in self._load(shard).items():
+                _check_duplicate(name, path, origin, dependencies.get(name))
+                dependencies[name] = path, origin
+        return {n: p for n, (p, _) in dependencies.items()}
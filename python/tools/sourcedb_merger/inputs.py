@@ -9,10 +9,12 @@
 # pyre-strict
 
 
+import collections
 import dataclasses
 import json
 import pathlib
-from collections.abc import Iterable, Mapping
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
 
 
 class BuildMapLoadError(Exception):
@@ -62,11 +64,47 @@ class TargetEntry:
     build_map: PartialBuildMap
 
 
-def load_targets_and_build_maps_from_json(input_json: object) -> Iterable[TargetEntry]:
+def _load_target_entry(target: str, path: str) -> TargetEntry:
+    return TargetEntry(
+        target=Target(target),
+        # pyre-fixme[6]: For 1st argument expected `Path` but got `str`.
+        build_map=PartialBuildMap.load_from_path(path),
+    )
+
+
+def _load_target_entries(items: list[tuple[str, str]]) -> list[TargetEntry]:
+    return [_load_target_entry(target, path) for target, path in items]
+
+
+def _load_in_parallel(
+    items: list[tuple[str, str]], jobs: int, batch_size: int = 64
+) -> Iterator[TargetEntry]:
+    # Only keep a bounded window of batches in flight, so that entries are
+    # handed to the (streaming) merge in order without all being held at once.
+    window = jobs * 2
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending: collections.deque[Future[list[TargetEntry]]] = collections.deque()
+        for start in range(0, len(items), batch_size):
+            batch = items[start : start + batch_size]
+            pending.append(executor.submit(_load_target_entries, batch))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def load_targets_and_build_maps_from_json(
+    input_json: object, jobs: int = 1
+) -> Iterable[TargetEntry]:
+    """
+    Load the partial build map of every target, in input order. With `jobs`
+    greater than 1, build maps are read and parsed from a thread pool.
+    """
     if not isinstance(input_json, dict):
         raise BuildMapLoadError(
             f"Input JSON should be a dict. Got {type(input_json)} instead"
         )
+    items = []
     for key, value in input_json.items():
         if not isinstance(key, str):
             raise BuildMapLoadError(
@@ -76,13 +114,14 @@ def load_targets_and_build_maps_from_json(input_json: object) -> Iterable[Target
             raise BuildMapLoadError(
                 f"Sourcedb file paths are expected to be strings. Got `{value}`."
             )
-        yield TargetEntry(
-            target=Target(key),
-            # pyre-fixme[6]: For 1st argument expected `Path` but got `str`.
-            build_map=PartialBuildMap.load_from_path(value),
-        )
+        items.append((key, value))
+    if jobs > 1:
+        return _load_in_parallel(items, jobs)
+    return (_load_target_entry(target, path) for target, path in items)
 
 
-def load_targets_and_build_maps_from_path(input_path: str) -> Iterable[TargetEntry]:
+def load_targets_and_build_maps_from_path(
+    input_path: str, jobs: int = 1
+) -> Iterable[TargetEntry]:
     with open(input_path) as input_file:
-        return load_targets_and_build_maps_from_json(json.load(input_file))
+        return load_targets_and_build_maps_from_json(json.load(input_file), jobs)
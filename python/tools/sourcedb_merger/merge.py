@@ -19,19 +19,46 @@ import inputs
 import outputs
 
 
-def run_merge(input_file: str, output_file: str) -> None:
-    target_entries = inputs.load_targets_and_build_maps_from_path(input_file)
-    merged_build_map = outputs.merge_partial_build_maps(target_entries)
+def run_merge(
+    input_file: str,
+    output_file: str,
+    jobs: int = 1,
+    conflicts_file: str | None = None,
+) -> None:
+    target_entries = inputs.load_targets_and_build_maps_from_path(input_file, jobs)
+    conflicts: list[outputs.Conflict] | None = (
+        [] if conflicts_file is not None else None
+    )
+    merged_build_map = outputs.merge_partial_build_maps(target_entries, conflicts)
     merged_build_map.write_build_map_json_file(pathlib.Path(output_file))
+    if conflicts_file is not None and conflicts is not None:
+        outputs.write_conflicts_json_file(conflicts, pathlib.Path(conflicts_file))
 
 
 def main(argv: Sequence[str]) -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("input", type=str)
     parser.add_argument("-o", "--output", required=True, type=str)
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of threads to load partial build maps with",
+    )
+    parser.add_argument(
+        "--conflicts-output",
+        type=str,
+        help="Write artifact paths provided with different sources to this file",
+    )
     arguments = parser.parse_args(argv[1:])
 
-    run_merge(arguments.input, arguments.output)
+    run_merge(
+        arguments.input,
+        arguments.output,
+        arguments.jobs,
+        arguments.conflicts_output,
+    )
 
 
 if __name__ == "__main__":
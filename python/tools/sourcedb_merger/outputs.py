@@ -38,21 +38,62 @@ class FullBuildMap:
             json.dump(self.to_build_map_json(), output_file, indent=2)
 
 
+@dataclasses.dataclass(frozen=True)
+class Conflict:
+    artifact_path: str
+    preserved: SourceInfo
+    dropped: SourceInfo
+
+    def to_json(self) -> dict[str, str]:
+        return {
+            "artifact_path": self.artifact_path,
+            "preserved_target": self.preserved.target.name,
+            "preserved_source_path": self.preserved.source_path,
+            "dropped_target": self.dropped.target.name,
+            "dropped_source_path": self.dropped.source_path,
+        }
+
+
+def write_conflicts_json_file(
+    conflicts: Iterable[Conflict], path: pathlib.Path
+) -> None:
+    with open(path, "w") as output_file:
+        json.dump([conflict.to_json() for conflict in conflicts], output_file, indent=2)
+
+
 def merge_partial_build_map_inplace(
     sofar: dict[str, SourceInfo],
     target_entry: inputs.TargetEntry,
+    conflicts: list[Conflict] | None = None,
 ) -> None:
+    """
+    Merge a target's build map into `sofar`. The first target to provide an
+    artifact path wins; if `conflicts` is given, every later target mapping
+    that path to a different source is recorded there.
+    """
     for artifact_path, source_path in target_entry.build_map.content.items():
-        sofar.setdefault(
-            artifact_path,
-            SourceInfo(source_path=source_path, target=target_entry.target),
-        )
+        existing = sofar.get(artifact_path)
+        if existing is None:
+            sofar[artifact_path] = SourceInfo(
+                source_path=source_path, target=target_entry.target
+            )
+        elif conflicts is not None and existing.source_path != source_path:
+            conflicts.append(
+                Conflict(
+                    artifact_path=artifact_path,
+                    preserved=existing,
+                    dropped=SourceInfo(
+                        source_path=source_path, target=target_entry.target
+                    ),
+                )
+            )
 
 
 def merge_partial_build_maps(
     target_entries: Iterable[inputs.TargetEntry],
+    conflicts: list[Conflict] | None = None,
 ) -> FullBuildMap:
     result: dict[str, SourceInfo] = {}
     for target_entry in target_entries:
-        merge_partial_build_map_inplace(result, target_entry)
+        merge_partial_build_map_inplace(result, target_entry, conflicts)
     return FullBuildMap(result)
@@ -115,3 +115,25 @@ class InputsTest(unittest.TestCase):
                 list(load_targets_and_build_maps_from_json({"//target0": "c.txt"}))
             with self.assertRaises(BuildMapLoadError):
                 list(load_targets_and_build_maps_from_json({"//target0": "d.json"}))
+
+    def test_load_targets_and_build_map_in_parallel(self) -> None:
+        with (
+            tempfile.TemporaryDirectory() as root,
+            switch_working_directory(Path(root)),
+        ):
+            targets = {}
+            for i in range(50):
+                write_files({f"{i}.json": json.dumps({f"m{i}.py": f"src/m{i}.py"})})
+                targets[f"//target{i}"] = f"{i}.json"
+
+            # Entries come back in input order, as with serial loading.
+            self.assertEqual(
+                list(load_targets_and_build_maps_from_json(targets, jobs=4)),
+                list(load_targets_and_build_maps_from_json(targets)),
+            )
+            with self.assertRaises(FileNotFoundError):
+                list(
+                    load_targets_and_build_maps_from_json(
+                        {**targets, "//target50": "nonexistent.json"}, jobs=4
+                    )
+                )
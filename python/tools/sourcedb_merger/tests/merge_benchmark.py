@@ -0,0 +1,81 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+"""
+Benchmark for merging many partial build maps with `merge.py`.
+
+Writes a synthetic set of per-target partial build maps (with overlapping
+artifact paths, as targets sharing sources have), then times serial and
+parallel loading through the same streaming merge.
+
+$ python3 tests/merge_benchmark.py --targets 50000 --jobs 8
+"""
+
+import argparse
+import json
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import merge  # noqa: E402
+
+
+def _synthesize(root: pathlib.Path, num_targets: int, per_target: int) -> str:
+    targets = {}
+    for i in range(num_targets):
+        # Neighbouring targets share half of their modules.
+        build_map = {
+            f"pkg{(i + j) // per_target}/mod{i + j}.py": f"fbcode/pkg/mod{i + j}.py"
+            for j in range(per_target)
+        }
+        path = root / f"{i}.json"
+        path.write_text(json.dumps(build_map))
+        targets[f"//pkg{i}:target"] = str(path)
+    input_file = root / "targets.json"
+    input_file.write_text(json.dumps(targets))
+    return str(input_file)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--targets", type=int, default=50000)
+    parser.add_argument("--modules-per-target", type=int, default=20)
+    parser.add_argument("--jobs", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = pathlib.Path(tmp)
+        input_file = _synthesize(root, args.targets, args.modules_per_target)
+
+        timings = {}
+        for jobs in (1, args.jobs):
+            start = time.perf_counter()
+            merge.run_merge(
+                input_file,
+                str(root / f"merged{jobs}.json"),
+                jobs=jobs,
+                conflicts_file=str(root / f"conflicts{jobs}.json"),
+            )
+            timings[jobs] = time.perf_counter() - start
+
+        assert (root / "merged1.json").read_text() == (
+            root / f"merged{args.jobs}.json"
+        ).read_text()
+
+    print("targets:   {}".format(args.targets))
+    for jobs, elapsed in timings.items():
+        print("jobs={:<4} {:.3f}s".format(jobs, elapsed))
+
+
+if __name__ == "__main__":
+    main()
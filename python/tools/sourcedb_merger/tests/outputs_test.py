@@ -69,3 +69,38 @@ class OutputsTest(unittest.TestCase):
                 "b.py": "baz/b.py",
             },
         )
+
+    def test_merge_reports_conflicts(self) -> None:
+        conflicts = []
+        merged = merge_partial_build_maps(
+            [
+                TargetEntry(
+                    target=Target("//target0"),
+                    build_map=PartialBuildMap({"a.py": "foo/a.py"}),
+                ),
+                TargetEntry(
+                    target=Target("//target1"),
+                    build_map=PartialBuildMap({"a.py": "bar/a.py", "b.py": "bar/b.py"}),
+                ),
+                TargetEntry(
+                    target=Target("//target2"),
+                    build_map=PartialBuildMap({"a.py": "foo/a.py"}),
+                ),
+            ],
+            conflicts,
+        )
+        self.assertDictEqual(
+            merged.to_build_map_json(), {"a.py": "foo/a.py", "b.py": "bar/b.py"}
+        )
+        self.assertEqual(
+            [conflict.to_json() for conflict in conflicts],
+            [
+                {
+                    "artifact_path": "a.py",
+                    "preserved_target": "//target0",
+                    "preserved_source_path": "foo/a.py",
+                    "dropped_target": "//target1",
+                    "dropped_source_path": "bar/a.py",
+                }
+            ],
+        )
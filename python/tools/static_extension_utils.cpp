@@ -8,10 +8,11 @@
  * above-listed licenses.
  */
 
+#include <algorithm>
+#include <cstddef>
+#include <cstdint>
 #include <stdexcept>
-#include <string>
 #include <string_view>
-#include <unordered_map>
 #include "Python.h"
 
 typedef PyObject* (*pyinitfunc)();
@@ -19,12 +20,53 @@ typedef PyObject* (*pyinitfunc)();
 typedef struct {
 } StaticExtensionFinderObject;
 
-// This map is generated at build time by generate_static_extension_info.py
-// and should not be modified at runtime.
-extern std::unordered_map<std::string_view, pyinitfunc> _static_extension_info;
+// These tables are generated at build time by
+// generate_static_extension_info.py and should not be modified at runtime. The
+// names are sorted, with the init function of each name at the same index, and
+// the bloom filter lets most lookups of modules that aren't static extensions
+// return without searching the names.
+extern const size_t _static_extension_count;
+extern const std::string_view _static_extension_names[];
+extern const pyinitfunc _static_extension_initfuncs[];
+extern const size_t _static_extension_bloom_bits;
+extern const uint64_t _static_extension_bloom[];
 
 namespace {
 
+// Must match generate_static_extension_info.py.
+constexpr uint64_t kFnvOffset = 0xcbf29ce484222325ULL;
+constexpr uint64_t kFnvPrime = 0x100000001b3ULL;
+constexpr int kBloomProbes = 2;
+
+bool _maybe_static_extension(std::string_view name) {
+  uint64_t hash = kFnvOffset;
+  for (unsigned char c : name) {
+    hash = (hash ^ c) * kFnvPrime;
+  }
+  const uint64_t step = (hash >> 32) | 1;
+  const uint64_t mask = _static_extension_bloom_bits - 1;
+  for (int i = 0; i < kBloomProbes; i++) {
+    const uint64_t bit = (hash + i * step) & mask;
+    if (!((_static_extension_bloom[bit >> 6] >> (bit & 63)) & 1)) {
+      return false;
+    }
+  }
+  return true;
+}
+
+pyinitfunc _find_static_extension(std::string_view name) {
+  if (!_maybe_static_extension(name)) {
+    return nullptr;
+  }
+  const std::string_view* begin = _static_extension_names;
+  const std::string_view* end = begin + _static_extension_count;
+  const std::string_view* it = std::lower_bound(begin, end, name);
+  if (it == end || *it != name) {
+    return nullptr;
+  }
+  return _static_extension_initfuncs[it - begin];
+}
+
 #if PY_VERSION_HEX < 0x030E0000
 static PyObject* _handle_single_phase_initialization(
     PyObject* mod,
@@ -75,18 +117,17 @@ static PyObject* _create_module(PyObject* self, PyObject* spec) {
     return mod;
   }
 
-  // If the module is not found, try to find it in the static extension map
+  // If the module is not found, try to find it in the static extension table
   // its generated at build time by generate_static_extension_info.py
-  const std::string namestr = PyUnicode_AsUTF8(name);
-  if (namestr.empty()) {
+  Py_ssize_t namelen;
+  const char* namestr = PyUnicode_AsUTF8AndSize(name, &namelen);
+  if (namestr == nullptr || namelen == 0) {
     Py_DECREF(name);
     return nullptr;
   }
 
-  pyinitfunc initfunc = nullptr;
-  if (auto result = _static_extension_info.find(namestr);
-      result != _static_extension_info.end())
-    initfunc = result->second;
+  pyinitfunc initfunc =
+      _find_static_extension(std::string_view(namestr, namelen));
 
   if (initfunc == nullptr) {
     PyErr_SetString(
@@ -107,7 +148,7 @@ static PyObject* _create_module(PyObject* self, PyObject* spec) {
   // supported Meta/Cinder Python 3.13 build, so 3.13 falls back to the stock
   // path.
 #if defined(META_PYTHON)
-  mod = _Ci_PyImport_CallInitFuncWithContext(namestr.c_str(), initfunc);
+  mod = _Ci_PyImport_CallInitFuncWithContext(namestr, initfunc);
 #else
   mod = initfunc();
 #endif
@@ -216,8 +257,12 @@ static PyObject* _check_module(PyObject* self, PyObject* fullname) {
     PyErr_SetString(PyExc_TypeError, "Expected a unicode object");
     return nullptr;
   }
-  const std::string modname = PyUnicode_AsUTF8(fullname);
-  if (_static_extension_info.find(modname) != _static_extension_info.end()) {
+  Py_ssize_t size;
+  const char* modname = PyUnicode_AsUTF8AndSize(fullname, &size);
+  if (modname == nullptr) {
+    return nullptr;
+  }
+  if (_find_static_extension(std::string_view(modname, size)) != nullptr) {
     Py_INCREF(Py_True);
     return Py_True;
   }
@@ -0,0 +1,122 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from py_compile import PycInvalidationMode, PyCompileError
+from typing import Optional
+
+import compile
+
+
+class CompileTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _manifest(self, sources: dict[str, str]) -> Path:
+        entries = []
+        for dest, text in sources.items():
+            src = self.tmp / "src" / dest
+            src.parent.mkdir(parents=True, exist_ok=True)
+            src.write_text(text)
+            entries.append([dest, str(src), "//:lib"])
+        path = self.tmp / "inputs.manifest"
+        path.write_text(json.dumps(entries))
+        return path
+
+    def _compile(
+        self,
+        manifest: Path,
+        output: str,
+        *extra: str,
+        bytecode_manifest: Optional[str] = None,
+    ) -> dict[str, bytes]:
+        out = self.tmp / output
+        if bytecode_manifest is None:
+            bytecode_manifest = str(self.tmp / (output + ".manifest"))
+        compile.main(
+            [
+                "compile.py",
+                "--output",
+                str(out),
+                "--bytecode-manifest",
+                bytecode_manifest,
+                "--debug",
+                *extra,
+                str(manifest),
+            ]
+        )
+        return {
+            str(path.relative_to(out)): path.read_bytes() for path in out.rglob("*.pyc")
+        }
+
+    def test_jobs(self) -> None:
+        manifest = self._manifest(
+            {"pkg/mod{}.py".format(i): "x = {}\n".format(i) for i in range(10)}
+        )
+        serial = self._compile(manifest, "serial")
+        parallel = self._compile(manifest, "parallel", "--jobs", "2")
+        self.assertEqual(len(serial), 10)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(
+            (self.tmp / "serial.manifest").read_text().replace("serial", "parallel"),
+            (self.tmp / "parallel.manifest").read_text(),
+        )
+
+    def test_jobs_failure(self) -> None:
+        manifest = self._manifest(
+            {"a.py": "x = 1\n", "b.py": "x = (\n", "c.py": "def\n", "d.py": "y = 2\n"}
+        )
+        with self.assertRaises(PyCompileError) as cm:
+            # Written to stdout, as it isn't closed on failure.
+            self._compile(manifest, "out", "--jobs", "2", bytecode_manifest="-")
+        # The first failure in manifest order is the one reported.
+        self.assertIn("b.py", str(cm.exception))
+
+    def test_cache(self) -> None:
+        manifest = self._manifest({"a.py": "x = 1\n", "pkg/b.py": "y = 2\n"})
+        cache = str(self.tmp / "cache")
+        stats = self.tmp / "stats.json"
+        first = self._compile(manifest, "first", "--cache-dir", cache)
+        second = self._compile(
+            manifest, "second", "--cache-dir", cache, "--cache-stats", str(stats)
+        )
+        self.assertEqual(first, second)
+        self.assertEqual(
+            json.loads(stats.read_text()), {"hits": 2, "misses": 0, "evictions": 0}
+        )
+        # Stats are only written where asked to.
+        self.assertEqual(
+            sorted(p.name for p in self.tmp.glob("*.json")), ["stats.json"]
+        )
+
+    def test_evict(self) -> None:
+        cache = compile.PycCache(str(self.tmp / "cache"), 0)
+        src = self.tmp / "a.py"
+        src.write_text("x = 1\n")
+        pyc = self.tmp / "a.pyc"
+        pyc.write_bytes(b"pyc")
+        key = cache.key(str(src), "a.py", PycInvalidationMode.UNCHECKED_HASH)
+        cache.store(key, str(pyc))
+        # Another action's write that's still in flight.
+        in_flight = self.tmp / "cache" / key[:2] / "tmpabc.tmp"
+        in_flight.write_bytes(b"partial")
+
+        cache.evict()
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(os.listdir(in_flight.parent), [in_flight.name])
+        self.assertFalse(cache.fetch(key, str(self.tmp / "b.pyc")))
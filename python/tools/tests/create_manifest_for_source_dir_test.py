@@ -0,0 +1,131 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+import json
+import os
+import re
+import tempfile
+import time
+import unittest
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Optional
+from unittest import mock
+
+import create_manifest_for_source_dir
+
+
+class CreateManifestForSourceDirTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        self.src = self.tmp / "src"
+        for d in ("b/tests", "a/x", "c"):
+            (self.src / d).mkdir(parents=True)
+        for f in ("z.py", "a/x/m.py", "a/n.py", "b/tests/t.py", "b/o.py", "c/p.py"):
+            (self.src / f).touch()
+        # Symlinked dirs aren't walked, like with `os.walk`.
+        (self.src / "d").symlink_to("a")
+        (self.src / "c" / "link.py").symlink_to("p.py")
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _expected(self, exclude: str = "^$") -> list[str]:
+        paths = []
+        for root, dirs, files in os.walk(self.src):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if not re.search(exclude, path):
+                    paths.append(path)
+        return paths
+
+    def test_walk_matches_sorted_os_walk(self) -> None:
+        src = str(self.src)
+        for jobs in (1, 3):
+            with self.subTest(jobs=jobs):
+                self.assertEqual(
+                    list(create_manifest_for_source_dir.walk_parallel(src, jobs=jobs)),
+                    self._expected(),
+                )
+                exclude = re.compile("/tests/")
+                self.assertEqual(
+                    list(
+                        create_manifest_for_source_dir.walk_parallel(
+                            src, exclude=exclude, jobs=jobs
+                        )
+                    ),
+                    self._expected("/tests/"),
+                )
+                exclude_dir = re.compile("/tests$")
+                self.assertEqual(
+                    list(
+                        create_manifest_for_source_dir.walk_parallel(
+                            src, exclude_dir=exclude_dir, jobs=jobs
+                        )
+                    ),
+                    self._expected("/tests/"),
+                )
+
+    def test_walk_parallel_is_bounded(self) -> None:
+        for i in range(20):
+            (self.src / "many" / "d{:02}".format(i)).mkdir(parents=True)
+            (self.src / "many" / "d{:02}".format(i) / "f.py").touch()
+        walked = []
+        walk = create_manifest_for_source_dir.walk
+
+        def recording_walk(
+            top: str,
+            exclude: Optional[re.Pattern[str]] = None,
+            exclude_dir: Optional[re.Pattern[str]] = None,
+        ) -> Iterator[str]:
+            walked.append(top)
+            return walk(top, exclude, exclude_dir)
+
+        with mock.patch.object(create_manifest_for_source_dir, "walk", recording_walk):
+            paths = create_manifest_for_source_dir.walk_parallel(
+                str(self.src / "many"), jobs=2
+            )
+            self.assertEqual(next(paths), str(self.src / "many" / "d00" / "f.py"))
+            # Give the workers time to walk ahead, which they must only do for
+            # a few subtrees.
+            time.sleep(0.2)
+            self.assertLessEqual(len(walked), 4)
+            self.assertEqual(len(list(paths)), 19)
+        self.assertEqual(len(walked), 20)
+
+    def test_main(self) -> None:
+        output = self.tmp / "manifest.json"
+        create_manifest_for_source_dir.main(
+            [
+                "create_manifest_for_source_dir.py",
+                "--output",
+                str(output),
+                "--origin",
+                "origin",
+                "--prefix",
+                "pkg",
+                "--exclude-dir",
+                "tests$",
+                str(self.src),
+            ]
+        )
+        entries = json.loads(output.read_text())
+        self.assertEqual(
+            entries,
+            [
+                [os.path.join("pkg", os.path.relpath(path, self.src)), path, "origin"]
+                for path in self._expected("/tests/")
+            ],
+        )
+        # Compact, with one entry per line.
+        self.assertEqual(len(output.read_text().splitlines()), len(entries) + 2)
+        self.assertNotIn(", ", output.read_text())
@@ -0,0 +1,188 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+import io
+import json
+import os
+import stat
+import subprocess
+import sys
+import tarfile
+import tempfile
+import unittest
+import warnings
+import zipfile
+from pathlib import Path
+
+import extract
+
+EXTRACT: Path = Path(__file__).resolve().parent.parent / "extract.py"
+
+ENTRY_POINTS = """\
+[console_scripts]
+tool = pkg.cli:main
+"""
+
+
+def _snapshot(root: Path) -> dict[str, str]:
+    tree = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            path = Path(dirpath) / name
+            rel = str(path.relative_to(root))
+            if path.is_symlink():
+                tree[rel] = "link:" + os.readlink(path)
+            elif path.is_dir():
+                tree[rel] = "dir"
+            else:
+                mode = stat.S_IMODE(path.stat().st_mode)
+                tree[rel] = "{:o}:{}".format(mode, path.read_text())
+    return tree
+
+
+class ExtractTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        self.umask: int = os.umask(0o022)
+
+    def tearDown(self) -> None:
+        os.umask(self.umask)
+        self._tmp.cleanup()
+
+    def _wheel(self) -> Path:
+        path = self.tmp / "pkg-1.0-py3-none-any.whl"
+        with zipfile.ZipFile(path, "w") as z:
+            z.writestr("pkg/__init__.py", "init")
+            z.writestr("pkg/_ext.cpython-310-x86_64-linux-gnu.so", "ext")
+            z.writestr("pkg/include/pkg.h", "header")
+            info = zipfile.ZipInfo("pkg/bin/run")
+            info.external_attr = 0o755 << 16
+            z.writestr(info, "run")
+            z.writestr("pkg/data/", "")
+            z.writestr("../escape.py", "escape")
+            z.writestr("pkg-1.0.dist-info/entry_points.txt", ENTRY_POINTS)
+        return path
+
+    def test_zip(self) -> None:
+        out = self.tmp / "out"
+        tree = extract.extract(self._wheel(), out, strip_soabi_tags=True, jobs=4)
+        self.assertEqual(
+            _snapshot(out),
+            {
+                "escape.py": "644:escape",
+                "pkg": "dir",
+                "pkg-1.0.dist-info": "dir",
+                "pkg-1.0.dist-info/entry_points.txt": "644:" + ENTRY_POINTS,
+                "pkg/__init__.py": "644:init",
+                "pkg/_ext.so": "644:ext",
+                "pkg/bin": "dir",
+                "pkg/bin/run": "755:run",
+                "pkg/data": "dir",
+                "pkg/include": "dir",
+                "pkg/include/pkg.h": "644:header",
+            },
+        )
+        self.assertEqual(extract.walk(out).dirs, tree.dirs)
+        self.assertEqual(sorted(extract.walk(out).files), sorted(tree.files))
+
+    def test_zip_colliding_members(self) -> None:
+        path = self.tmp / "collide.whl"
+        with zipfile.ZipFile(path, "w") as z, warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # Duplicate name
+            z.writestr("pkg/_ext.cpython-310-x86_64-linux-gnu.so", "tagged" * 1000)
+            z.writestr("pkg/_ext.so", "untagged")
+            z.writestr("pkg/mod.py", "first" * 1000)
+            z.writestr("pkg/mod.py", "last")
+        out = self.tmp / "out"
+        tree = extract.extract(path, out, strip_soabi_tags=True, jobs=4)
+        # The last member wins, as it would when extracting in order.
+        self.assertEqual(
+            _snapshot(out),
+            {"pkg": "dir", "pkg/_ext.so": "644:untagged", "pkg/mod.py": "644:last"},
+        )
+        self.assertEqual(sorted(tree.files), ["pkg/_ext.so", "pkg/mod.py"])
+
+    def test_tar(self) -> None:
+        path = self.tmp / "pkg-1.0.tar.gz"
+        with tarfile.open(path, "w:gz") as tf:
+
+            def add(name: str, data: str = "", mode: int = 0o644) -> None:
+                info = tarfile.TarInfo(name)
+                info.mode = mode
+                if name.endswith("/"):
+                    info.type = tarfile.DIRTYPE
+                    tf.addfile(info)
+                else:
+                    info.size = len(data)
+                    tf.addfile(info, io.BytesIO(data.encode()))
+
+            add("pkg-1.0/", mode=0o755)
+            add("pkg-1.0/_top.abi3.so", "top")
+            add("pkg-1.0/pkg/", mode=0o755)
+            # Only top-level entries have their SOABI tag stripped.
+            add("pkg-1.0/pkg/_ext.cpython-310-x86_64-linux-gnu.so", "ext")
+            add("pkg-1.0/pkg/run", "run", mode=0o755)
+            link = tarfile.TarInfo("pkg-1.0/pkg/link")
+            link.type = tarfile.SYMTYPE
+            link.linkname = "run"
+            tf.addfile(link)
+
+        out = self.tmp / "out"
+        tree = extract.extract(path, out)
+        self.assertEqual(
+            _snapshot(out),
+            {
+                "_top.so": "644:top",
+                "pkg": "dir",
+                "pkg/_ext.cpython-310-x86_64-linux-gnu.so": "644:ext",
+                "pkg/link": "link:run",
+                "pkg/run": "755:run",
+            },
+        )
+        self.assertEqual(tree.dirs, {"pkg"})
+
+    def test_tar_needs_single_top_level_dir(self) -> None:
+        path = self.tmp / "bad.tar.gz"
+        with tarfile.open(path, "w:gz") as tf:
+            for name in ("a/x.py", "b/y.py"):
+                tf.addfile(tarfile.TarInfo(name), io.BytesIO())
+        with self.assertRaisesRegex(ValueError, "single top-level dir"):
+            extract.extract(path, self.tmp / "out")
+
+    def test_main(self) -> None:
+        out = self.tmp / "out"
+        subprocess.check_call(
+            [
+                sys.executable,
+                str(EXTRACT),
+                str(self._wheel()),
+                "--output",
+                str(out),
+                "--cxx-header-dirs",
+                str(self.tmp / "headers.txt"),
+                "--entry-points",
+                str(self.tmp / "bin"),
+                "--entry-points-manifest",
+                str(self.tmp / "entry_points.json"),
+            ]
+        )
+        self.assertEqual((self.tmp / "headers.txt").read_text(), "pkg/include\n")
+        self.assertEqual(
+            json.loads((self.tmp / "entry_points.json").read_text()),
+            [
+                [
+                    "tool",
+                    str(self.tmp / "bin" / "tool"),
+                    "pkg-1.0.dist-info/entry_points.txt",
+                ]
+            ],
+        )
+        self.assertIn("from pkg.cli import main", (self.tmp / "bin/tool").read_text())
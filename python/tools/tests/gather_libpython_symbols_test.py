@@ -0,0 +1,109 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+import shutil
+import struct
+import sys
+import sysconfig
+import tempfile
+import unittest
+from pathlib import Path
+
+import gather_libpython_symbols
+
+
+def _elf_library() -> Path | None:
+    """The running interpreter's libpython, or the interpreter, if it's ELF."""
+    path = Path(sysconfig.get_config_var("installed_platbase")) / str(
+        sysconfig.get_config_var("platlibdir")
+    )
+    path = path / str(sysconfig.get_config_var("LDLIBRARY"))
+    if not path.is_file():
+        path = Path(sys.executable)
+    with open(path.resolve(), "rb") as f:
+        return path if f.read(4) == b"\x7fELF" else None
+
+
+def _write_elf(path: Path, strtab: bytes) -> None:
+    """
+    Write a 64-bit little-endian ELF file with a `.text` section and a
+    `.symtab` defining one global function in it, named at offset 1 of
+    `strtab`.
+    """
+    shoff = 64
+    symoff = shoff + 4 * 64
+    stroff = symoff + 2 * 24
+    header = b"\x7fELF\x02\x01\x01" + b"\0" * 9
+    header += struct.pack(
+        "<HHIQQQIHHHHHH", 1, 62, 1, 0, 0, shoff, 0, 64, 0, 0, 64, 4, 0
+    )
+    # (type, flags, offset, size, link, entsize) of each section.
+    sections = [
+        (0, 0, 0, 0, 0, 0),
+        (1, 0x6, 0, 0, 0, 0),
+        (2, 0, symoff, 2 * 24, 3, 24),
+        (3, 0, stroff, len(strtab), 0, 0),
+    ]
+    for sh_type, flags, offset, size, link, entsize in sections:
+        header += struct.pack(
+            "<IIQQQQIIQQ", 0, sh_type, flags, 0, offset, size, link, 0, 0, entsize
+        )
+    header += b"\0" * 24
+    header += struct.pack("<IBBHQQ", 1, (1 << 4) | 2, 0, 1, 0, 0)
+    path.write_bytes(header + strtab)
+
+
+class GatherLibpythonSymbolsTest(unittest.TestCase):
+    @unittest.skipUnless(shutil.which("nm") and _elf_library(), "needs nm and ELF")
+    def test_matches_nm(self) -> None:
+        path = _elf_library()
+        assert path is not None
+        nm = shutil.which("nm")
+        assert nm is not None
+        expected = gather_libpython_symbols.nm_text_symbols(Path(nm), path)
+        symbols = gather_libpython_symbols.elf_text_symbols(path)
+        assert symbols is not None
+        if not expected:
+            # A stripped binary, which nm won't list anything for.
+            self.assertIsNotNone(symbols)
+        else:
+            self.assertEqual(sorted(symbols), sorted(expected))
+
+    def test_not_elf(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "libpython.dylib"
+            path.write_bytes(b"\xcf\xfa\xed\xfe" + b"\0" * 64)
+            self.assertIsNone(gather_libpython_symbols.elf_text_symbols(path))
+
+    def test_elf(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "libpython.so"
+            _write_elf(path, b"\0Py_Main\0")
+            self.assertEqual(
+                gather_libpython_symbols.elf_text_symbols(path), ["Py_Main"]
+            )
+
+    def test_unreadable(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "libpython.so"
+            # The name runs off the end of the file.
+            _write_elf(path, b"\0Py_Main")
+            self.assertIsNone(gather_libpython_symbols.elf_text_symbols(path))
+            path.write_bytes(b"")
+            self.assertIsNone(gather_libpython_symbols.elf_text_symbols(path))
+
+    def test_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = Path(tmpdir) / "cache" / "key.json"
+            self.assertIsNone(gather_libpython_symbols._load_cached(cache))
+            gather_libpython_symbols._store_cached(cache, ["Py_Main", "PyList_New"])
+            self.assertEqual(
+                gather_libpython_symbols._load_cached(cache), ["Py_Main", "PyList_New"]
+            )
@@ -0,0 +1,138 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+import re
+import shutil
+import subprocess
+import sysconfig
+import tempfile
+import unittest
+from pathlib import Path
+
+import generate_static_extension_info
+
+
+def _array(source: str, name: str) -> list[str]:
+    match = re.search(r"\b{}\[\d+\] = \{{\n(.*?)\}};".format(name), source, re.S)
+    assert match is not None
+    return [line.strip().rstrip(",") for line in match.group(1).splitlines()]
+
+
+def _scalar(source: str, name: str) -> int:
+    match = re.search(r"\b{} = (\d+);".format(name), source)
+    assert match is not None
+    return int(match.group(1))
+
+
+def _compiler() -> str | None:
+    if not shutil.which("readelf"):
+        return None
+    include = Path(sysconfig.get_paths()["include"])
+    if not (include / "Python.h").exists():
+        return None
+    return shutil.which("c++") or shutil.which("g++") or shutil.which("clang++")
+
+
+class GenerateStaticExtensionInfoTest(unittest.TestCase):
+    def _generate(self, *extensions: str) -> str:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "info.cpp"
+            generate_static_extension_info.main(
+                ["generate", "--output", str(output)]
+                + ["--extension={}".format(e) for e in extensions]
+            )
+            return output.read_text()
+
+    def test_sorted_table(self) -> None:
+        source = self._generate(
+            "foo.bar:PyInit_bar",
+            "Foo:PyInit_Foo",
+            "foo:PyInit_foo",
+            "foo.bar:PyInit_other",
+            "café:PyInit_cafe",
+        )
+        self.assertIn('dummy_name_3(void) asm ("PyInit_other");', source)
+        self.assertEqual(_scalar(source, "_static_extension_count"), 4)
+        self.assertEqual(
+            _array(source, "_static_extension_names"),
+            ['"Foo"', '"café"', '"foo"', '"foo.bar"'],
+        )
+        # The first registration of a name wins.
+        self.assertEqual(
+            _array(source, "_static_extension_initfuncs"),
+            ["dummy_name_1", "dummy_name_4", "dummy_name_2", "dummy_name_0"],
+        )
+
+    def test_bloom_filter(self) -> None:
+        names = ["pkg{0}.sub.ext{0}".format(i) for i in range(1000)]
+        source = self._generate(
+            *("{}:PyInit_{}".format(n, i) for i, n in enumerate(names))
+        )
+        num_bits = _scalar(source, "_static_extension_bloom_bits")
+        self.assertEqual(num_bits & (num_bits - 1), 0)
+        self.assertGreaterEqual(
+            num_bits, len(names) * generate_static_extension_info.BLOOM_BITS_PER_NAME
+        )
+        words = [int(w[:-3], 16) for w in _array(source, "_static_extension_bloom")]
+        self.assertEqual(len(words) * 64, num_bits)
+
+        def maybe_contains(name: str) -> bool:
+            return all(
+                words[bit >> 6] >> (bit & 63) & 1
+                for bit in generate_static_extension_info.bloom_probes(
+                    name.encode("utf-8"), num_bits
+                )
+            )
+
+        self.assertTrue(all(maybe_contains(name) for name in names))
+        misses = ["pkg{0}.sub.mod{0}".format(i) for i in range(1000)]
+        self.assertLess(sum(maybe_contains(name) for name in misses), 50)
+
+    def test_fnv1a(self) -> None:
+        self.assertEqual(
+            generate_static_extension_info.fnv1a(b""),
+            generate_static_extension_info.FNV_OFFSET,
+        )
+        self.assertEqual(generate_static_extension_info.fnv1a(b"a"), 0xAF63DC4C8601EC8C)
+
+    def test_no_extensions(self) -> None:
+        source = self._generate()
+        self.assertEqual(_scalar(source, "_static_extension_count"), 0)
+        self.assertIn("_static_extension_names[1] = {\n};", source)
+        self.assertEqual(_scalar(source, "_static_extension_bloom_bits"), 64)
+
+    @unittest.skipUnless(_compiler(), "needs a C++ compiler, readelf and Python.h")
+    def test_no_static_initializer(self) -> None:
+        compiler = _compiler()
+        assert compiler is not None
+        source = self._generate("foo.bar:PyInit_bar", "foo:PyInit_foo")
+        with tempfile.TemporaryDirectory() as tmp:
+            src = Path(tmp) / "info.cpp"
+            src.write_text(source)
+            for opt in ("-O0", "-O2"):
+                obj = Path(tmp) / "info{}.o".format(opt)
+                subprocess.check_call(
+                    [
+                        compiler,
+                        "-std=c++17",
+                        opt,
+                        "-I",
+                        sysconfig.get_paths()["include"],
+                        "-c",
+                        str(src),
+                        "-o",
+                        str(obj),
+                    ]
+                )
+                sections = subprocess.check_output(
+                    ["readelf", "-SW", str(obj)], text=True
+                )
+                self.assertNotIn(".init_array", sections)
+                self.assertNotIn(".ctors", sections)
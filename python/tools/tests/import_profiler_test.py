@@ -0,0 +1,92 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+RUNTIME: Path = Path(__file__).resolve().parent.parent.parent / "runtime"
+
+APP = """\
+import json
+import sys
+
+import dep
+
+
+def main():
+    # Imports done by the main function aren't profiled.
+    import colorsys
+
+    print(json.dumps(sorted(sys.modules)))
+"""
+
+RUN = "from __par__.bootstrap import run_as_main; run_as_main('app', 'main')"
+
+
+@unittest.skipUnless(RUNTIME.is_dir(), "needs the PAR runtime sources")
+class ImportProfilerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        (self.tmp / "app.py").write_text(APP)
+        (self.tmp / "dep.py").write_text("import pkg.sub\n")
+        (self.tmp / "pkg").mkdir()
+        (self.tmp / "pkg" / "__init__.py").touch()
+        (self.tmp / "pkg" / "sub.py").write_text("from . import other\n")
+        (self.tmp / "pkg" / "other.py").touch()
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _run(self, **env: str) -> list[str]:
+        out = subprocess.check_output(
+            [sys.executable, "-B", "-c", RUN],
+            env={
+                **os.environ,
+                "PYTHONPATH": os.pathsep.join([str(RUNTIME), str(self.tmp)]),
+                **env,
+            },
+        )
+        return json.loads(out)
+
+    def test_disabled(self) -> None:
+        modules = self._run()
+        self.assertNotIn("__par__.import_profiler", modules)
+
+    def test_profile(self) -> None:
+        trace = self.tmp / "trace.json"
+        modules = self._run(PAR_PROFILE_IMPORTS=str(trace))
+        self.assertIn("colorsys", modules)
+
+        events = json.loads(trace.read_text())["traceEvents"]
+        imports = {e["name"]: e for e in events if e["cat"] == "import"}
+        # `pkg` is imported as part of `import pkg.sub`.
+        for name in ("app", "dep", "pkg.sub", "pkg.other"):
+            self.assertIn(name, imports)
+        self.assertNotIn("colorsys", imports)
+        self.assertTrue(any(e["cat"] == "find" for e in events))
+
+        # Nested imports are contained in their parent's span.
+        dep, sub = imports["dep"], imports["pkg.sub"]
+        self.assertLessEqual(dep["ts"], sub["ts"])
+        self.assertGreaterEqual(dep["ts"] + dep["dur"], sub["ts"] + sub["dur"])
+        self.assertGreater(imports["pkg.other"]["args"]["probes"], 0)
+
+        summary = (self.tmp / "trace.json.summary.txt").read_text().splitlines()
+        rows = [line.split() for line in summary[summary.index("") + 1 :]]
+        rows = [row for row in rows if len(row) == 6 and row[0] != "total(ms)"]
+        totals = [float(row[0]) for row in rows]
+        self.assertEqual(totals, sorted(totals, reverse=True))
+        self.assertEqual(rows[0][-1], "app")
@@ -0,0 +1,181 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+TOOLS_DIR: Path = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(TOOLS_DIR / "make_par"))
+
+import live_link_tree  # noqa: E402
+
+
+def _snapshot(root: Path) -> dict[str, str]:
+    tree = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            path = Path(dirpath) / name
+            rel = str(path.relative_to(root))
+            if path.is_symlink():
+                tree[rel] = "-> " + os.readlink(path)
+            elif path.is_dir():
+                tree[rel] = "dir"
+            else:
+                tree[rel] = "{:o} {}".format(
+                    path.stat().st_mode & 0o777, path.read_text()
+                )
+    return tree
+
+
+class LiveLinkTreeTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        self.linktree = str(self.tmp / "app#linktree")
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _update(
+        self,
+        links: dict[str, str],
+        generated: dict[str, tuple[str, int | None]],
+    ) -> None:
+        state = live_link_tree.load_state(self.linktree)
+        if state is None:
+            live_link_tree.build(self.linktree, links, generated)
+        else:
+            self.assertEqual(live_link_tree.verify(self.linktree, *state), [])
+            live_link_tree.update(self.linktree, links, generated, *state)
+        live_link_tree.write_state(self.linktree, links, generated)
+
+    def _fresh(
+        self,
+        links: dict[str, str],
+        generated: dict[str, tuple[str, int | None]],
+    ) -> dict[str, str]:
+        fresh = str(self.tmp / "fresh")
+        live_link_tree.build(fresh, links, generated)
+        return _snapshot(Path(fresh))
+
+    def test_update_matches_fresh_build(self) -> None:
+        generated: dict[str, tuple[str, int | None]] = {
+            "__run__.py": ("main()\n", None),
+            "_bootstrap.sh": ("#!/bin/sh\n", 0o755),
+        }
+        links = {
+            "a/b/one.py": "../../src/one.py",
+            "a/b/two.py": "../../src/two.py",
+            "c/three.py": "/abs/three.py",
+        }
+        self._update(links, generated)
+        self.assertEqual(_snapshot(Path(self.linktree)), self._fresh(links, generated))
+
+        untouched = os.lstat(os.path.join(self.linktree, "a/b/one.py"))
+        links = {
+            "a/b/one.py": "../../src/one.py",
+            "a/b/two.py": "../../src/two_v2.py",
+            "d/four.py": "../src/four.py",
+        }
+        generated = {
+            "__run__.py": ("main(2)\n", None),
+            "_bootstrap.sh": ("#!/bin/sh\n", 0o755),
+        }
+        self._update(links, generated)
+        self.assertEqual(_snapshot(Path(self.linktree)), self._fresh(links, generated))
+        # Unchanged links are left alone, and emptied dirs are pruned.
+        self.assertEqual(
+            os.lstat(os.path.join(self.linktree, "a/b/one.py")).st_ino,
+            untouched.st_ino,
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.linktree, "c")))
+
+    def test_verify_detects_tampering(self) -> None:
+        links = {"pkg/mod.py": "../src/mod.py", "pkg/other.py": "../src/other.py"}
+        generated: dict[str, tuple[str, int | None]] = {
+            "_bootstrap.sh": ("#!/bin/sh\n", 0o755),
+            "__run__.py": ("main()\n", None),
+        }
+        live_link_tree.build(self.linktree, links, generated)
+        live_link_tree.write_state(self.linktree, links, generated)
+        state = live_link_tree.load_state(self.linktree)
+        assert state is not None
+        self.assertEqual(live_link_tree.verify(self.linktree, *state), [])
+
+        root = Path(self.linktree)
+        (root / "pkg" / "mod.py").unlink()
+        (root / "pkg" / "mod.py").symlink_to("elsewhere.py")
+        (root / "pkg" / "other.py").unlink()
+        (root / "pkg" / "other.py").write_text("")
+        (root / "__run__.py").write_text("main(0)\n")
+        (root / "_bootstrap.sh").chmod(0o644)
+        (root / "pkg" / "extra.py").touch()
+        (root / "stray").mkdir()
+        self.assertEqual(
+            live_link_tree.verify(self.linktree, *state),
+            [
+                "__run__.py: modified",
+                "_bootstrap.sh: mode changed",
+                "pkg/extra.py: unexpected",
+                "pkg/mod.py: links to elsewhere.py, expected ../src/mod.py",
+                "pkg/other.py: not a symlink",
+                "stray: unexpected",
+            ],
+        )
+
+    def test_missing_tree_invalidates_state(self) -> None:
+        links = {"mod.py": "../src/mod.py"}
+        self._update(links, {})
+        self.assertIsNotNone(live_link_tree.load_state(self.linktree))
+        os.unlink(os.path.join(self.linktree, "mod.py"))
+        os.rmdir(self.linktree)
+        self.assertIsNone(live_link_tree.load_state(self.linktree))
+
+    def test_take_state(self) -> None:
+        links = {"mod.py": "../src/mod.py"}
+        self._update(links, {})
+        self.assertEqual(live_link_tree.take_state(self.linktree), (links, {}))
+        # Taken, so an update that fails halfway leads to a full rebuild.
+        self.assertIsNone(live_link_tree.load_state(self.linktree))
+        self.assertFalse(os.path.exists(live_link_tree.state_path(self.linktree)))
+
+    def _verify_cli(self) -> subprocess.CompletedProcess[str]:
+        return subprocess.run(
+            [
+                sys.executable,
+                str(TOOLS_DIR / "make_par" / "live_link_tree.py"),
+                self.linktree,
+            ],
+            env={**os.environ, "PYTHONPATH": str(TOOLS_DIR)},
+            capture_output=True,
+            text=True,
+        )
+
+    def test_verify_cli(self) -> None:
+        result = self._verify_cli()
+        self.assertEqual(result.returncode, 2, result.stderr)
+
+        links = {"pkg/mod.py": "../src/mod.py"}
+        self._update(links, {"_bootstrap.sh": ("#!/bin/sh\n", 0o755)})
+        result = self._verify_cli()
+        self.assertEqual((result.returncode, result.stdout), (0, ""), result.stderr)
+
+        (Path(self.linktree) / "_bootstrap.sh").write_text("#!/bin/bash\n")
+        (Path(self.linktree) / "pkg" / "extra.py").touch()
+        result = self._verify_cli()
+        self.assertEqual(result.returncode, 1, result.stderr)
+        self.assertEqual(
+            result.stdout, "_bootstrap.sh: modified\npkg/extra.py: unexpected\n"
+        )
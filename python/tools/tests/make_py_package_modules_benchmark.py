@@ -0,0 +1,90 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+"""
+Micro-benchmark for resolving link tree entries in make_py_package_modules.
+
+Compares resolving every entry with two `os.path.realpath` calls (as the tool
+used to) against the batched, memoized `add_path_mappings`, over a synthetic
+set of manifests shaped like a large binary's: many packages, a few dozen
+modules each, with some entries listed by more than one manifest.
+
+$ python3 tests/make_py_package_modules_benchmark.py --entries 200000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import make_py_package_modules  # noqa: E402
+
+
+def _synthesize(
+    root: Path, num_entries: int, per_package: int
+) -> list[tuple[Path, Path, str]]:
+    srcs = root / "buck-out" / "v2" / "gen" / "fbcode" / "srcs"
+    modules_dir = root / "bin#link-tree"
+    entries = []
+    for i in range(num_entries):
+        package = "pkg{}/sub{}".format(i // (per_package * 10), i // per_package)
+        src_dir = srcs / package
+        if i % per_package == 0:
+            src_dir.mkdir(parents=True)
+        src = src_dir / "mod{}.py".format(i)
+        src.touch()
+        entries.append((src, modules_dir / package / src.name, "//t:{}".format(i)))
+    # Libraries commonly reach a binary through several manifests.
+    return entries + entries[: num_entries // 10]
+
+
+def _unbatched(entries: list[tuple[Path, Path, str]]) -> dict[Path, str]:
+    path_mapping = {}
+    for src, new_dest, _origin in entries:
+        link_path = os.path.relpath(
+            os.path.realpath(src), os.path.realpath(new_dest.parent)
+        )
+        prev = path_mapping.get(new_dest)
+        if prev is not None and prev != link_path:
+            raise ValueError(new_dest)
+        path_mapping[new_dest] = link_path
+    return path_mapping
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=200000)
+    parser.add_argument("--per-package", type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        entries = _synthesize(Path(tmp), args.entries, args.per_package)
+
+        start = time.perf_counter()
+        expected = _unbatched(entries)
+        unbatched = time.perf_counter() - start
+
+        start = time.perf_counter()
+        path_mapping = {}
+        make_py_package_modules.add_path_mappings(path_mapping, set(), entries)
+        batched = time.perf_counter() - start
+
+    assert {k: v for k, (v, _) in path_mapping.items()} == expected
+    print("entries:   {}".format(len(entries)))
+    print("unbatched: {:.3f}s".format(unbatched))
+    print("batched:   {:.3f}s ({:.1f}x)".format(batched, unbatched / batched))
+
+
+if __name__ == "__main__":
+    main()
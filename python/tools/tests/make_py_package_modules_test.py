@@ -0,0 +1,120 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import make_py_package_modules
+
+
+def _snapshot(root: Path) -> dict[str, str]:
+    """Describe every dir, symlink and file under `root`."""
+    tree = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            path = Path(dirpath) / name
+            rel = str(path.relative_to(root))
+            if path.is_symlink():
+                tree[rel] = "link:" + os.readlink(path)
+            elif path.is_dir():
+                tree[rel] = "dir"
+            else:
+                tree[rel] = "file:" + path.read_text()
+    return tree
+
+
+class IncrementalModulesDirTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        for name in ("a.py", "b.py", "c.py", "data.txt"):
+            (self.tmp / "srcs" / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.tmp / "srcs" / name).write_text(name)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _build(self, modules_dir: str, entries: list[list[str]], *extra: str) -> None:
+        manifest = self.tmp / "modules.json"
+        manifest.write_text(json.dumps(entries))
+        old_argv = sys.argv
+        sys.argv = [
+            "make_py_package_modules.py",
+            "--module-manifest",
+            str(manifest),
+            "--modules-dir",
+            str(self.tmp / modules_dir),
+            *extra,
+        ]
+        try:
+            args = make_py_package_modules.parse_args()
+        finally:
+            sys.argv = old_argv
+        make_py_package_modules.create_modules_dir(args)
+
+    def _assert_matches_fresh_build(self, entries: list[list[str]]) -> None:
+        self._build("incremental", entries, "--incremental")
+        self._build("fresh", entries)
+        self.assertEqual(
+            _snapshot(self.tmp / "incremental"), _snapshot(self.tmp / "fresh")
+        )
+        shutil.rmtree(self.tmp / "fresh")
+
+    def test_incremental_updates_match_fresh_builds(self) -> None:
+        srcs = str(self.tmp / "srcs")
+        generations = [
+            [
+                ["pkg/sub/a.py", f"{srcs}/a.py", "//:a"],
+                ["pkg/b.py", f"{srcs}/b.py", "//:b"],
+            ],
+            # Retarget one entry, add another in a new package.
+            [
+                ["pkg/sub/a.py", f"{srcs}/c.py", "//:a"],
+                ["pkg/b.py", f"{srcs}/b.py", "//:b"],
+                ["other/c.py", f"{srcs}/c.py", "//:c"],
+            ],
+            # Drop a whole package, and provide a real `__init__.py` where one
+            # was previously synthesized.
+            [
+                ["pkg/b.py", f"{srcs}/b.py", "//:b"],
+                ["pkg/__init__.py", f"{srcs}/a.py", "//:init"],
+                ["pkg/data.txt", f"{srcs}/data.txt", "//:data"],
+            ],
+            # And go back to synthesizing it.
+            [["pkg/b.py", f"{srcs}/b.py", "//:b"]],
+        ]
+        for entries in generations:
+            with self.subTest(entries=entries):
+                self._assert_matches_fresh_build(entries)
+
+    def test_collisions_are_still_detected(self) -> None:
+        srcs = str(self.tmp / "srcs")
+        self._build("incremental", [["a.py", f"{srcs}/a.py", "//:a"]], "--incremental")
+        with self.assertRaisesRegex(ValueError, "specified at both"):
+            self._build(
+                "incremental",
+                [
+                    ["a.py", f"{srcs}/a.py", "//:a"],
+                    ["a.py", f"{srcs}/b.py", "//:b"],
+                ],
+                "--incremental",
+            )
+
+    def test_missing_tree_forces_full_rebuild(self) -> None:
+        srcs = str(self.tmp / "srcs")
+        entries = [["pkg/a.py", f"{srcs}/a.py", "//:a"]]
+        self._build("incremental", entries, "--incremental")
+        shutil.rmtree(self.tmp / "incremental")
+        self._assert_matches_fresh_build(entries)
@@ -0,0 +1,69 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import manifests
+
+ENTRIES: list[tuple[str, str, str]] = [
+    ("foo/__init__.py", "src/foo/__init__.py", "//foo:foo"),
+    ("foo/bar.py", "src/foo/bar.py", "//foo:foo"),
+    ("baz/data, with [brackets].json", 'src/"quoted".json', "//baz:baz"),
+    ("ünïcode.py", "src/ünïcode.py", "//foo:foo"),
+]
+
+
+class ManifestsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path: str = os.path.join(self._tmp.name, "manifest")
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_json_entries_straddling_read_windows(self) -> None:
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump([list(e) for e in ENTRIES], f, indent=2)
+        for chunk_size in (1, 7, 64, 1 << 20):
+            with self.subTest(chunk_size=chunk_size):
+                with mock.patch.object(manifests, "_CHUNK_SIZE", chunk_size):
+                    self.assertEqual(list(manifests.load_manifest(self.path)), ENTRIES)
+
+    def test_empty_and_malformed_json(self) -> None:
+        with open(self.path, "w") as f:
+            f.write(" [ ] ")
+        self.assertEqual(list(manifests.load_manifest(self.path)), [])
+        for content in ('[["a", "b", "c"] ["d", "e", "f"]]', '[["a", "b", "c"]', "{}"):
+            with self.subTest(content=content):
+                with open(self.path, "w") as f:
+                    f.write(content)
+                with self.assertRaises(ValueError):
+                    list(manifests.load_manifest(self.path))
+
+    def test_binary_round_trip(self) -> None:
+        with open(self.path, "wb") as f:
+            manifests.write_manifest(f, ENTRIES, binary=True)
+        with mock.patch.object(manifests, "_CHUNK_SIZE", 5):
+            loaded = list(manifests.load_manifest(self.path))
+        self.assertEqual(loaded, ENTRIES)
+        # Origins are shared rather than decoded once per entry.
+        self.assertIs(loaded[0][2], loaded[3][2])
+
+    def test_binary_is_smaller_than_json(self) -> None:
+        with open(self.path, "wb") as f:
+            manifests.write_manifest(f, ENTRIES * 100, binary=True)
+        binary_size = os.path.getsize(self.path)
+        with open(self.path, "wb") as f:
+            manifests.write_manifest(f, ENTRIES * 100)
+        self.assertLess(binary_size, os.path.getsize(self.path))
@@ -0,0 +1,233 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+import json
+import struct
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+import patchelf
+
+_DYNSTR = 0x100
+_DYNSYM = 0x200
+_DYNAMIC = 0x300
+_SHDRS = 0x400
+
+
+def _make_elf(
+    dynstr: bytes, symbols: list[int], dynamic: list[tuple[int, int]]
+) -> bytearray:
+    """
+    Build a minimal little endian ELF64 shared library, with a dynamic string
+    table, symbol table and dynamic section (`dynamic` should include any
+    trailing DT_NULLs).
+    """
+    dynamic = [(5, _DYNSTR), (10, len(dynstr))] + dynamic
+    data = bytearray(_SHDRS + 4 * 64)
+    struct.pack_into(
+        "<4sBBBxxxxxxxxxHHIQQQIHHHHHH",
+        data,
+        0,
+        b"\x7fELF",
+        2,  # ELFCLASS64
+        1,  # ELFDATA2LSB
+        1,  # EV_CURRENT
+        3,  # ET_DYN
+        62,  # EM_X86_64
+        1,
+        0,
+        64,  # e_phoff
+        _SHDRS,  # e_shoff
+        0,
+        64,
+        56,
+        2,
+        64,
+        4,
+        0,
+    )
+    # A PT_LOAD mapping the whole file at address 0, and the PT_DYNAMIC.
+    struct.pack_into("<IIQQQQQQ", data, 64, 1, 5, 0, 0, 0, len(data), len(data), 8)
+    struct.pack_into(
+        "<IIQQQQQQ",
+        data,
+        64 + 56,
+        2,
+        6,
+        _DYNAMIC,
+        _DYNAMIC,
+        _DYNAMIC,
+        len(dynamic) * 16,
+        len(dynamic) * 16,
+        8,
+    )
+    data[_DYNSTR : _DYNSTR + len(dynstr)] = dynstr
+    for i, name in enumerate(symbols):
+        struct.pack_into("<IBBHQQ", data, _DYNSYM + i * 24, name, 0, 0, 0, 0, 0)
+    for i, (tag, val) in enumerate(dynamic):
+        struct.pack_into("<qQ", data, _DYNAMIC + i * 16, tag, val)
+    sections = [
+        (0, 0, 0, 0, 0),
+        (3, _DYNSTR, len(dynstr), 0, 0),  # SHT_STRTAB
+        (11, _DYNSYM, len(symbols) * 24, 1, 24),  # SHT_DYNSYM
+        (6, _DYNAMIC, len(dynamic) * 16, 1, 16),  # SHT_DYNAMIC
+    ]
+    for i, (sh_type, offset, size, link, entsize) in enumerate(sections):
+        struct.pack_into(
+            "<IIQQQQIIQQ",
+            data,
+            _SHDRS + i * 64,
+            0,
+            sh_type,
+            0,
+            offset,
+            offset,
+            size,
+            link,
+            0,
+            1,
+            entsize,
+        )
+    return data
+
+
+def _rpath(data: bytearray) -> tuple[int, bytes] | None:
+    for i in range(2, 16):
+        tag, val = struct.unpack_from("<qQ", data, _DYNAMIC + i * 16)
+        if tag == 0:
+            return None
+        if tag in (15, 29):
+            end = data.index(b"\0", _DYNSTR + val)
+            return tag, bytes(data[_DYNSTR + val : end])
+    return None
+
+
+class AddRpathInPlaceTest(unittest.TestCase):
+    def test_reuses_unreferenced_space_after_the_rpath(self) -> None:
+        # A RUNPATH whose string was shortened before, leaving unused bytes.
+        dynstr = b"\0foo\0libc.so.6\0/a\0XXXXXXXXXXXXXXXX\0"
+        data = _make_elf(dynstr, [0, 1], [(1, 5), (29, 15), (0, 0)])
+        patchelf.add_rpath_in_place(data, "$ORIGIN/b")
+        self.assertEqual(_rpath(data), (15, b"/a:$ORIGIN/b"))
+
+    def test_no_room(self) -> None:
+        dynstr = b"\0foo\0libc.so.6\0/a\0"
+        data = _make_elf(dynstr, [0, 1], [(1, 5), (15, 15), (0, 0), (0, 0)])
+        with self.assertRaises(patchelf.UnsupportedELFError):
+            patchelf.add_rpath_in_place(data, "$ORIGIN/b")
+
+    def test_existing_rpaths_are_kept(self) -> None:
+        dynstr = b"\0foo\0libc.so.6\0/a:/b\0"
+        data = _make_elf(dynstr, [0, 1], [(1, 5), (29, 15), (0, 0)])
+        patchelf.add_rpath_in_place(data, "/b")
+        # Only converted to a DT_RPATH.
+        self.assertEqual(_rpath(data), (15, b"/a:/b"))
+
+        unchanged = bytearray(data)
+        patchelf.add_rpath_in_place(data, "/a:/b")
+        self.assertEqual(data, unchanged)
+
+    def test_adds_entry_in_spare_slot(self) -> None:
+        # Unreferenced strings, like those left behind by removing an rpath.
+        dynstr = b"\0foo\0libc.so.6\0/build/tree/lib\0"
+        for spare in (1, 2):
+            with self.subTest(spare=spare):
+                data = _make_elf(dynstr, [0, 1], [(1, 5)] + [(0, 0)] * spare)
+                if spare == 1:
+                    with self.assertRaises(patchelf.UnsupportedELFError):
+                        patchelf.add_rpath_in_place(data, "$ORIGIN")
+                else:
+                    patchelf.add_rpath_in_place(data, "$ORIGIN")
+                    self.assertEqual(_rpath(data), (15, b"$ORIGIN"))
+
+    def test_referenced_strings_are_preserved(self) -> None:
+        # `libc.so.6` is referenced by both DT_NEEDED and (tail merged) a
+        # symbol, and `bar` only by a symbol, so neither can be reused.
+        dynstr = b"\0foo\0libc.so.6\0bar\0/a\0"
+        data = _make_elf(dynstr, [0, 1, 9, 15], [(1, 5), (15, 19), (0, 0)])
+        with self.assertRaises(patchelf.UnsupportedELFError):
+            patchelf.add_rpath_in_place(data, "/b")
+        self.assertEqual(
+            bytes(data[_DYNSTR : _DYNSTR + len(dynstr)]),
+            dynstr,
+        )
+
+    def test_unknown_string_users(self) -> None:
+        dynstr = b"\0foo\0libc.so.6\0/a\0XXXXXXXX\0"
+        data = _make_elf(dynstr, [0, 1], [(1, 5), (15, 15), (0x6FFFFEF9, 0), (0, 0)])
+        with self.assertRaisesRegex(
+            patchelf.UnsupportedELFError, "unknown dynamic tag"
+        ):
+            patchelf.add_rpath_in_place(data, "/b")
+
+
+class MainTest(unittest.TestCase):
+    def test_batch(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            (tmp / "lib.so").write_bytes(
+                _make_elf(
+                    b"\0foo\0libc.so.6\0/a\0XXXXXXXXXXXXXXXX\0",
+                    [0, 1],
+                    [(1, 5), (15, 15), (0, 0)],
+                )
+            )
+            (tmp / "data").write_bytes(b"not an ELF file")
+            (tmp / "data").chmod(0o755)
+            batch = tmp / "batch.json"
+            batch.write_text(
+                json.dumps(
+                    [
+                        [str(tmp / "lib.so"), str(tmp / "lib.out.so"), ["/b", "/c"]],
+                        [str(tmp / "data"), str(tmp / "data.out"), []],
+                    ]
+                )
+            )
+            # patchelf is only needed when there's no room.
+            patchelf.main(
+                [
+                    "patchelf.py",
+                    "--patchelf",
+                    "false",
+                    "--rpath",
+                    "/d",
+                    "--batch",
+                    str(batch),
+                    "--jobs",
+                    "2",
+                ]
+            )
+            self.assertEqual(
+                _rpath(bytearray((tmp / "lib.out.so").read_bytes())), (15, b"/a:/b:/c")
+            )
+            self.assertEqual((tmp / "data.out").read_bytes(), b"not an ELF file")
+            self.assertEqual((tmp / "data.out").stat().st_mode & 0o777, 0o755)
+
+    def test_falls_back_to_patchelf(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            (tmp / "lib.so").write_bytes(
+                _make_elf(b"\0libc.so.6\0", [0], [(1, 1), (0, 0)])
+            )
+            with self.assertRaises(subprocess.CalledProcessError):
+                patchelf.main(
+                    [
+                        "patchelf.py",
+                        "--patchelf",
+                        "false",
+                        "--rpath",
+                        "/b",
+                        "--output",
+                        str(tmp / "out.so"),
+                        str(tmp / "lib.so"),
+                    ]
+                )
@@ -0,0 +1,120 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import make_source_db
+import source_db_index
+
+
+class SourceDBIndexTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp: str = self._tmp.name
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def _write_json(self, name: str, content: object) -> str:
+        path = os.path.join(self.tmp, name)
+        with open(path, "w") as f:
+            json.dump(content, f)
+        return path
+
+    def test_lookup(self) -> None:
+        path = os.path.join(self.tmp, "index")
+        source_db_index.write_index(
+            path,
+            [
+                ("foo/b.py", "src/b.py", "//foo:b"),
+                ("foo/a.py", "src/a.py", "//foo:a"),
+                ("bar.pyi", "src/bar.pyi", "//bar:bar"),
+            ],
+        )
+        index = source_db_index.SourceDBIndex(path)
+        try:
+            self.assertEqual(list(index), ["bar.pyi", "foo/a.py", "foo/b.py"])
+            self.assertEqual(index["foo/b.py"], "src/b.py")
+            self.assertEqual(index.origin("foo/a.py"), "//foo:a")
+            self.assertNotIn("foo/c.py", index)
+        finally:
+            index.close()
+
+    def test_sharded_source_db_matches_inline(self) -> None:
+        deps = [
+            self._write_json("a.json", [["a.py", "src/a.py", "//:a"]]),
+            self._write_json(
+                "b.json", [["b.py", "src/b.py", "//:b"], ["a.py", "src/a.py", "//:b"]]
+            ),
+        ]
+        dep_list = os.path.join(self.tmp, "deps.txt")
+        with open(dep_list, "w") as f:
+            f.write("\n".join(deps))
+
+        def run(name: str, *extra: str) -> dict[str, object]:
+            output = os.path.join(self.tmp, name)
+            make_source_db.main(
+                ["make_source_db.py", "--output", output]
+                + ["--dependency_manifests", dep_list, *extra]
+            )
+            with open(output) as f:
+                return json.load(f)
+
+        inline = run("inline.json")
+        shard_dir = os.path.join(self.tmp, "shards")
+        sharded = run("sharded.json", "--shard-dir", shard_dir)
+        self.assertEqual(len(sharded["dependency_shards"]), 2)
+
+        merger = source_db_index.ShardMerger()
+        self.assertEqual(
+            merger.merge(sharded["dependency_shards"]), inline["dependencies"]
+        )
+
+        # Shards are reused across runs, and read once per merger.
+        run("sharded_again.json", "--shard-dir", shard_dir)
+        self.assertEqual(len(os.listdir(shard_dir)), 2)
+        with mock.patch.object(source_db_index, "SourceDBIndex") as index:
+            merger.merge(sharded["dependency_shards"])
+        index.assert_not_called()
+
+    def test_conflicting_shards(self) -> None:
+        shards = []
+        for name, src in (("a", "src/a.py"), ("b", "src/other.py")):
+            shard = os.path.join(self.tmp, name)
+            source_db_index.write_index(shard, [("a.py", src, "//:" + name)])
+            shards.append(shard)
+        with self.assertRaisesRegex(Exception, "Duplicate entries for a.py"):
+            source_db_index.ShardMerger().merge(shards)
+
+    def test_sharded_source_db_conflict(self) -> None:
+        deps = [
+            self._write_json("a.json", [["a.py", "src/a.py", "//:a"]]),
+            self._write_json("b.json", [["a.py", "src/other.py", "//:b"]]),
+        ]
+        dep_list = os.path.join(self.tmp, "deps.txt")
+        with open(dep_list, "w") as f:
+            f.write("\n".join(deps))
+        args = ["make_source_db.py", "--dependency_manifests", dep_list]
+        args += ["--shard-dir", os.path.join(self.tmp, "shards")]
+        output = os.path.join(self.tmp, "db.json")
+        # The shards aren't read when writing the DB, only when merging it.
+        make_source_db.main(args + ["--output", output])
+        with open(output) as f:
+            shards = json.load(f)["dependency_shards"]
+        with self.assertRaisesRegex(Exception, "Duplicate entries for a.py"):
+            source_db_index.ShardMerger().merge(shards)
+        with self.assertRaisesRegex(Exception, "Duplicate entries for a.py"):
+            make_source_db.main(
+                args + ["--index-output", os.path.join(self.tmp, "db.idx")]
+            )
@@ -0,0 +1,130 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+"""
+Lookup benchmark for the static extension finder.
+
+Generates the extension table for a synthetic set of statically linked
+extensions, builds `_static_extension_utils` against it and the running
+interpreter's headers, and times `StaticExtensionFinder.find_spec` for modules
+that aren't static extensions (nearly every import) and for ones that are.
+Pass `--utils`/`--generator` to time another revision of either file.
+
+$ python3 tests/static_extension_finder_benchmark.py --extensions 5000
+"""
+
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import sysconfig
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+TOOLS_DIR: Path = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(TOOLS_DIR))
+
+
+def _build(root: Path, generator: Path, utils: Path, extensions: list[str]) -> None:
+    spec = importlib.util.spec_from_file_location("_generator", generator)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    args = root / "extensions.txt"
+    args.write_text(
+        "".join(
+            "--extension={}:PyInit_fake{}\n".format(name, i)
+            for i, name in enumerate(extensions)
+        )
+    )
+    info = root / "static_extension_info.cpp"
+    module.main(["generate", "@{}".format(args), "--output", str(info)])
+    fakes = root / "fakes.cpp"
+    fakes.write_text(
+        '#include "Python.h"\n'
+        + "".join(
+            'extern "C" PyObject* PyInit_fake{}() {{ return nullptr; }}\n'.format(i)
+            for i in range(len(extensions))
+        )
+    )
+    include = sysconfig.get_paths()["include"]
+    output = root / ("_static_extension_utils" + sysconfig.get_config_var("EXT_SUFFIX"))
+    cxx = os.environ.get("CXX", "c++")
+    subprocess.check_call(
+        [cxx, "-O2", "-fPIC", "-shared", "-I", include, "-std=c++17"]
+        + [str(utils), str(info), str(fakes), "-o", str(output)]
+    )
+
+
+def _time(find_spec: Callable[[str], object], names: list[str], runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        for name in names:
+            find_spec(name)
+        best = min(best, time.perf_counter() - start)
+    return best / len(names) * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--extensions", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--generator",
+        type=Path,
+        default=TOOLS_DIR / "generate_static_extension_info.py",
+    )
+    parser.add_argument(
+        "--utils", type=Path, default=TOOLS_DIR / "static_extension_utils.cpp"
+    )
+    args = parser.parse_args()
+
+    extensions = ["pkg{0}.sub.ext{0}".format(i) for i in range(args.extensions)]
+    # Misses look like what the finder sees in practice: the same packages'
+    # pure python modules, and stdlib modules.
+    misses = [
+        (
+            "pkg{0}.sub.mod{0}".format(i % args.extensions)
+            if i % 2
+            else "encodings.idna{}".format(i)
+        )
+        for i in range(args.lookups)
+    ]
+    hits = [extensions[i % len(extensions)] for i in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _build(Path(tmp), args.generator, args.utils, extensions)
+        sys.path.insert(0, tmp)
+        import static_extension_finder
+
+        from importlib.machinery import ModuleSpec
+
+        finder = static_extension_finder.StaticExtensionFinder
+        finder.ModuleSpec = ModuleSpec
+
+        def find_spec(name: str) -> object:
+            return finder.find_spec(name, None)
+
+        miss = _time(find_spec, misses, args.runs)
+        hit = _time(find_spec, hits, args.runs)
+
+    print("extensions: {}".format(args.extensions))
+    print("miss:       {:.0f}ns".format(miss))
+    print("hit:        {:.0f}ns".format(hit))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+# Copyright (c) Meta Platforms, Inc. and affiliates.
+#
+# This source code is dual-licensed under either the MIT license found in the
+# LICENSE-MIT file in the root directory of this source tree or the Apache
+# License, Version 2.0 found in the LICENSE-APACHE file in the root directory
+# of this source tree. You may select, at your option, one of the
+# above-listed licenses.
+
+# pyre-strict
+
+import contextlib
+import io
+import json
+import os
+import sys
+import sysconfig
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import __test_main__
+
+TESTS = """\
+import os
+import signal
+import unittest
+
+
+class First(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pid = os.getpid()
+
+    def test_a(self):
+        self.assertEqual(self.pid, os.getpid())
+
+    def test_b(self):
+        self.assertEqual(self.pid, os.getpid())
+
+
+class Second(unittest.TestCase):
+    def test_c(self):
+        pass
+
+    def test_fails(self):
+        self.fail("expected")
+
+
+class Third(unittest.TestCase):
+    def test_d(self):
+        print("output of d")
+
+    def test_crash(self):
+        crash = os.environ.get("CRASH_WORKER")
+        if crash == "signal":
+            os.kill(os.getpid(), signal.SIGKILL)
+        elif crash:
+            os._exit(3)
+"""
+
+
+LISTED_TESTS = """\
+import os
+import unittest
+
+if os.environ.get("FAIL_IMPORT"):
+    raise ImportError("imported")
+
+from listed_base import Base
+
+
+class Listed(Base):
+    def test_one(self):
+        pass
+
+    def test_two(self):
+        pass
+"""
+
+LISTED_BASE = """\
+import unittest
+
+
+class Base(unittest.TestCase):
+    def test_base(self):
+        pass
+"""
+
+DYNAMIC_TESTS = """\
+import unittest
+
+
+class Dynamic(unittest.TestCase):
+    def test_dynamic(self):
+        pass
+
+
+def load_tests(loader, tests, pattern):
+    return tests
+"""
+
+GENERATED_TESTS = """\
+import unittest
+
+from test_specs import NAMES
+
+
+class Generated(unittest.TestCase):
+    pass
+
+
+for name in NAMES:
+    setattr(Generated, "test_" + name, lambda self: None)
+"""
+
+
+COVERED_MODULE = """\
+def covered(x):
+    if x:
+        return 1
+    return 2
+
+
+def uncovered():  # pragma: no cover
+    return 3
+"""
+
+COVERED_TESTS = """\
+import unittest
+
+import covered_module
+
+
+class Covered(unittest.TestCase):
+    def test_covered(self):
+        self.assertEqual(covered_module.covered(True), 1)
+"""
+
+
+class _Test(unittest.TestCase):
+    def __init__(self, name: str) -> None:
+        super().__init__("run")
+        self.name = name
+
+    def run(self) -> None:  # pyre-ignore[14]
+        pass
+
+    def id(self) -> str:
+        return self.name
+
+
+class PartitionTest(unittest.TestCase):
+    def test_balances_by_history(self) -> None:
+        tests = [_Test(str(i)) for i in range(4)]
+        # All `_Test`s share a class, so split them up by hand.
+        for i, test in enumerate(tests):
+            test.__class__ = type("T{}".format(i), (_Test,), {})
+        history = {
+            __test_main__._get_test_id(tests[0]): 10.0,
+            __test_main__._get_test_id(tests[1]): 1.0,
+            __test_main__._get_test_id(tests[2]): 1.0,
+        }
+        shards = __test_main__.partition_tests(tests, 2, history)
+        self.assertEqual(shards, [[tests[0]], [tests[1], tests[2], tests[3]]])
+
+    def test_keeps_classes_together(self) -> None:
+        tests = [_Test(str(i)) for i in range(4)]
+        shards = __test_main__.partition_tests(tests, 4, {})
+        self.assertEqual(shards, [tests])
+
+
+class ShardedRunTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        (self.tmp / "sharded_tests.py").write_text(TESTS)
+        sys.path.insert(0, str(self.tmp))
+
+    def tearDown(self) -> None:
+        sys.path.remove(str(self.tmp))
+        sys.modules.pop("sharded_tests", None)
+        self._tmp.cleanup()
+
+    def _run(self, *args: str) -> tuple[int, list[dict[str, object]]]:
+        output = self.tmp / "results.json"
+        program = __test_main__.MainProgram(
+            ["test", "-q", "--hide-output", "-o", str(output), *args]
+        )
+        program.create_loader = lambda: __test_main__.Loader(["sharded_tests"])
+        with open(os.devnull, "w") as devnull:
+            stderr = sys.stderr
+            sys.stderr = devnull
+            try:
+                code = program.run()
+            finally:
+                sys.stderr = stderr
+        return code, json.loads(output.read_text())
+
+    def _statuses(self, results: list[dict[str, object]]) -> dict[object, object]:
+        return {r["testCase"]: r["type"] for r in results}
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_sharded_results_match_serial_results(self) -> None:
+        history = self.tmp / "history.json"
+        code, serial = self._run("--duration-history", str(history))
+        self.assertEqual(code, __test_main__.EXIT_CODE_TEST_FAILURE)
+        self.assertEqual(len(json.loads(history.read_text())), 6)
+
+        code, sharded = self._run("-j", "3", "--duration-history", str(history))
+        self.assertEqual(code, __test_main__.EXIT_CODE_TEST_FAILURE)
+        self.assertEqual(self._statuses(sharded), self._statuses(serial))
+        # Results are reported in the same order as by a serial run.
+        self.assertEqual(
+            [r["testCase"] for r in sharded], [r["testCase"] for r in serial]
+        )
+        for result in sharded:
+            self.assertIsInstance(result["wallTime"], float)
+            self.assertIn("rssKb", result)
+            if result["testCase"] == "test_d":
+                self.assertEqual(result["stdOut"], "output of d\n")
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs fork")
+    def test_crashed_worker(self) -> None:
+        for crash, message in (
+            ("1", "Test worker exited with status 3"),
+            ("signal", "Test worker was killed by signal SIGKILL"),
+        ):
+            with self.subTest(crash=crash):
+                os.environ["CRASH_WORKER"] = crash
+                try:
+                    code, results = self._run("-j", "3")
+                finally:
+                    del os.environ["CRASH_WORKER"]
+                self.assertEqual(code, __test_main__.EXIT_CODE_TEST_FAILURE)
+                statuses = self._statuses(results)
+                self.assertEqual(statuses["test_a"], __test_main__.TestStatus.PASSED)
+                self.assertEqual(
+                    statuses["test_crash"], __test_main__.TestStatus.ABORTED
+                )
+                for result in results:
+                    self.assertIn("wallTime", result)
+                    self.assertIn("rssKb", result)
+                    if result["testCase"] == "test_crash":
+                        self.assertEqual(result["message"], message)
+
+
+class ListCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        (self.tmp / "listed_tests.py").write_text(LISTED_TESTS)
+        (self.tmp / "listed_base.py").write_text(LISTED_BASE)
+        (self.tmp / "dynamic_tests.py").write_text(DYNAMIC_TESTS)
+        (self.tmp / "generated_tests.py").write_text(GENERATED_TESTS)
+        (self.tmp / "test_specs.py").write_text('NAMES = ["x"]\n')
+        sys.path.insert(0, str(self.tmp))
+
+    def tearDown(self) -> None:
+        sys.path.remove(str(self.tmp))
+        os.environ.pop("FAIL_IMPORT", None)
+        self._forget_modules()
+        self._tmp.cleanup()
+
+    def _forget_modules(self) -> None:
+        for name in (
+            "listed_tests",
+            "listed_base",
+            "dynamic_tests",
+            "generated_tests",
+            "test_specs",
+        ):
+            sys.modules.pop(name, None)
+
+    def _list(self, *args: str) -> list[str]:
+        self._forget_modules()
+        program = __test_main__.MainProgram(
+            ["test", "--list-cache", str(self.tmp / "cache"), *args]
+        )
+        program.create_loader = lambda: __test_main__.Loader(
+            ["listed_tests", "dynamic_tests", "generated_tests"], program.options.regex
+        )
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.assertEqual(program.run(), __test_main__.EXIT_CODE_SUCCESS)
+        return out.getvalue().splitlines()
+
+    def test_listing_from_cache(self) -> None:
+        for list_format in ("python", "buck"):
+            with self.subTest(list_format=list_format):
+                listed = self._list("-l", "-L", list_format)
+                os.environ["FAIL_IMPORT"] = "1"
+                try:
+                    self.assertEqual(self._list("-l", "-L", list_format), listed)
+                    self.assertNotIn("listed_tests", sys.modules)
+                    self.assertEqual(
+                        self._list("-l", "-L", list_format, "-r", "two|dynamic"),
+                        [line for line in listed if "two" in line or "ynamic" in line],
+                    )
+                finally:
+                    del os.environ["FAIL_IMPORT"]
+        self.assertEqual(
+            listed,
+            [
+                # `Base` is collected too, as it's in the module's namespace.
+                "listed_base.Base#test_base",
+                "listed_tests.Listed#test_base",
+                "listed_tests.Listed#test_one",
+                "listed_tests.Listed#test_two",
+                "dynamic_tests.Dynamic#test_dynamic",
+                "generated_tests.Generated#test_x",
+            ],
+        )
+
+    def test_cache_is_invalidated(self) -> None:
+        self._list("-l")
+        (self.tmp / "listed_base.py").write_text(
+            LISTED_BASE + "\n    def test_new(self):\n        pass\n"
+        )
+        self.assertIn("test_new (listed_tests.Listed)", self._list("-l"))
+        (self.tmp / "listed_tests.py").write_text(
+            LISTED_TESTS + "\n    def test_three(self):\n        pass\n"
+        )
+        self.assertIn("test_three (listed_tests.Listed)", self._list("-l"))
+        # Tests generated from other modules' contents are kept up to date too.
+        (self.tmp / "test_specs.py").write_text('NAMES = ["yz"]\n')
+        listed = self._list("-l")
+        self.assertIn("test_yz (generated_tests.Generated)", listed)
+        self.assertNotIn("test_x (generated_tests.Generated)", listed)
+
+    def test_site_packages_in_stdlib_are_tracked(self) -> None:
+        # As on standard layouts, where site-packages is in the stdlib dir.
+        site_packages = self.tmp / "site-packages"
+        site_packages.mkdir()
+        (self.tmp / "test_specs.py").rename(site_packages / "test_specs.py")
+        sys.path.insert(0, str(site_packages))
+        paths = dict(
+            sysconfig.get_paths(),
+            stdlib=str(self.tmp),
+            platstdlib=str(self.tmp),
+            purelib=str(site_packages),
+            platlib=str(site_packages),
+        )
+        try:
+            with mock.patch.object(
+                __test_main__.sysconfig, "get_paths", return_value=paths
+            ):
+                self.assertIn("test_x (generated_tests.Generated)", self._list("-l"))
+                (site_packages / "test_specs.py").write_text('NAMES = ["yz"]\n')
+                listed = self._list("-l")
+        finally:
+            sys.path.remove(str(site_packages))
+        self.assertIn("test_yz (generated_tests.Generated)", listed)
+        self.assertNotIn("test_x (generated_tests.Generated)", listed)
+
+
+class CoverageOptionsTest(unittest.TestCase):
+    def test_default_collector(self) -> None:
+        # The monitoring collector is approximate, so it's only used on request.
+        program = __test_main__.MainProgram(["test"])
+        self.assertEqual(program.options.coverage_collector, "coverage")
+
+
+@unittest.skipUnless(hasattr(sys, "monitoring"), "needs sys.monitoring")
+class MonitoringCoverageTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name).resolve()
+        (self.tmp / "covered_module.py").write_text(COVERED_MODULE)
+        (self.tmp / "covered_tests.py").write_text(COVERED_TESTS)
+        sys.path.insert(0, str(self.tmp))
+
+    def tearDown(self) -> None:
+        sys.path.remove(str(self.tmp))
+        for name in ("covered_module", "covered_tests"):
+            sys.modules.pop(name, None)
+        self._tmp.cleanup()
+
+    def test_coverage(self) -> None:
+        output = self.tmp / "results.json"
+        program = __test_main__.MainProgram(
+            [
+                "test",
+                "-q",
+                "--hide-output",
+                "-o",
+                str(output),
+                "--collect-coverage",
+                "--coverage-collector",
+                "monitoring",
+                "--coverage-include",
+                str(self.tmp / "covered_module.py"),
+            ]
+        )
+        program.create_loader = lambda: __test_main__.Loader(["covered_tests"])
+        with open(os.devnull, "w") as devnull:
+            with contextlib.redirect_stdout(devnull):
+                with contextlib.redirect_stderr(devnull):
+                    code = program.run()
+        self.assertEqual(code, __test_main__.EXIT_CODE_SUCCESS)
+        (coverage,) = [
+            r["coverage"] for r in json.loads(output.read_text()) if "coverage" in r
+        ]
+        # The def lines and the taken branch are covered, the `return 2` isn't,
+        # and the excluded function is.
+        self.assertEqual(coverage, {str(self.tmp / "covered_module.py"): "CCCUNNXX"})
@@ -14,6 +14,7 @@ import tempfile
 import unittest
 import zipfile
 from pathlib import Path
+from unittest import mock
 
 import wheel
 
@@ -73,3 +74,113 @@ class WheelBuilderTest(unittest.TestCase):
             # Paths needing no quoting stay byte-identical to the plain form,
             # so this change is inert for wheels that have no such filenames.
             self.assertIn("demo.py,,\n", record)
+
+    def test_parallel_compression_is_deterministic(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            src = tmp / "src"
+            (src / "demo").mkdir(parents=True)
+            for i in range(20):
+                (src / "demo" / f"mod{i}.py").write_text(f"x = {i}\n" * 100)
+            (src / "demo" / "ext.so").write_bytes(bytes(range(256)) * 100)
+
+            def build(name: str, **kwargs: object) -> bytes:
+                output = tmp / name
+                with wheel.WheelBuilder(
+                    name="demo",
+                    version="1.0",
+                    output=str(output),
+                    **kwargs,  # pyre-ignore[6]
+                ) as whl:
+                    whl.write("demo", str(src / "demo"))
+                    whl.writestr("demo/__init__.py", "")
+                return output.read_bytes()
+
+            # Stored wheels are the same as they've always been.
+            stored = build("stored.whl", jobs=4)
+            self.assertEqual(build("serial.whl"), stored)
+
+            deflated = build(
+                "deflated.whl",
+                compression=zipfile.ZIP_DEFLATED,
+                stored_suffixes=(".so",),
+                jobs=4,
+            )
+            self.assertEqual(
+                build(
+                    "deflated_serial.whl",
+                    compression=zipfile.ZIP_DEFLATED,
+                    stored_suffixes=(".so",),
+                ),
+                deflated,
+            )
+
+            with zipfile.ZipFile(io.BytesIO(stored)) as a, zipfile.ZipFile(
+                io.BytesIO(deflated)
+            ) as b:
+                self.assertIsNone(b.testzip())
+                self.assertEqual(a.namelist(), b.namelist())
+                self.assertEqual(
+                    a.read("demo-1.0.dist-info/RECORD"),
+                    b.read("demo-1.0.dist-info/RECORD"),
+                )
+                types = {i.filename: i.compress_type for i in b.infolist()}
+                self.assertEqual(types["demo/mod0.py"], zipfile.ZIP_DEFLATED)
+                self.assertEqual(types["demo/ext.so"], zipfile.ZIP_STORED)
+
+    def test_duplicate_members_warn(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            src = tmp / "demo.py"
+            src.write_text("x = 1\n", encoding="utf-8")
+            with self.assertWarnsRegex(UserWarning, "Duplicate name: 'demo.py'"):
+                with wheel.WheelBuilder(
+                    name="demo", version="1.0", output=str(tmp / "demo.whl"), jobs=2
+                ) as whl:
+                    whl.write("demo.py", str(src))
+                    whl.write("demo.py", str(src))
+
+    def test_large_compressed_members_are_streamed(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmp = Path(tmpdir)
+            src = tmp / "demo"
+            src.mkdir()
+            (src / "small.py").write_text("x = 1\n")
+            (src / "data.bin").write_bytes(bytes(range(256)) * 4096)
+
+            def build(name: str) -> bytes:
+                output = tmp / name
+                with wheel.WheelBuilder(
+                    name="demo",
+                    version="1.0",
+                    output=str(output),
+                    compression=zipfile.ZIP_DEFLATED,
+                    compresslevel=9,
+                    jobs=2,
+                ) as whl:
+                    whl.write("demo", str(src))
+                return output.read_bytes()
+
+            buffered = build("buffered.whl")
+
+            prepared = {}
+            prepare_member = wheel._prepare_member
+
+            def record(zinfo: zipfile.ZipInfo, *args: object) -> bytes | None:
+                data = prepare_member(zinfo, *args)  # pyre-ignore[6]
+                prepared[zinfo.filename] = data
+                return data
+
+            with mock.patch.object(wheel, "_MAX_BUFFERED_SIZE", 64 << 10):
+                with mock.patch.object(wheel, "_prepare_member", record):
+                    streamed = build("streamed.whl")
+            # The big member isn't read into memory ahead of time, but the
+            # wheel is the same.
+            self.assertIsNone(prepared["demo/data.bin"])
+            self.assertIsNotNone(prepared["demo/small.py"])
+            self.assertEqual(streamed, buffered)
+            with zipfile.ZipFile(io.BytesIO(streamed)) as whl:
+                self.assertIsNone(whl.testzip())
+                info = whl.getinfo("demo/data.bin")
+                self.assertEqual(info.compress_type, zipfile.ZIP_DEFLATED)
+                self.assertLess(info.compress_size, info.file_size)
@@ -21,9 +21,18 @@ import re
 import shutil
 import sys
 import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from types import TracebackType
 from typing import cast
 
+_BUFFER_SIZE: int = 1 << 20
+
+# Members bigger than this are streamed into the wheel, rather than being read
+# (and compressed) into memory ahead of time.
+_MAX_BUFFERED_SIZE: int = 64 << 20
+
 
 def normalize_name(name: str) -> str:
     """
@@ -39,6 +48,48 @@ def normalize_name(name: str) -> str:
     return pep503_normalized_name.replace("-", "_")
 
 
+def _prepare_member(
+    zinfo: zipfile.ZipInfo, src: str, compresslevel: int | None
+) -> bytes | None:
+    """
+    Compute the CRC and sizes of a member, compressing it if needed, and
+    return its data, or None if it's too big to hold in memory and has to be
+    streamed from `src`.
+    """
+    buffered = zinfo.file_size <= _MAX_BUFFERED_SIZE
+    compressor = None
+    if zinfo.compress_type == zipfile.ZIP_DEFLATED:
+        if not buffered:
+            # Compressed as it's appended instead.
+            return None
+        compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION if compresslevel is None else compresslevel,
+            zlib.DEFLATED,
+            -15,
+        )
+    chunks = []
+    crc = 0
+    size = 0
+    with open(src, "rb") as f:
+        for chunk in iter(lambda: f.read(_BUFFER_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if buffered:
+                chunks.append(chunk)
+    if compressor is not None:
+        chunks.append(compressor.flush())
+    zinfo.CRC = crc
+    zinfo.file_size = size
+    if not buffered:
+        zinfo.compress_size = size
+        return None
+    data = b"".join(chunks)
+    zinfo.compress_size = len(data)
+    return data
+
+
 def readme_content_type(path: str) -> str:
     _, ext = os.path.splitext(path.lower())
     if ext in (".md", ".markdown"):
@@ -62,6 +113,10 @@ class WheelBuilder(contextlib.AbstractContextManager):
         entry_points: dict[str, str] | None = None,
         metadata: list[tuple[str, str]] | None = None,
         readme: str | None = None,
+        compression: int = zipfile.ZIP_STORED,
+        compresslevel: int | None = None,
+        stored_suffixes: tuple[str, ...] = (),
+        jobs: int = 1,
     ) -> None:
         self._name = name
 
@@ -77,6 +132,12 @@ class WheelBuilder(contextlib.AbstractContextManager):
         self._platform_tag = platform_tag
         self._record: list[str] = []
         self._outf = zipfile.ZipFile(output, mode="w")
+        self._compression = compression
+        self._compresslevel = compresslevel
+        self._stored_suffixes = stored_suffixes
+        self._jobs = jobs
+        # Files to add to the wheel, in order, as `(zinfo, src)`.
+        self._pending: list[tuple[zipfile.ZipInfo, str]] = []
         self._entry_points: dict[str, str] | None = entry_points
         self._metadata: list[tuple[str, str]] = []
         self._readme = readme
@@ -111,13 +172,75 @@ class WheelBuilder(contextlib.AbstractContextManager):
                 strict_timestamps=False,
             )
             zinfo.date_time = (1980, 1, 1, 0, 0, 0)
-            with open(src, "rb") as fsrc, self._outf.open(zinfo, "w") as fdst:
-                shutil.copyfileobj(fsrc, fdst, 1024 * 8)
+            if not dst.endswith(self._stored_suffixes):
+                zinfo.compress_type = self._compression
+            self._pending.append((zinfo, src))
+
+    def _append(self, zinfo: zipfile.ZipInfo, src: str, data: bytes | None) -> None:
+        """
+        Append a member whose CRC and sizes are known, and whose (compressed)
+        data is `data`, or the contents of `src`. Compressed members without
+        `data` are compressed from `src` as they're written.
+        """
+        zf = self._outf
+        if data is None and zinfo.compress_type != zipfile.ZIP_STORED:
+            # What `ZipFile.write` sets, and `ZipFile.open` compresses with.
+            # pyre-fixme[16]: `ZipInfo` has no attribute `_compresslevel`.
+            zinfo._compresslevel = self._compresslevel
+            with open(src, "rb") as fsrc, zf.open(zinfo, "w") as fdst:
+                shutil.copyfileobj(fsrc, fdst, _BUFFER_SIZE)
+            return
+        fp = zf.fp
+        assert fp is not None
+        zinfo.header_offset = fp.tell()
+        # The same checks and output as `ZipFile.open(zinfo, "w")`.
+        zf._writecheck(zinfo)
+        zip64 = zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+        fp.write(zinfo.FileHeader(zip64))
+        if data is not None:
+            fp.write(data)
+        else:
+            with open(src, "rb") as fsrc:
+                shutil.copyfileobj(fsrc, fp, _BUFFER_SIZE)
+        zf.filelist.append(zinfo)
+        zf.NameToInfo[zinfo.filename] = zinfo
+        zf.start_dir = fp.tell()
+
+    def _flush(self) -> None:
+        """
+        Add all pending files to the wheel, compressing them in parallel, but
+        appending them in order.
+        """
+        pending, self._pending = self._pending, []
+        if self._jobs <= 1:
+            for zinfo, src in pending:
+                self._append(
+                    zinfo, src, _prepare_member(zinfo, src, self._compresslevel)
+                )
+            return
+        # Bound the number of members held in memory.
+        window: deque[tuple[zipfile.ZipInfo, str, Future[bytes | None]]] = deque()
+        with ThreadPoolExecutor(max_workers=self._jobs) as pool:
+            for zinfo, src in pending:
+                if len(window) >= self._jobs * 2:
+                    zinfo_, src_, future = window.popleft()
+                    self._append(zinfo_, src_, future.result())
+                window.append(
+                    (
+                        zinfo,
+                        src,
+                        pool.submit(_prepare_member, zinfo, src, self._compresslevel),
+                    )
+                )
+            while window:
+                zinfo, src, future = window.popleft()
+                self._append(zinfo, src, future.result())
 
     def write_data(self, dst: str, src: str) -> None:
         self.write(self._data(dst), src)
 
     def writestr(self, dst: str, contents: str) -> None:
+        self._flush()
         self._record.append(dst)
         self._outf.writestr(
             zinfo_or_arcname=zipfile.ZipInfo(filename=dst),
@@ -139,6 +262,7 @@ class WheelBuilder(contextlib.AbstractContextManager):
         )
 
     def close(self) -> None:
+        self._flush()
         metadata = "".join([f"{key}: {val}\n" for key, val in self._metadata])
         if self._readme is not None:
             with open(self._readme, encoding="utf-8") as readme:
@@ -201,6 +325,23 @@ def main(argv: list[str]) -> None:
     parser.add_argument("--metadata", nargs=2, action="append", default=[])
     parser.add_argument("--readme", default=None)
     parser.add_argument("--data", nargs=2, action="append", default=[])
+    parser.add_argument(
+        "--compression", choices=["stored", "deflated"], default="stored"
+    )
+    parser.add_argument("--compresslevel", type=int, default=None)
+    parser.add_argument(
+        "--stored-suffix",
+        dest="stored_suffixes",
+        action="append",
+        default=[],
+        help="Store files with this suffix (e.g. `.so`) uncompressed",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Threads to compress files with",
+    )
     args = parser.parse_args(argv[1:])
 
     pkgs: set[str] = set()
@@ -227,6 +368,14 @@ def main(argv: list[str]) -> None:
         ),
         metadata=args.metadata,
         readme=args.readme,
+        compression=(
+            zipfile.ZIP_DEFLATED
+            if args.compression == "deflated"
+            else zipfile.ZIP_STORED
+        ),
+        compresslevel=args.compresslevel,
+        stored_suffixes=tuple(args.stored_suffixes),
+        jobs=args.jobs,
     ) as whl:
         all_srcs = {}
         for src in args.manifests: